@@ -1,9 +1,17 @@
-import os
+import asyncio
 
 from bs4 import BeautifulSoup
-import pandas as pd
 import requests
 
+import fetch
+import page_fingerprints
+import scraper
+from sinks import CsvSink
+from sites import SITES
+
+SITE = SITES["globe"]
+CATEGORIES = SITE.categories
+
 
 def find_next_link(soup: BeautifulSoup) -> str:
     """Finds the URL for the next page in pagination.
@@ -14,28 +22,17 @@ def find_next_link(soup: BeautifulSoup) -> str:
     Returns:
         The URL for the next page if available, otherwise False.
     """
-    div = soup.find("div", class_="ty-pagination__items")
-    if div is None:
-        return False
-    
-    a_elements = div.find_all("a", class_="cm-history ty-pagination__item cm-ajax")
-    span_number = int(div.find("span").text) + 1
-    
-    urls = [link.get("href") for link in a_elements]
-    
-    for url in urls:
-        if str(span_number) in url:
-            return url
-    
-    return False
+    return scraper.find_next_link(SITE, soup)
 
 
-def save(response: requests.Response, filename: str) -> str:
+def save(response: requests.Response, filename: str, sink: CsvSink = None) -> str:
     """Saves product data from the response to a CSV file and finds the next page.
 
     Args:
         response: Response object from the requests library.
         filename: Name of the file to save the data to.
+        sink: Optional open CsvSink of the category to write the rows to.
+            Without one, the file is opened for this page only.
 
     Returns:
         The URL for the next page if available, otherwise False.
@@ -43,65 +40,18 @@ def save(response: requests.Response, filename: str) -> str:
     Raises:
         ValueError: If the response status code is not 200.
     """
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.content, features="lxml")
-        products = soup.find_all("div")
-        
-        seen_products = set()
-        product_data = []
-
-        for product in products:
-            title_element = product.find("a", class_="product-title")
-            price_element = product.find("span", class_="ty-price-num")
-            old_price_element = product.find("bdi")
-            
-            if title_element and price_element and old_price_element:
-                title = title_element.get_text(strip=True).strip()
-                current_price = price_element.get_text(strip=True).replace("Lekë", "").replace(".", ",").strip()
-                old_price = old_price_element.get_text(strip=True).replace("Lekë", "").replace(".", ",").strip()
-                
-                if old_price == '-' or old_price == "Home":
-                    continue
-                
-                product_entry = (title, current_price, old_price)
-                
-                if product_entry not in seen_products:
-                    seen_products.add(product_entry)
-                    product_data.append({
-                        "Emri": title,
-                        "Cmimi aktual": current_price,
-                        "Cmimi i vjeter": old_price
-                    })
-        
-        os.makedirs("Globe", exist_ok=True)
-        df = pd.DataFrame(product_data)
-        file_path = f"Globe/{filename}"
-
-        if os.path.exists(file_path):
-            df.to_csv(file_path, mode='a', header=False, index=False)
-        else:
-            df.to_csv(file_path, mode='w', header=True, index=False)
-        
-        return find_next_link(soup)
-    
-    else:
-        raise ValueError(f"Error: Problem with opening the website. Status code: {response.status_code}")
+    return scraper.save(SITE, response, filename=filename, sink=sink)
 
 
-def submain(name: str, filename: str) -> None:
+def submain(name: str, filename: str, output_format: str = "csv") -> None:
     """Handles the scraping and saving for a given category.
 
     Args:
         name: The category name for the URL.
         filename: The file name to save the data to.
+        output_format: "csv", "parquet" or "history".
     """
-    url = f"https://globe.al/{name}/"
-    response = requests.get(url)
-    url = save(response, filename=filename)
-    
-    while url:
-        response = requests.get(url)
-        url = save(response, filename=filename)
+    scraper.scrape_category(SITE, name, filename, output_format=output_format)
 
 
 def get_telefonia(filename="GlobeTelefonia.csv") -> None:
@@ -134,22 +84,31 @@ def get_kondicionimi(filename="GlobeKondicionimi.csv") -> None:
     submain("kondicionimi", filename=filename)   
 
 
+async def crawl(categories: dict[str, str] = None, max_concurrency: int = 8, per_host: int = 6,
+                output_format: str = "csv") -> None:
+    """Scrapes several categories concurrently.
+
+    Args:
+        categories: Mapping of category URL names to file names. Defaults to
+            all Globe categories.
+        max_concurrency: The maximum number of requests in flight overall.
+        per_host: The maximum number of requests in flight to globe.al.
+        output_format: "csv", "parquet" or "history".
+    """
+    if categories is None:
+        categories = CATEGORIES
+
+    jobs = [(SITE, name, filename) for name, filename in categories.items()]
+    await scraper.crawl(jobs, max_concurrency=max_concurrency, per_host=per_host, output_format=output_format)
+
+
 def main() -> None:
-    """Main function to start scraping for all categories."""
-    get_elektroshtepiake_te_medha()
-    get_elektroshtepiake_te_vogla()
-    get_foto_dhe_video()
-    get_kompjutera_dhe_rrjeti()
-    get_kondicionimi()
-    get_telefonia()   
+    """Main function to start scraping for all categories concurrently."""
+    fetch.enable_cache()
+    fingerprints = page_fingerprints.enable()
+    asyncio.run(crawl())
+    print(fingerprints.report())
 
 
 if __name__ == '__main__':
     main()
-
-
-    
-    
-    
-    
-    
\ No newline at end of file
@@ -1,9 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import hashlib
+import itertools
+import json
 import os
+import queue
 import re
+import threading
+from urllib.parse import urlsplit
 
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 import requests
 
+from chapter_archive import ChapterArchive
+import fetch
+import metrics
+from pagination import infer_template, page_number, plan_pages, template_page_number
+import parse_pool
+import parsed_page
+from parsed_page import ParsedPage
+
+BASE_URL = "https://www.lightnovelworld.com"
+WORKERS = 8
+REQUESTS_PER_SECOND = 5
+CACHE_TTL = [(r"/chapter-[^/]+$", 7 * 24 * 3600)]
+
+# The parts of a chapter list page and of a chapter page that are parsed.
+CHAPTER_LIST_REGIONS = {
+    "chapters": SoupStrainer("ul", class_="chapter-list"),
+    "pagenav": SoupStrainer("div", class_="pagenav"),
+}
+CHAPTER_REGIONS = {
+    "title": SoupStrainer("span", class_="chapter-title"),
+    "paragraphs": SoupStrainer("p"),
+}
+
 
 class Chapter:
     """Represents a chapter with a title and its paragraphs."""
@@ -12,6 +43,14 @@ class Chapter:
         self.title = title
         self.paragraphs = paragraphs
 
+    def text(self) -> str:
+        """Returns the chapter as it is written to its text file."""
+        return f"{self.title}\n\n" + "".join(f"{paragraph}\n\n" for paragraph in self.paragraphs)
+
+    def filename(self) -> str:
+        """Returns the name of the chapter's text file."""
+        return f"{re.sub(r'[^a-zA-Z0-9 ]', '', self.title).strip()}.txt"
+
 
 def request(url: str, headers: dict = None) -> requests.Response:
     """Sends an HTTP GET request to the specified URL and returns the response.
@@ -33,7 +72,7 @@ def request(url: str, headers: dict = None) -> requests.Response:
                            'Chrome/50.0.2661.102 Safari/537.36')
         }
 
-    response = requests.get(url, headers=headers)
+    response = fetch.get(url, headers=headers)
     if response.status_code != 200:
         raise ValueError("Couldn't open the link, status code: "
                          f"{response.status_code}")
@@ -51,7 +90,7 @@ def get_novel(name: str) -> tuple[requests.Response, str]:
         A tuple containing the response and formatted novel title.
     """
     novel_title = re.sub(r'[^a-zA-Z]', ' ', name).lower().replace(" ", "-")
-    url = f"https://www.lightnovelworld.com/novel/{novel_title}/chapters"
+    url = f"{BASE_URL}/novel/{novel_title}/chapters"
     response = request(url)
     return response, novel_title
 
@@ -65,48 +104,146 @@ def get_chapter_links(response: requests.Response) -> list:
     Returns:
         A list of chapter links.
     """
-    soup = BeautifulSoup(response.content, features="lxml")
-    unordered_list = soup.find("ul", class_="chapter-list")
+    unordered_list = parsed_page.parse(response, CHAPTER_LIST_REGIONS).find("chapters")
     list_items = unordered_list.find_all("li")
     links = [item.find('a')['href'] for item in list_items if item.find('a')]
     return links
 
 
-def get_chapter(link: str, novel_title: str) -> None:
-    """Downloads the content of a chapter and saves it.
+@metrics.timed("chapter")
+def fetch_chapter(link: str) -> Chapter:
+    """Downloads and parses the content of a chapter.
 
     Args:
         link: The URL link to the chapter.
-        novel_title: The formatted title of the novel for saving the chapter.
+
+    Returns:
+        The Chapter object with the chapter's title and paragraphs.
     """
-    url = f"https://www.lightnovelworld.com{link}"
+    url = f"{BASE_URL}{link}"
     response = request(url)
-    soup = BeautifulSoup(response.content, features="lxml")
+    return parse_pool.parse(parse_chapter, response.content)
+
+
+def parse_chapter(content: bytes) -> Chapter:
+    """Parses a chapter page. Runs in a worker process when the parse pool is enabled.
+
+    Args:
+        content: The HTML of the chapter page.
+
+    Returns:
+        The Chapter object with the chapter's title and paragraphs.
+    """
+    page = ParsedPage(content, CHAPTER_REGIONS)
     
-    title = soup.find("span", class_="chapter-title").text.strip()
-    paragraphs = [p.text.strip() for p in soup.find_all("p")]
+    title = page.find("title").text.strip()
+    paragraphs = [p.text.strip() for p in page.region("paragraphs")]
     
-    chapter = Chapter(title=title, paragraphs=paragraphs)
-    save_chapter(chapter, novel_title)
+    return Chapter(title=title, paragraphs=paragraphs)
+
+
+def get_chapter(link: str, novel_title: str) -> None:
+    """Downloads the content of a chapter and saves it.
+
+    Args:
+        link: The URL link to the chapter.
+        novel_title: The formatted title of the novel for saving the chapter.
+    """
+    save_chapter(fetch_chapter(link), novel_title)
 
 
-def save_chapter(chapter: Chapter, novel_title: str) -> None:
+@metrics.timed("write")
+def save_chapter(chapter: Chapter, novel_title: str) -> str:
     """Saves the chapter to a text file.
 
     Args:
         chapter: The Chapter object containing the chapter's content.
         novel_title: The formatted title of the novel to create the folder.
+
+    Returns:
+        The name of the saved file inside the novel's folder.
     """
     if not os.path.exists(novel_title):
         os.makedirs(novel_title)
     
-    chapter_title = re.sub(r'[^a-zA-Z0-9 ]', '', chapter.title).strip()
-    filename = f"{chapter_title}.txt"
-    
+    filename = chapter.filename()
     with open(os.path.join(novel_title, filename), 'w', encoding='utf-8') as file:
-        file.write(f"{chapter.title}\n\n")
-        for paragraph in chapter.paragraphs:
-            file.write(f"{paragraph}\n\n")
+        file.write(chapter.text())
+    
+    return filename
+
+
+class ChapterManifest:
+    """Records which chapters of a novel have been saved.
+
+    The manifest is an append-only JSON lines file inside the novel's folder.
+    Each line holds a chapter URL with its saved file, the SHA-256 hash of the
+    file and the fetch time. A line is written as soon as a chapter is saved,
+    so an interrupted download can resume from where it stopped.
+    """
+    FILENAME = "manifest.jsonl"
+
+    def __init__(self, directory: str) -> None:
+        """Loads the manifest of a novel's folder, if there is one.
+
+        Args:
+            directory: The folder the novel's chapters are saved in.
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, self.FILENAME)
+        self.entries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry["url"]] = entry
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        """Returns the SHA-256 hash of a file's content."""
+        with open(path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    def is_saved(self, link: str) -> bool:
+        """Checks whether a chapter is saved and its file is unchanged on disk.
+
+        Args:
+            link: The URL link to the chapter.
+
+        Returns:
+            True if the chapter doesn't need to be downloaded again.
+        """
+        entry = self.entries.get(link)
+        if entry is None:
+            return False
+
+        path = os.path.join(self.directory, entry["file"])
+        return os.path.exists(path) and self.file_hash(path) == entry["sha256"]
+
+    def record(self, link: str, filename: str) -> None:
+        """Records a saved chapter.
+
+        Args:
+            link: The URL link to the chapter.
+            filename: The name of the saved file inside the novel's folder.
+        """
+        entry = {
+            "url": link,
+            "file": filename,
+            "sha256": self.file_hash(os.path.join(self.directory, filename)),
+            "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds")
+        }
+
+        with self._lock:
+            self.entries[link] = entry
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry, ensure_ascii=False) + "\n")
 
 
 def get_page(response: requests.Response) -> tuple[requests.Response, bool]:
@@ -119,36 +256,192 @@ def get_page(response: requests.Response) -> tuple[requests.Response, bool]:
         A tuple containing the response of the next page and a boolean
         indicating if there is another page.
     """
-    soup = BeautifulSoup(response.content, features="lxml")
-    pagenav = soup.find("div", class_="pagenav")
+    pagenav = parsed_page.parse(response, CHAPTER_LIST_REGIONS).find("pagenav")
     skip_to_next = pagenav.find("li", class_="PagedList-skipToNext") if pagenav else None
     
     if not skip_to_next:
         return None, False
     
     page = skip_to_next.find("a")['href']
-    url = f"https://www.lightnovelworld.com{page}"
+    url = f"{BASE_URL}{page}"
     other_response = request(url)
     return other_response, True
 
 
-def main() -> None:
-    """Main function to orchestrate downloading chapters of a novel."""
+def get_chapter_pages(response: requests.Response) -> list[str] | None:
+    """Lists the URLs of all chapter list pages after the current one.
+
+    The last page number is read from the skip-to-last link, and the URLs
+    are built from the template of the numbered page links.
+
+    Args:
+        response: The response object of a chapter list page.
+
+    Returns:
+        The URLs in page order, or None if the page range can't be told.
+    """
+    pagenav = parsed_page.parse(response, CHAPTER_LIST_REGIONS).find("pagenav")
+    if pagenav is None:
+        return []
+
+    active = pagenav.find("li", class_="active")
+    current = page_number(active.get_text()) if active else None
+    if current is None:
+        return None
+
+    pages = {}
+    for item in pagenav.find_all("li"):
+        link = item.find("a", href=True)
+        number = page_number(link.get_text()) if link else None
+        if number is not None:
+            pages[number] = f"{BASE_URL}{link['href']}"
+
+    last = None
+    skip_to_last = pagenav.find("li", class_="PagedList-skipToLast")
+    template = infer_template(pages)
+    if skip_to_last and skip_to_last.find("a", href=True) and template:
+        last = template_page_number(template, f"{BASE_URL}{skip_to_last.find('a')['href']}")
+
+    return plan_pages(pages, current, last=last)
+
+
+def download_chapters(response: requests.Response, novel_title: str, workers: int = WORKERS,
+                      requests_per_second: float = REQUESTS_PER_SECOND, refresh: bool = False,
+                      output_format: str = "txt") -> int:
+    """Downloads all chapters of a novel through a three-stage pipeline.
+
+    A producer thread reads the paginated chapter list, a pool of worker
+    threads fetches the chapters and parses them, in the parse pool when it
+    is enabled, and a writer thread saves them.
+    The producer requests all list pages at once when the first page tells
+    the page range, and follows the next links otherwise. If the pagination
+    only shows a window of page numbers, planning starts again from the
+    last planned page.
+    The stages are connected by bounded queues, so the producer never runs
+    far ahead of the workers.
+
+    Chapters recorded in the novel's ChapterManifest are skipped, so a rerun
+    only downloads new chapters and those whose file is missing or modified.
+    In the archive output format, the chapters are appended to the novel's
+    ChapterArchive instead of being saved as text files, and the chapters
+    already in the archive are skipped.
+
+    Args:
+        response: The response object of the novel's first chapter page.
+        novel_title: The formatted title of the novel for saving the chapters.
+        workers: The number of chapters fetched in parallel.
+        requests_per_second: The request rate allowed to the site, or None
+            for no limit.
+        refresh: Download every chapter again, even if it is in the manifest.
+        output_format: "txt" for one text file per chapter, or "archive".
+
+    Returns:
+        The number of chapters saved.
+
+    Raises:
+        ValueError: If the output format is unknown.
+    """
+    if output_format not in ("txt", "archive"):
+        raise ValueError(f"Unknown output format: {output_format}")
+
+    if requests_per_second:
+        fetch.rate_limiter.set_rate(urlsplit(BASE_URL).netloc, requests_per_second)
+
+    manifest = ChapterManifest(novel_title)
+    archive = ChapterArchive(novel_title) if output_format == "archive" else None
+    numbers = itertools.count()
+    done = object()
+    link_queue = queue.Queue(maxsize=workers * 2)
+    chapter_queue = queue.Queue(maxsize=workers * 2)
+    saved = 0
+
+    def queue_links(page_response: requests.Response) -> None:
+        for link in get_chapter_links(page_response):
+            number = next(numbers)
+            is_saved = link in archive if archive is not None else manifest.is_saved(link)
+            if refresh or not is_saved:
+                link_queue.put((number, link))
+
+    def produce() -> None:
+        try:
+            page_response = response
+            queue_links(page_response)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                while True:
+                    pages = get_chapter_pages(page_response)
+                    if pages is None:
+                        page_response, condition = get_page(page_response)
+                        if not condition:
+                            break
+                        queue_links(page_response)
+                        continue
+                    if not pages:
+                        break
+                    for page_response in executor.map(metrics.bind(request), pages):
+                        queue_links(page_response)
+        except (ValueError, requests.RequestException) as error:
+            print(f"Stopped reading the chapter list: {error}")
+        finally:
+            for _ in range(workers):
+                link_queue.put(done)
+
+    def work() -> None:
+        while (item := link_queue.get()) is not done:
+            number, link = item
+            try:
+                chapter = fetch_chapter(link)
+            except Exception as error:
+                print(f"Skipping chapter {link}: {error!r}")
+                continue
+            chapter_queue.put((number, link, chapter))
+
+    def write() -> None:
+        nonlocal saved
+        while (item := chapter_queue.get()) is not done:
+            number, link, chapter = item
+            try:
+                if archive is not None:
+                    archive.add(link, chapter.title, chapter.text(), file=chapter.filename(), number=number)
+                else:
+                    manifest.record(link, save_chapter(chapter, novel_title))
+                metrics.count("rows")
+                saved += 1
+            except Exception as error:
+                print(f"Couldn't save chapter {link}: {error!r}")
+
+    with metrics.labels("lightnovelworld", novel_title):
+        producer = threading.Thread(target=metrics.bind(produce))
+        pool = [threading.Thread(target=metrics.bind(work)) for _ in range(workers)]
+        writer = threading.Thread(target=metrics.bind(write))
+
+    for thread in [producer, writer, *pool]:
+        thread.start()
+    for thread in [producer, *pool]:
+        thread.join()
+    chapter_queue.put(done)
+    writer.join()
+    if archive is not None:
+        archive.close()
+
+    return saved
+
+
+def main(output_format: str = "txt") -> None:
+    """Main function to orchestrate downloading chapters of a novel.
+
+    Args:
+        output_format: "txt" for one text file per chapter, or "archive" for
+            the novel's ChapterArchive.
+    """
+    fetch.enable_cache(ttl=CACHE_TTL)
     novel_name = input("Enter the novel name: ")
     response, novel_title = get_novel(novel_name)
     
-    links = get_chapter_links(response)
-    for link in links:
-        get_chapter(link, novel_title)
-    
-    other_response, condition = get_page(response)
-    while condition:
-        links = get_chapter_links(other_response)
-        for link in links:
-            get_chapter(link, novel_title)
-        other_response, condition = get_page(other_response)
+    with metrics.from_environment(), parse_pool.enable():
+        saved = download_chapters(response, novel_title, output_format=output_format)
     
-    print(f"All chapters have been saved in the folder: {novel_title}")
+    print(f"{saved} chapters have been saved in the folder: {novel_title}")
 
 
 if __name__ == "__main__":
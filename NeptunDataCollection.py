@@ -1,110 +1,232 @@
+import hashlib
+import itertools
+import json
 import os
+import queue
+import threading
+import time
 
-from bs4 import BeautifulSoup
-import pandas as pd
+from bs4 import SoupStrainer
 from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.common.exceptions import TimeoutException
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import TimeoutException, WebDriverException
 
+import browser
+from frontier import Frontier, LeaseLost
+import metrics
+import page_fingerprints
+from page_fingerprints import fingerprint
+import parse_pool
+from parsed_page import ParsedPage
+from sinks import open_sink
 
-def setup_driver() -> webdriver.Chrome:
+BASE_DIRECTORY = "Neptun.al"
+CATEGORY_CACHE = "neptun_categories.json"
+CATEGORY_TTL = 24 * 3600
+MAX_ATTEMPTS = 3
+PAGINATION_WAIT = 3
+# Returns the rendered product cards, the only part of a page that is parsed and fingerprinted.
+PRODUCT_CARDS_SCRIPT = ("return Array.from(document.getElementsByClassName('product-list-item-grid'), "
+                        "card => card.outerHTML).join('');")
+PRICE_XPATH = "//*[contains(@class, 'product-price__amount--value') and contains(@class, 'ng-binding')]"
+TITLE_XPATH = "//*[contains(@class, 'product-list-item__content--title') and contains(@class, 'ng-binding')]"
+PAGINATION_XPATH = '//*[@id="affix2"]/div/div[2]/ul/li'
+PRODUCT_LIST_REGIONS = {"products": SoupStrainer("div", class_="ng-scope product-list-item-grid")}
+MENU_REGIONS = {"menu": SoupStrainer("li", id="neptunMain")}
+
+
+class CategoryJob:
+    """Represents one sub-subcategory to scrape."""
+    def __init__(self, link: str, directory: str, filename: str, output_format: str = "csv") -> None:
+        """Initializes a CategoryJob with the category link and its output file."""
+        self.link = link
+        self.directory = directory
+        self.filename = filename
+        self.output_format = output_format
+        self.attempts = 0
+        # Set when the job has to stop before its next page, e.g. when its frontier lease is lost.
+        self.cancelled: threading.Event | None = None
+
+
+def check_cancelled(cancelled: threading.Event | None, url: str) -> None:
+    """Raises LeaseLost if a job was cancelled."""
+    if cancelled is not None and cancelled.is_set():
+        raise LeaseLost(f"Stopped {url}: the lease went to another worker")
+
+
+def setup_driver(block_resources: bool = True, driver_path: str = None) -> webdriver.Chrome:
     """Sets up the Selenium WebDriver for Chrome with headless options.
 
+    Args:
+        block_resources (bool): Whether to skip images, fonts, stylesheets and
+            tracking scripts. The product lists only need the HTML and the
+            page's own scripts.
+        driver_path (str): The ChromeDriver from browser.install_driver.
+            Defaults to installing it now.
+
     Returns:
         webdriver.Chrome: A configured Chrome WebDriver.
     """
-    options = Options()
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--headless")
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
-    return driver
+    return browser.create_driver(block_resources=block_resources, driver_path=driver_path)
+
 
+def page_count(driver: webdriver.Chrome, timeout: float = PAGINATION_WAIT) -> int:
+    """Reads the number of pages from the pagination of a rendered product list.
 
-def get_number_of_pages(url: str, driver: webdriver.Chrome) -> int:
-    """Retrieves the total number of pages for a product list.
+    The pagination may be rendered after the products, so it is waited for
+    on its own. Lists with a single page have none, which costs the wait.
 
     Args:
-        url (str): The URL of the product category page.
-        driver (webdriver.Chrome): The WebDriver instance to use for fetching.
+        driver (webdriver.Chrome): The WebDriver showing the product list.
+        timeout (float): Seconds to wait for the pagination.
 
     Returns:
-        int: The total number of pages in the product list.
+        int: The total number of pages, 1 if there is no pagination.
     """
-    driver.get(url)
-    pagination_xpath = '//*[@id="affix2"]/div/div[2]/ul/li'
-    
     try:
-        page_elements = WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.XPATH, pagination_xpath))
-        )
-        page_numbers = [element.text.strip() for element in page_elements][1:-1]
-        return 1 if len(page_numbers) == 1 else int(page_numbers[-1])
+        with metrics.stage("wait"):
+            WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.XPATH, PAGINATION_XPATH)))
     except TimeoutException:
-        print("TimeoutException: Unable to find pagination elements.")
         return 1
 
+    page_elements = driver.find_elements(By.XPATH, PAGINATION_XPATH)
+    page_numbers = [element.text.strip() for element in page_elements][1:-1]
+    return int(page_numbers[-1]) if len(page_numbers) > 1 else 1
+
+
+def category_name(directory: str, filename: str) -> str:
+    """Returns the category path of a sub-subcategory, e.g. "Audio/Personal Audio/Bokse Bluetooth"."""
+    return os.path.relpath(os.path.join(directory, filename), BASE_DIRECTORY).replace(os.sep, "/")
+
+
+def open_category_sink(directory: str, filename: str, output_format: str):
+    """Opens the sink that the products of a sub-subcategory are written to.
+
+    Args:
+        directory (str): The directory where the CSV file will be saved.
+        filename (str): The name of the output CSV file.
+        output_format (str): "csv", "parquet" or "history".
+
+    Returns:
+        The open sink. Page fingerprints of the pages saved to it are stored
+        once it is closed.
+    """
+    file_path = os.path.join(directory, f'{filename}.csv')
+    return page_fingerprints.track(
+        open_sink(file_path, "neptun", category_name(directory, filename), output_format=output_format, mode="w")
+    )
+
+
+def parse_product_list(page_source: str) -> list[tuple[str, str, str]]:
+    """Extracts the products of a rendered product list page.
+
+    Args:
+        page_source (str): The HTML of the rendered page, or of its product cards.
+
+    Returns:
+        list[tuple[str, str, str]]: The (title, current price, old price) rows.
+    """
+    items = ParsedPage(page_source, PRODUCT_LIST_REGIONS, features='html.parser').region("products")
+    rows = []
+
+    for item in items:
+        whitebox = item.find("div", class_="white-box")
+        title = whitebox.find("h2", class_="product-list-item__content--title ng-binding").get_text()
+        prices_section = whitebox.find("div", class_="product-list-item__prices pt35")
+        happy_card = prices_section.find("div", class_="HappyCard")
+        new_price_model = prices_section.find("div", class_="newPriceModel")
+
+        current_price = happy_card.find("span", class_="product-price__amount--value ng-binding")
+        current_price = current_price.get_text() if current_price else "N/A"
+        
+        old_price = new_price_model.find("span", class_="product-price__amount--value ng-binding").get_text()
+        print(title, current_price, old_price)
+
+        rows.append((title, current_price, old_price))
+
+    return rows
 
-def scrape_product_data(url: str, pages: int, driver: webdriver.Chrome, directory: str, filename: str) -> None:
+
+@metrics.timed("category")
+def scrape_product_data(url: str, pages: int | None, driver: webdriver.Chrome, directory: str, filename: str,
+                        output_format: str = "csv", cancelled: threading.Event = None) -> tuple[str, int]:
     """Scrapes product data and saves it as a CSV file.
 
+    Each page is parsed as soon as its prices and titles are rendered,
+    checked with one combined wait. Without a page count, the count is read
+    from the pagination of the first page, so that page is rendered once for
+    both. Only the HTML of the product cards is read from the browser, and
+    rows are streamed into the file as each page is parsed. When page
+    fingerprints are enabled, pages whose product cards are unchanged since
+    the last run aren't parsed again; their stored rows are written instead.
+
     Args:
         url (str): The base URL of the product list.
-        pages (int): The number of pages to scrape.
+        pages (int | None): The number of pages to scrape, or None to read
+            it from the first page.
         driver (webdriver.Chrome): The WebDriver instance to use.
         directory (str): The directory where the CSV file will be saved.
         filename (str): The name of the output CSV file.
+        output_format (str): "csv", "parquet" or "history".
+        cancelled (threading.Event): Stops the scrape with LeaseLost
+            before the next page once it is set.
+
+    Returns:
+        tuple[str, int]: The fingerprint of the product cards of all pages,
+        which changes with the products and prices of the category, and the
+        number of pages.
     """
-    products = []
-    price_xpath = "//*[contains(@class, 'product-price__amount--value') and contains(@class, 'ng-binding')]"
-    title_xpath = "//*[contains(@class, 'product-list-item__content--title') and contains(@class, 'ng-binding')]"
-   
-    for page in range(1, pages + 1):
-        page_url = f"{url}{page}"
-        driver.get(page_url)
-        
-        try:
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_all_elements_located((By.XPATH, price_xpath))
-            )
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_all_elements_located((By.XPATH, title_xpath))
-            )
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            items = soup.find_all("div", class_="ng-scope product-list-item-grid")
-
-            for item in items:
-                whitebox = item.find("div", class_="white-box")
-                title = whitebox.find("h2", class_="product-list-item__content--title ng-binding").get_text()
-                prices_section = whitebox.find("div", class_="product-list-item__prices pt35")
-                happy_card = prices_section.find("div", class_="HappyCard")
-                new_price_model = prices_section.find("div", class_="newPriceModel")
-
-                current_price = happy_card.find("span", class_="product-price__amount--value ng-binding")
-                current_price = current_price.get_text() if current_price else "N/A"
+    category_digest = hashlib.sha256()
+
+    with open_category_sink(directory, filename, output_format) as sink:
+        for page in itertools.count(1):
+            if pages is not None and page > pages:
+                break
+            check_cancelled(cancelled, url)
+            
+            page_url = f"{url}{page}"
+            with metrics.stage("render"):
+                driver.get(page_url)
+            
+            try:
+                with metrics.stage("wait"):
+                    WebDriverWait(driver, 20).until(EC.all_of(
+                        EC.presence_of_all_elements_located((By.XPATH, PRICE_XPATH)),
+                        EC.presence_of_all_elements_located((By.XPATH, TITLE_XPATH))
+                    ))
+                if pages is None:
+                    pages = page_count(driver)
+                product_cards = driver.execute_script(PRODUCT_CARDS_SCRIPT)
+                digest = fingerprint(product_cards)
+                category_digest.update(digest.encode())
                 
-                old_price = new_price_model.find("span", class_="product-price__amount--value ng-binding").get_text()
-                print(title, current_price, old_price)
-
-                products.append({
-                    "Emri": title,
-                    "Cmimi aktual": current_price,
-                    "Cmimi i vjeter": old_price
-                })
-        
-        except TimeoutException:
-            print(f"TimeoutException on page {page}: Unable to find product elements.")
-            continue
+                if page_fingerprints.store is None:
+                    rows = parse_pool.parse(parse_product_list, product_cards)
+                    metrics.count("rows", len(rows))
+                    sink.write_rows(rows)
+                    continue
+                
+                stored = page_fingerprints.store.unchanged("neptun", page_url, digest)
+                if stored is not None:
+                    metrics.count("rows", len(stored[0]))
+                    sink.write_rows(stored[0])
+                    continue
+                
+                rows = parse_pool.parse(parse_product_list, product_cards)
+                metrics.count("rows", len(rows))
+                sink.write_rows(rows)
+                page_fingerprints.store.update("neptun", page_url, digest, rows, sink=sink)
+            
+            except TimeoutException:
+                print(f"TimeoutException on page {page}: Unable to find product elements.")
+                if pages is None:
+                    pages = 1
+                continue
 
-    df = pd.DataFrame(products)
-    file_path = os.path.join(directory, f'{filename}.csv')
-    df.to_csv(file_path, mode='w', header=True, index=False)
-    print(f"Data saved to {file_path}")
+    print(f"Data saved for {filename}")
+    return category_digest.hexdigest(), pages
 
 
 def create_directory(directory: str, name: str) -> str:
@@ -122,18 +244,72 @@ def create_directory(directory: str, name: str) -> str:
     return path
 
 
-def get_categories(driver: webdriver.Chrome, base_directory: str) -> None:
-    """Fetches product categories and scrapes the data for each.
+def load_category_jobs(base_directory: str, output_format: str = "csv", path: str = CATEGORY_CACHE,
+                       ttl: float = CATEGORY_TTL) -> list[CategoryJob] | None:
+    """Reads the jobs of the category menu from the cache file.
+
+    Args:
+        base_directory (str): The base directory the jobs were created for.
+        output_format (str): "csv", "parquet" or "history".
+        path (str): The cache file.
+        ttl (float): The number of seconds the cached menu is used for.
+
+    Returns:
+        list[CategoryJob] | None: The jobs, or None if the cache is missing,
+        expired or made for another base directory.
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            cached = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get("base_directory") != base_directory or time.time() - cached.get("saved_at", 0) > ttl:
+        return None
+
+    jobs = []
+    for link, directory, filename in cached["categories"]:
+        os.makedirs(directory, exist_ok=True)
+        jobs.append(CategoryJob(link=link, directory=directory, filename=filename, output_format=output_format))
+    return jobs
+
+
+def save_category_jobs(jobs: list[CategoryJob], base_directory: str, path: str = CATEGORY_CACHE) -> None:
+    """Writes the jobs of the category menu to the cache file.
+
+    Args:
+        jobs (list[CategoryJob]): The jobs read from the menu.
+        base_directory (str): The base directory the jobs were created for.
+        path (str): The cache file.
+    """
+    cached = {
+        "saved_at": time.time(),
+        "base_directory": base_directory,
+        "categories": [[job.link, job.directory, job.filename] for job in jobs],
+    }
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(cached, file, ensure_ascii=False, indent=1)
+    os.replace(temporary, path)
+
+
+def get_category_jobs(driver: webdriver.Chrome, base_directory: str, output_format: str = "csv") -> list[CategoryJob]:
+    """Reads the category menu and creates a job for every sub-subcategory.
 
     Args:
         driver (webdriver.Chrome): The WebDriver instance.
         base_directory (str): The base directory where data will be stored.
+        output_format (str): "csv", "parquet" or "history".
+
+    Returns:
+        list[CategoryJob]: The jobs, in menu order.
     """
     driver.get("https://www.neptun.al/")
     WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, '//*[@id="neptunMain"]')))
     
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-    categories = soup.find("li", id="neptunMain").find_all("li", attrs={'data-tag': True})
+    menu = ParsedPage(driver.page_source, MENU_REGIONS, features='html.parser').find("menu")
+    categories = menu.find_all("li", attrs={'data-tag': True})
+    jobs = []
 
     for category in categories:
         category_name = category.find('a').get_text(strip=True).title()
@@ -150,18 +326,249 @@ def get_categories(driver: webdriver.Chrome, base_directory: str) -> None:
             for sub_subcategory in sub_subcategories:
                 title = sub_subcategory.get_text(strip=True).title().replace("/", "")
                 link = f"https://www.neptun.al{sub_subcategory['href']}?items=100&page="
-                pages = get_number_of_pages(link, driver)
-                scrape_product_data(url=link, pages=pages, driver=driver, directory=subcategory_path, filename=title)
+                jobs.append(CategoryJob(link=link, directory=subcategory_path, filename=title, output_format=output_format))
 
+    return jobs
 
-def main() -> None:
-    """Main function to initiate scraping."""
-    driver = setup_driver()
-    base_directory = "Neptun.al"
-    
-    get_categories(driver, base_directory)
+
+def run_job(job: CategoryJob, driver: webdriver.Chrome) -> tuple[str, int]:
+    """Scrapes every page of one sub-subcategory.
+
+    The number of pages is read from the first page while its products are
+    scraped.
+
+    Args:
+        job (CategoryJob): The sub-subcategory to scrape.
+        driver (webdriver.Chrome): The WebDriver instance to use.
+
+    Returns:
+        tuple[str, int]: The fingerprint of the category and its number of
+        pages, as returned by scrape_product_data.
+    """
+    with metrics.labels("neptun", category_name(job.directory, job.filename)):
+        return scrape_product_data(url=job.link, pages=None, driver=driver, directory=job.directory,
+                            filename=job.filename, output_format=job.output_format, cancelled=job.cancelled)
+
+
+def get_categories(driver: webdriver.Chrome, base_directory: str) -> None:
+    """Fetches product categories and scrapes the data for each.
+
+    Args:
+        driver (webdriver.Chrome): The WebDriver instance.
+        base_directory (str): The base directory where data will be stored.
+    """
+    for job in get_category_jobs(driver, base_directory):
+        run_job(job, driver)
+
+
+def run_browser_pool(jobs: list[CategoryJob], workers: int, max_attempts: int = MAX_ATTEMPTS,
+                     driver: webdriver.Chrome = None) -> list[CategoryJob]:
+    """Scrapes jobs with a pool of WebDriver workers sharing one job queue.
+
+    When a browser crashes, its worker quits it, starts a new one and puts the
+    job back on the queue until the job has been tried max_attempts times.
+    All browsers are shut down when the queue is empty or on an error.
+    A browser that is already running can be handed over to the first worker.
+    The ChromeDriver is installed once before the workers start, so they
+    don't download it into the same cache at the same time.
+
+    Args:
+        jobs (list[CategoryJob]): The sub-subcategories to scrape.
+        workers (int): The number of browsers to run in parallel.
+        max_attempts (int): How many times a job is tried before giving up.
+        driver (webdriver.Chrome): Optional running browser for the first
+            worker. It is shut down with the others.
+
+    Returns:
+        list[CategoryJob]: The jobs that failed on every attempt.
+    """
+    job_queue = queue.Queue()
+    for job in jobs:
+        job_queue.put(job)
+
+    drivers = {0: driver} if driver is not None else {}
+    failed = []
+    lock = threading.Lock()
+
+    def quit_driver(worker: int) -> None:
+        driver = drivers.pop(worker, None)
+        if driver is not None:
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+
+    def work(worker: int) -> None:
+        while True:
+            try:
+                job = job_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            job.attempts += 1
+            try:
+                if worker not in drivers:
+                    drivers[worker] = setup_driver(driver_path=driver_path)
+                run_job(job, drivers[worker])
+            except WebDriverException as error:
+                print(f"Browser {worker} crashed on {job.link}: {error.msg}")
+                quit_driver(worker)
+                if job.attempts < max_attempts:
+                    job_queue.put(job)
+                else:
+                    with lock:
+                        failed.append(job)
+            except Exception as error:
+                print(f"Job {job.link} failed: {error}")
+                with lock:
+                    failed.append(job)
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(workers)]
+    try:
+        driver_path = browser.install_driver()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        for worker in list(drivers):
+            quit_driver(worker)
+
+    return failed
+
+
+def list_category_jobs(output_format: str = "csv") -> list[CategoryJob]:
+    """Lists every sub-subcategory without keeping a browser.
+
+    The categories are read from CATEGORY_CACHE, or from the homepage if
+    the cache is missing or stale.
+
+    Args:
+        output_format (str): "csv", "parquet" or "history".
+
+    Returns:
+        list[CategoryJob]: The sub-subcategories to scrape.
+    """
+    jobs = load_category_jobs(BASE_DIRECTORY, output_format=output_format)
+    if jobs is None:
+        driver = setup_driver()
+        try:
+            jobs = get_category_jobs(driver, BASE_DIRECTORY, output_format=output_format)
+        finally:
+            driver.quit()
+        save_category_jobs(jobs, BASE_DIRECTORY)
+    return jobs
+
+
+def seed_frontier(frontier: Frontier, output_format: str = "csv") -> int:
+    """Queues every sub-subcategory in a crawl frontier.
+
+    Args:
+        frontier (Frontier): The Frontier to queue the categories in.
+        output_format (str): "csv", "parquet" or "history".
+
+    Returns:
+        int: The number of new jobs.
+    """
+    jobs = list_category_jobs(output_format)
+    return sum(
+        frontier.add("neptun", category_name(job.directory, job.filename), job.link,
+                     {"directory": job.directory, "filename": job.filename, "output_format": job.output_format})
+        for job in jobs
+    )
+
+
+def work_frontier(frontier: Frontier, owner: str = None, poll_interval: float = 5.0) -> int:
+    """Claims sub-subcategories from a crawl frontier and scrapes them until none is left.
+
+    A whole sub-subcategory is one job, since its pages are requested
+    together. The browser is started for the first job and kept for the
+    following jobs. A browser that crashes is replaced and its job is given
+    back to the frontier. The lease of a job is renewed while it runs; if it
+    is lost to another worker anyway, the job stops before its next page.
+
+    Args:
+        frontier (Frontier): The Frontier to claim jobs from.
+        owner (str): The name of the worker. Defaults to frontier.worker_name().
+        poll_interval (float): Seconds to wait before looking for new jobs
+            again while other workers hold leases.
+
+    Returns:
+        int: The number of sub-subcategories scraped.
+    """
+    driver = None
+    done = 0
+
+    try:
+        while True:
+            claimed = frontier.claim(owner, sites=["neptun"])
+            if claimed is None:
+                if not frontier.unfinished(["neptun"]):
+                    return done
+                time.sleep(poll_interval)
+                continue
+
+            job = CategoryJob(claimed.url, claimed.data["directory"], claimed.data["filename"],
+                              claimed.data.get("output_format", "csv"))
+            try:
+                with frontier.heartbeat(claimed) as lost:
+                    job.cancelled = lost
+                    if driver is None:
+                        driver = setup_driver()
+                    run_job(job, driver)
+            except LeaseLost as error:
+                print(error)
+                continue
+            except WebDriverException as error:
+                print(f"Browser crashed on {job.link}: {error.msg}")
+                if driver is not None:
+                    try:
+                        driver.quit()
+                    except WebDriverException:
+                        pass
+                driver = None
+                frontier.fail(claimed, error.msg or "browser crashed")
+                continue
+            except Exception as error:
+                print(f"Job {job.link} failed: {error}")
+                frontier.fail(claimed, str(error))
+                continue
+            if frontier.complete(claimed):
+                done += 1
+    finally:
+        if driver is not None:
+            driver.quit()
+
+
+def main(workers: int = None, output_format: str = "csv") -> None:
+    """Main function to initiate scraping.
+
+    The category menu is read from CATEGORY_CACHE while it is younger than
+    CATEGORY_TTL. Otherwise it is read from the homepage, and that browser
+    goes on to serve the first worker of the pool.
+
+    Args:
+        workers (int): The number of browsers to run in parallel. Defaults to
+            the number of CPU cores.
+        output_format (str): "csv", "parquet" or "history".
+    """
+    driver = None
+    jobs = load_category_jobs(BASE_DIRECTORY, output_format=output_format)
+    if jobs is None:
+        driver = setup_driver()
+        try:
+            jobs = get_category_jobs(driver, BASE_DIRECTORY, output_format=output_format)
+        except BaseException:
+            driver.quit()
+            raise
+        save_category_jobs(jobs, BASE_DIRECTORY)
     
-    driver.quit()
+    fingerprints = page_fingerprints.enable()
+    with metrics.from_environment(), parse_pool.enable():
+        failed = run_browser_pool(jobs, workers=workers or os.cpu_count() or 1, driver=driver)
+    for job in failed:
+        print(f"Giving up on {job.link} after {job.attempts} attempts")
+    print(fingerprints.report())
 
 
 if __name__ == "__main__":
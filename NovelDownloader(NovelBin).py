@@ -1,44 +1,186 @@
+import asyncio
 import os
 import re
-import time
+from urllib.parse import urlsplit
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import requests
 from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 
+from async_crawl import AsyncCrawler
+import browser
+from chapter_archive import ChapterArchive
+import fetch
+import parse_pool
+from parsed_page import ParsedPage
 
-def setup(url: str, pattern: re.Pattern, directory: str) -> None:
-    """Sets up the Chrome WebDriver, navigates to the given URL, and processes links matching the pattern.
+TIMEOUT = 20
+MAX_CONCURRENCY = 8
+# The parts of a chapter page that are parsed: the breadcrumb names, the
+# third of which is the chapter title, and the paragraphs.
+CHAPTER_REGIONS = {
+    "names": SoupStrainer("span", itemprop="name"),
+    "paragraphs": SoupStrainer("p"),
+}
+
+
+def setup(url: str, pattern: re.Pattern, directory: str, max_concurrency: int = MAX_CONCURRENCY,
+          output_format: str = "txt") -> int:
+    """Collects the chapter links of a novel and downloads the chapters concurrently.
+
+    The links are read over plain HTTP, and Chrome is only started if that
+    finds none.
 
     Args:
         url: The URL to scrape for chapter links.
         pattern: A compiled regular expression pattern to match valid chapter URLs.
         directory: The directory to save the downloaded chapters.
+        max_concurrency: The maximum number of chapters downloaded at once.
+        output_format: "txt" for one text file per chapter, or "archive" for
+            one ChapterArchive in the directory.
+
+    Returns:
+        The number of chapters saved.
+    """
+    links = get_chapter_links(url, pattern)
+    if not links:
+        print("No chapter links over HTTP, falling back to Selenium")
+        links = get_chapter_links_with_browser(url, pattern)
+
+    urls = [href.replace("novelbin.me/novel-", "fast.novelupdates.net/") for href in links]
+    return asyncio.run(download_chapters(urls, directory, max_concurrency=max_concurrency,
+                                         output_format=output_format))
+
+
+def chapter_archive_url(url: str) -> str:
+    """Returns the URL of the endpoint that serves the full chapter list of a novel page.
+
+    The chapter tab of a novel page at /b/<novel id> loads its list from
+    /ajax/chapter-archive?novelId=<novel id>.
+    """
+    parts = urlsplit(url)
+    novel_id = parts.path.rstrip("/").rsplit("/", 1)[-1]
+    return f"{parts.scheme}://{parts.netloc}/ajax/chapter-archive?novelId={novel_id}"
+
+
+def match_links(content: bytes, pattern: re.Pattern) -> list[str]:
+    """Returns the links of a page that match the chapter pattern, in page order and without duplicates.
+
+    Only the <a> tags of the page are parsed.
+    """
+    soup = BeautifulSoup(content, features="lxml", parse_only=SoupStrainer("a", href=True))
+    links = (link["href"] for link in soup.find_all("a", href=True))
+    return list(dict.fromkeys(href for href in links if pattern.match(href)))
+
+
+def get_chapter_links(url: str, pattern: re.Pattern) -> list[str]:
+    """Collects the chapter links over plain HTTP.
+
+    The novel page is tried first, then the chapter archive endpoint behind
+    its chapter tab.
+
+    Args:
+        url: The URL of the novel page.
+        pattern: A compiled regular expression pattern to match valid chapter URLs.
+
+    Returns:
+        The chapter URLs, or an empty list if neither response has any.
+    """
+    for source in (url, chapter_archive_url(url)):
+        try:
+            response = fetch.get(source)
+        except requests.RequestException as error:
+            print(f"Couldn't read {source}: {error}")
+            continue
+
+        if response.status_code == 200:
+            links = match_links(response.content, pattern)
+            if links:
+                return links
+    return []
+
+
+def get_chapter_links_with_browser(url: str, pattern: re.Pattern) -> list[str]:
+    """Collects the chapter links by rendering the novel page and opening its chapter tab in Chrome.
+
+    Args:
+        url: The URL of the novel page.
+        pattern: A compiled regular expression pattern to match valid chapter URLs.
+
+    Returns:
+        The chapter URLs.
+    """
+    driver = browser.create_driver()
+    try:
+        driver.get(url)
+
+        WebDriverWait(driver, TIMEOUT).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "button"))).click()
+        return WebDriverWait(driver, TIMEOUT).until(lambda driver: chapter_links(driver, pattern))
+    finally:
+        driver.quit()
+
+
+def chapter_links(driver: webdriver.Chrome, pattern: re.Pattern) -> list[str]:
+    """Returns the links on the page that match the chapter pattern, used as a wait condition.
+
+    Args:
+        driver: The WebDriver showing the chapter list.
+        pattern: A compiled regular expression pattern to match valid chapter URLs.
+
+    Returns:
+        The matching URLs in page order, empty while the list isn't loaded.
     """
-    options = Options()
-    options.add_argument("--headless")  # Run in headless mode for efficiency
-    driver = webdriver.Chrome(ChromeDriverManager().install(), options=options)
-    driver.get(url)
+    hrefs = driver.execute_script("return Array.from(document.links, link => link.href);")
+    return [href for href in hrefs if href and pattern.match(href)]
 
-    wait(3)
 
-    selector = driver.find_element(By.CSS_SELECTOR, "button")
-    selector.click()
+async def download_chapters(urls: list[str], directory: str, max_concurrency: int = MAX_CONCURRENCY,
+                            output_format: str = "txt") -> int:
+    """Downloads chapters concurrently through one AsyncCrawler.
 
-    wait(3)
+    Chapters that fail are reported and skipped. In the archive output
+    format, the chapters are appended to the directory's ChapterArchive in
+    the order of the URLs, and chapters already in it aren't downloaded again.
 
-    links = driver.find_elements(By.CSS_SELECTOR, "a")
-    
-    for link in links:
-        href = link.get_attribute("href")
-        if href and pattern.match(href):
-            new_url = href.replace("novelbin.me/novel-", "fast.novelupdates.net/")
-            get_chapter(new_url, directory)
+    Args:
+        urls: The chapter URLs, in novel order.
+        directory: The directory to save the chapters in.
+        max_concurrency: The maximum number of requests in flight.
+        output_format: "txt" for one text file per chapter, or "archive".
 
-    driver.quit()
+    Returns:
+        The number of chapters saved.
+
+    Raises:
+        ValueError: If the output format is unknown.
+    """
+    if output_format not in ("txt", "archive"):
+        raise ValueError(f"Unknown output format: {output_format}")
+
+    crawler = AsyncCrawler(max_concurrency=max_concurrency, per_host=max_concurrency)
+    archive = ChapterArchive(directory) if output_format == "archive" else None
+    chapters = [(number, url) for number, url in enumerate(urls) if archive is None or url not in archive]
+
+    async def download(number: int, url: str) -> None:
+        response = await crawler.fetch(url)
+        await crawler.run(save_chapter, response, url, directory, archive, number)
+
+    try:
+        results = await asyncio.gather(*(download(number, url) for number, url in chapters), return_exceptions=True)
+    finally:
+        if archive is not None:
+            archive.close()
+
+    saved = 0
+    for (_, url), result in zip(chapters, results):
+        if isinstance(result, Exception):
+            print(f"Skipping chapter {url}: {result}")
+        else:
+            saved += 1
+    return saved
 
 
 def get_chapter(url: str, directory: str) -> None:
@@ -48,34 +190,51 @@ def get_chapter(url: str, directory: str) -> None:
         url: The chapter URL to scrape.
         directory: The directory to save the chapter as a text file.
     """
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.content, features="lxml")
-        paragraphs = soup.find_all("p")
-        title_element = soup.find_all("span", itemprop="name")[2]
-        
-        if title_element:
-            title = title_element.get_text().strip()
-            valid_title = re.sub(r'[\/:*?"<>|]', "", title).title()
-            file_path = os.path.join(directory, f"{valid_title}.txt")
-
-            with open(file_path, "w", encoding="utf-8") as file:
-                for paragraph in paragraphs:
-                    file.write(paragraph.get_text() + "\n\n")
-        else:
-            raise ValueError(f"No title found for URL: {url}")
-    else:
-        raise Exception(f"Failed to retrieve the webpage. Status code: {response.status_code}")
+    save_chapter(fetch.get(url), url, directory)
 
 
-def wait(seconds: int) -> None:
-    """Pauses execution for a given number of seconds.
+def parse_chapter(content: bytes) -> tuple[str | None, list[str]]:
+    """Parses a chapter page. Runs in a worker process when the parse pool is enabled.
 
     Args:
-        seconds: The number of seconds to wait.
+        content: The HTML of the chapter page.
+
+    Returns:
+        The title of the chapter, or None if it has none, and the texts of its paragraphs.
     """
-    time.sleep(seconds)
+    page = ParsedPage(content, CHAPTER_REGIONS)
+    names = page.region("names")
+    title = names[2].get_text().strip() if len(names) > 2 else None
+    return title, [paragraph.get_text() for paragraph in page.region("paragraphs")]
+
+
+def save_chapter(response: requests.Response, url: str, directory: str, archive: ChapterArchive = None,
+                 number: int = None) -> None:
+    """Saves a downloaded chapter as a text file in the specified directory.
+
+    Args:
+        response: The response of the chapter URL.
+        url: The chapter URL.
+        directory: The directory to save the chapter as a text file.
+        archive: The ChapterArchive to append the chapter to instead of
+            writing a text file, if any.
+        number: The position of the chapter in the novel, for the archive.
+    """
+    if response.status_code != 200:
+        raise Exception(f"Failed to retrieve the webpage. Status code: {response.status_code}")
+
+    title, paragraphs = parse_pool.parse(parse_chapter, response.content)
+    if not title:
+        raise ValueError(f"No title found for URL: {url}")
+
+    valid_title = re.sub(r'[\/:*?"<>|]', "", title).title()
+    text = "".join(paragraph + "\n\n" for paragraph in paragraphs)
+    if archive is not None:
+        archive.add(url, title, text, file=f"{valid_title}.txt", number=number)
+        return
+
+    with open(os.path.join(directory, f"{valid_title}.txt"), "w", encoding="utf-8") as file:
+        file.write(text)
 
 
 def main() -> None:
@@ -88,7 +247,8 @@ def main() -> None:
     url = "https://novelbin.com/b/i-became-a-flashing-genius-at-the-magic-academy#tab-chapters-title"
     pattern = re.compile(r"https://fast.novelupdates.net/book/i-became-a-flashing-genius-at-the-magic-academy/chapter-[\w-]+")
 
-    setup(url=url, pattern=pattern, directory=directory)
+    saved = setup(url=url, pattern=pattern, directory=directory)
+    print(f"{saved} chapters have been saved in the folder: {directory}")
 
 if __name__ == "__main__":
     main()
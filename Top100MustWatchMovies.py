@@ -1,7 +1,8 @@
 import re
 
 from bs4 import BeautifulSoup
-import requests
+
+import fetch
 
 
 def remove_numbers_before_first_parenthesis(input_string: str) -> str:
@@ -35,7 +36,7 @@ def remove_numbers_before_first_parenthesis(input_string: str) -> str:
 def main() -> None:
     """Fetches a list of movies from a webpage and saves them to a text file."""
     url = "https://web.archive.org/web/20200518073855/https://www.empireonline.com/movies/features/best-movies-2/"
-    response = requests.get(url)
+    response = fetch.get(url)
 
     if response.status_code == 200:
         soup = BeautifulSoup(response.content, "lxml")
@@ -0,0 +1,51 @@
+import asyncio
+from urllib.parse import urlsplit
+
+import requests
+
+import fetch
+
+
+class AsyncCrawler:
+    """Runs blocking HTTP requests from asyncio code through one shared client.
+
+    Requests go through the shared session of the fetch module. The number of
+    requests in flight is limited globally and per host, and each request runs
+    in a worker thread so that downloads and parsing of different pages
+    overlap.
+    """
+
+    def __init__(self, max_concurrency: int = 8, per_host: int = 6) -> None:
+        """Initializes the crawler.
+
+        Args:
+            max_concurrency: The maximum number of requests in flight overall.
+            per_host: The maximum number of requests in flight to one host.
+        """
+        self.per_host = per_host
+        self._global_limit = asyncio.Semaphore(max_concurrency)
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        """Returns the semaphore that limits requests to the host of a URL."""
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def fetch(self, url: str, **kwargs) -> requests.Response:
+        """Sends a GET request without blocking the event loop.
+
+        Args:
+            url: The URL to fetch.
+            **kwargs: Extra arguments passed on to fetch.get.
+
+        Returns:
+            The Response object of the request.
+        """
+        async with self._global_limit, self._host_limit(url):
+            return await asyncio.to_thread(fetch.get, url, **kwargs)
+
+    async def run(self, func, *args, **kwargs):
+        """Runs a blocking function, such as a parser, in a worker thread."""
+        return await asyncio.to_thread(func, *args, **kwargs)
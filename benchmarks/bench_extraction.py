@@ -0,0 +1,69 @@
+"""Benchmarks the product-card extractor against the old nested div scan.
+
+Run from the repository root:
+
+    python benchmarks/bench_extraction.py
+"""
+import glob
+import os
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from extraction import clean_price, extract_products
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'tests', 'fixtures', 'globe')
+
+
+def legacy_extract_products(soup: BeautifulSoup) -> list[tuple[str, str, str]]:
+    """The original extractor: scans every div and deduplicates the results."""
+    seen_products = set()
+    rows = []
+
+    for product in soup.find_all("div"):
+        title_element = product.find("a", class_="product-title")
+        price_element = product.find("span", class_="ty-price-num")
+        old_price_element = product.find("bdi")
+
+        if title_element and price_element and old_price_element:
+            title = title_element.get_text(strip=True).strip()
+            current_price = clean_price(price_element.get_text(strip=True))
+            old_price = clean_price(old_price_element.get_text(strip=True))
+
+            if old_price == '-' or old_price == "Home":
+                continue
+
+            product_entry = (title, current_price, old_price)
+            if product_entry not in seen_products:
+                seen_products.add(product_entry)
+                rows.append(product_entry)
+
+    return rows
+
+
+def bench(extractor, soup: BeautifulSoup, number: int) -> float:
+    """Returns the best time per call in milliseconds."""
+    timings = timeit.repeat(lambda: extractor(soup), number=number, repeat=5)
+    return min(timings) / number * 1000
+
+
+def main() -> None:
+    """Runs both extractors over every fixture page and prints the timings."""
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+        with open(path, 'rb') as file:
+            soup = BeautifulSoup(file.read(), features="lxml")
+
+        if extract_products(soup) != legacy_extract_products(soup):
+            raise AssertionError(f"Extractors disagree on {path}")
+
+        legacy_ms = bench(legacy_extract_products, soup, number=3)
+        new_ms = bench(extract_products, soup, number=20)
+        print(f"{os.path.basename(path)}: legacy {legacy_ms:.2f} ms, "
+              f"single-pass {new_ms:.2f} ms, speedup {legacy_ms / new_ms:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+"""Benchmarks the scrapers end to end against recorded pages on a local server.
+
+The recorded Globe and Shpresa.al listing pages and LightNovelWorld
+chapter pages in tests/fixtures are replayed by a ReplayServer, with an
+optional latency and jitter per response, and each scraper entry point is run
+against them. Every scenario serves a number of copies of its category or
+novel, so a run covers more pages than the fixtures hold.
+
+Each scenario runs in a fresh process so its peak RSS is its own. The results
+can be saved as JSON and compared with a saved baseline; the comparison exits
+with status 1 if a metric got worse by more than the tolerance.
+
+Run from the repository root:
+
+    python benchmarks/bench_scrapers.py --latency 0.05 --jitter 0.02 --save baseline.json
+    python benchmarks/bench_scrapers.py --latency 0.05 --jitter 0.02 --baseline baseline.json
+"""
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import csv
+from datetime import datetime, timezone
+import glob
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from replay_server import Recording, ReplayServer
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'tests', 'fixtures')
+
+# Whether a higher value of a metric is better, for the baseline comparison.
+METRICS = {
+    "pages_per_second": True,
+    "rows_per_second": True,
+    "parse_ms_per_page": False,
+    "peak_rss_mb": False,
+}
+
+
+class Scenario:
+    """Describes the recorded pages of one scraper and how to run it against them."""
+    def __init__(self, routes: dict[str, str], replacements: dict[bytes, str], run) -> None:
+        """Initializes a Scenario.
+
+        Args:
+            routes: Mapping of URL paths to fixture files. {copy} in a path
+                stands for the name of the copy being served.
+            replacements: Strings in the fixtures replaced in every copy,
+                mostly absolute links to the real site. {url} stands for the
+                base URL of the server and {copy} for the copy.
+            run: Function taking the server URL, the copy names and an output
+                directory that scrapes the copies and returns the number of
+                rows saved.
+        """
+        self.routes = routes
+        self.replacements = replacements
+        self.run = run
+
+    def recordings(self, url: str, copies: list[str]) -> dict[str, Recording]:
+        """Returns the recorded responses of every copy, rewritten to the server URL."""
+        recordings = {}
+        for copy in copies:
+            for path, name in self.routes.items():
+                with open(os.path.join(FIXTURES, name), 'rb') as file:
+                    body = file.read()
+                for old, new in self.replacements.items():
+                    body = body.replace(old, new.format(url=url, copy=copy).encode())
+                content_type = "application/json" if name.endswith(".json") else "text/html; charset=utf-8"
+                recordings[path.format(copy=copy)] = Recording(body, content_type)
+        return recordings
+
+
+class ParseTimer:
+    """Adds up the time spent in parse functions across all threads.
+
+    This is the wall time of the calling threads, so it includes waiting for
+    the GIL or for the parse pool: the time the fetchers lose to parsing.
+    """
+    def __init__(self) -> None:
+        """Initializes a ParseTimer with no time recorded."""
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def wrap(self, func):
+        """Returns func wrapped so that its running time is recorded."""
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.seconds += time.perf_counter() - start
+        return timed
+
+
+def count_csv_rows(directory: str) -> int:
+    """Counts the data rows of all CSV files below a directory."""
+    rows = 0
+    for path in glob.glob(os.path.join(directory, '**', '*.csv'), recursive=True):
+        with open(path, encoding='utf-8') as file:
+            rows += max(sum(1 for _ in csv.reader(file)) - 1, 0)
+    return rows
+
+
+def run_site(name: str, url: str, copies: list[str], directory: str) -> int:
+    """Crawls every copy as a category of a registered site with scraper.crawl."""
+    import scraper
+    from sites import SITES, Site
+
+    site = SITES[name]
+    bench_site = Site(site.name, f"{url}/{name}/", directory, {copy: f"{copy}.csv" for copy in copies},
+                      selectors=site.selectors, pagination=site.pagination, fieldnames=site.fieldnames,
+                      product_region=site.product_region, product_grid=site.product_grid)
+    asyncio.run(scraper.crawl([(bench_site, slug, filename) for slug, filename in bench_site.categories.items()]))
+    return count_csv_rows(directory)
+
+
+def run_lightnovelworld(url: str, copies: list[str], directory: str) -> int:
+    """Downloads every copy as a novel with download_chapters."""
+    import LightNovelWorldDataCollection as lightnovelworld
+
+    lightnovelworld.BASE_URL = url
+    saved = 0
+    for copy in copies:
+        response = lightnovelworld.request(f"{url}/novel/{copy}/chapters")
+        saved += lightnovelworld.download_chapters(response, os.path.join(directory, copy),
+                                                   requests_per_second=None)
+    return saved
+
+
+SCENARIOS = {
+    "globe": Scenario(
+        routes={
+            "/globe/{copy}/": "globe/telefonia_page1.html",
+            "/globe/{copy}/page-2/": "globe/elektroshtepiake_te_vogla_page15.html",
+            "/globe/{copy}/page-3/": "globe/elektroshtepiake_te_vogla_page15.html",
+        },
+        replacements={
+            b"https://globe.al/telefonia/": "{url}/globe/{copy}/",
+            b"https://globe.al/elektroshtepiake-te-vogla-sq/": "{url}/globe/{copy}/",
+        },
+        run=lambda url, copies, directory: run_site("globe", url, copies, directory),
+    ),
+    "shpresa": Scenario(
+        routes={
+            "/shpresa/{copy}/": "shpresa/fitness_page1.html",
+            "/shpresa/{copy}/page/2/": "shpresa/fitness_page2.html",
+        },
+        replacements={b"https://shop.shpresa.al/product-category/fitness/": "{url}/shpresa/{copy}/"},
+        run=lambda url, copies, directory: run_site("shpresa", url, copies, directory),
+    ),
+    "lightnovelworld": Scenario(
+        routes={
+            "/novel/{copy}/chapters": "lightnovelworld/chapters_page1.html",
+            "/novel/{copy}/chapters?page=2": "lightnovelworld/chapters_page2.html",
+            **{f"/novel/{{copy}}/chapter-{number}": f"lightnovelworld/chapter_{number}.html" for number in range(1, 6)},
+        },
+        replacements={b"/novel/shadow-slave-1365": "/novel/{copy}"},
+        run=run_lightnovelworld,
+    ),
+}
+
+
+def parse_targets(name: str) -> list[tuple[object, str]]:
+    """Lists the (owner, attribute) pairs of the functions that parse pages in a scenario."""
+    import parse_pool
+
+    if name in ("globe", "shpresa"):
+        import scraper
+        return [(parse_pool, "parse"), (scraper, "plan_pages")]
+    import LightNovelWorldDataCollection as lightnovelworld
+    return [(parse_pool, "parse"), (lightnovelworld, "get_chapter_links"),
+            (lightnovelworld, "get_chapter_pages"), (lightnovelworld, "get_page")]
+
+
+def peak_rss_mb() -> float:
+    """Returns the peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(name: str, url: str, copies: int, parse_processes: int = 0) -> dict:
+    """Runs one scenario against the server and measures it. Runs in a fresh process.
+
+    Args:
+        name: The name of the scenario.
+        url: The base URL of the ReplayServer.
+        copies: The number of categories or novels to scrape.
+        parse_processes: The number of parse pool processes, or 0 to parse
+            in the fetching threads.
+
+    Returns:
+        The rows saved, the seconds taken, the seconds spent parsing and the
+        peak RSS.
+    """
+    import parse_pool
+
+    timer = ParseTimer()
+    names = [f"copy-{number}" for number in range(copies)]
+
+    with tempfile.TemporaryDirectory() as directory, contextlib.ExitStack() as stack:
+        for owner, attribute in parse_targets(name):
+            stack.enter_context(patch.object(owner, attribute, timer.wrap(getattr(owner, attribute))))
+        if parse_processes:
+            stack.enter_context(parse_pool.enable(processes=parse_processes))
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+
+        start = time.perf_counter()
+        rows = SCENARIOS[name].run(url, names, directory)
+        seconds = time.perf_counter() - start
+
+    return {"rows": rows, "seconds": seconds, "parse_seconds": timer.seconds, "peak_rss_mb": peak_rss_mb()}
+
+
+def benchmark(names: list[str], copies: int, latency: float, jitter: float, parse_processes: int = 0) -> dict:
+    """Runs the scenarios one after the other and returns their metrics.
+
+    Args:
+        names: The names of the scenarios to run.
+        copies: The number of categories or novels each scenario scrapes.
+        latency: Seconds every response is delayed by.
+        jitter: Up to this many seconds are added to the delay at random.
+        parse_processes: The number of parse pool processes, or 0 to parse
+            in the fetching threads.
+
+    Returns:
+        The settings of the run and the metrics of every scenario.
+    """
+    results = {}
+    context = multiprocessing.get_context("spawn")
+
+    with ReplayServer(latency=latency, jitter=jitter) as server:
+        for name in names:
+            for path, recording in SCENARIOS[name].recordings(server.url, [
+                f"copy-{number}" for number in range(copies)
+            ]).items():
+                server.add(path, recording)
+
+            served = len(server.requests)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                measured = executor.submit(run_scenario, name, server.url, copies, parse_processes).result()
+            pages = len(server.requests) - served
+
+            results[name] = {
+                "pages": pages,
+                "rows": measured["rows"],
+                "seconds": round(measured["seconds"], 4),
+                "pages_per_second": round(pages / measured["seconds"], 2),
+                "rows_per_second": round(measured["rows"] / measured["seconds"], 2),
+                "parse_ms_per_page": round(measured["parse_seconds"] * 1000 / pages, 3) if pages else None,
+                "peak_rss_mb": round(measured["peak_rss_mb"], 1),
+            }
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "copies": copies,
+        "latency": latency,
+        "jitter": jitter,
+        "parse_processes": parse_processes,
+        "scenarios": results,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Prints the change of every metric against a baseline run.
+
+    Args:
+        results: The metrics of this run.
+        baseline: The metrics of the baseline run.
+        tolerance: The fraction a metric may get worse by before it counts
+            as a regression.
+
+    Returns:
+        The regressed metrics as "scenario.metric" names.
+    """
+    regressions = []
+    for name, metrics in results["scenarios"].items():
+        old_metrics = baseline["scenarios"].get(name)
+        if old_metrics is None:
+            print(f"{name}: not in the baseline")
+            continue
+
+        for metric, higher_is_better in METRICS.items():
+            new, old = metrics.get(metric), old_metrics.get(metric)
+            if not new or not old:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{name}.{metric}")
+            print(f"{name}.{metric}: {old} -> {new} ({change:+.1%}){flag}")
+
+    return regressions
+
+
+def main() -> None:
+    """Runs the benchmark with the options given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", help=f"the scenarios to run: {', '.join(SCENARIOS)}; all by default")
+    parser.add_argument("--copies", type=int, default=20, help="categories or novels per scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every response is delayed by")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds of delay")
+    parser.add_argument("--parse-processes", type=int, default=0,
+                        help="parse in a pool of this many processes, 0 to parse in the fetching threads")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results with this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="fraction a metric may get worse by before it is a regression")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    results = benchmark(args.scenarios or list(SCENARIOS), args.copies, args.latency, args.jitter,
+                        parse_processes=args.parse_processes)
+
+    for name, metrics in results["scenarios"].items():
+        print(f"{name}: {metrics['pages']} pages, {metrics['pages_per_second']} pages/s, "
+              f"{metrics['rows_per_second']} rows/s, {metrics['parse_ms_per_page']} ms parse/page, "
+              f"{metrics['peak_rss_mb']} MiB peak RSS")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+# URL patterns the browser doesn't load when resources are blocked: images,
+# fonts, stylesheets and the usual analytics and advertising hosts.
+BLOCKED_URLS = (
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.css",
+    "*google-analytics.com*", "*googletagmanager.com*", "*googlesyndication.com*", "*doubleclick.net*",
+    "*facebook.net*", "*facebook.com/tr*", "*hotjar.com*", "*clarity.ms*", "*tiktok.com*",
+)
+
+# Chrome preferences that stop images and notification prompts even before
+# the request blocking is set up.
+BLOCKING_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.default_content_setting_values.notifications": 2,
+}
+
+
+def chrome_options(headless: bool = True, block_resources: bool = True) -> Options:
+    """Builds the Chrome options for scraping.
+
+    With blocked resources, images are switched off and driver.get returns
+    once the document is parsed instead of waiting for every subresource, so
+    callers have to wait for the elements they need.
+
+    Args:
+        headless: Whether to run Chrome without a window.
+        block_resources: Whether to skip images and return from page loads early.
+
+    Returns:
+        The Options object.
+    """
+    options = Options()
+    options.add_argument("--disable-dev-shm-usage")
+    if headless:
+        options.add_argument("--headless")
+    if block_resources:
+        options.add_experimental_option("prefs", BLOCKING_PREFS)
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.page_load_strategy = "eager"
+    return options
+
+
+def block_urls(driver: webdriver.Chrome, patterns=BLOCKED_URLS) -> None:
+    """Makes the browser fail every request whose URL matches one of the patterns.
+
+    Uses the Network domain of the Chrome DevTools Protocol, so the blocked
+    requests never leave the browser.
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+
+
+def install_driver() -> str:
+    """Downloads the ChromeDriver that matches the installed Chrome, unless it is cached.
+
+    Resolve the path once before starting browsers from several threads, so
+    they don't download and unpack the driver into the same cache at once.
+
+    Returns:
+        The path of the ChromeDriver executable.
+    """
+    return ChromeDriverManager().install()
+
+
+def create_driver(headless: bool = True, block_resources: bool = True, blocked_urls=BLOCKED_URLS,
+                  driver_path: str = None) -> webdriver.Chrome:
+    """Starts a Chrome WebDriver for scraping.
+
+    Args:
+        headless: Whether to run Chrome without a window.
+        block_resources: Whether to block images, fonts, stylesheets and
+            tracking hosts and return from page loads early.
+        blocked_urls: The URL patterns blocked when resources are blocked.
+        driver_path: The ChromeDriver from install_driver. Defaults to
+            installing it now.
+
+    Returns:
+        The WebDriver.
+    """
+    service = Service(driver_path or install_driver())
+    driver = webdriver.Chrome(service=service, options=chrome_options(headless, block_resources))
+    if block_resources:
+        block_urls(driver, blocked_urls)
+    return driver
@@ -0,0 +1,286 @@
+import gzip
+import html
+import json
+import mmap
+import os
+import re
+import sys
+import threading
+import zipfile
+
+PACK_FILE = "chapters.pack"
+INDEX_FILE = "chapters.idx"
+CODECS = ("gzip", "zstd")
+
+
+def require_zstandard():
+    """Imports zstandard, which is only needed for the zstd codec."""
+    try:
+        import zstandard
+    except ImportError as error:
+        raise ImportError("The zstd codec requires zstandard: pip install zstandard") from error
+    return zstandard
+
+
+def default_codec() -> str:
+    """Returns "zstd" if zstandard is installed, otherwise "gzip"."""
+    try:
+        require_zstandard()
+    except ImportError:
+        return "gzip"
+    return "zstd"
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """Compresses one chapter with a codec of CODECS."""
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if codec == "zstd":
+        return require_zstandard().ZstdCompressor(level=10).compress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """Decompresses one chapter with a codec of CODECS."""
+    if codec == "gzip":
+        return gzip.decompress(data)
+    if codec == "zstd":
+        return require_zstandard().ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+class ChapterArchive:
+    """Stores the chapters of a novel in one append-only archive.
+
+    The chapters are compressed one at a time and appended to the pack file.
+    After each chapter, a JSON line with its URL, number, title, text file
+    name and the offset and length of its compressed bytes is appended to the
+    index file. A chapter is read through mmap from its offset, so no other
+    chapter is decompressed.
+
+    The index line is only written once the chapter is in the pack file, so
+    an interrupted download leaves at most unindexed bytes at the end of the
+    pack, which the next run writes after. A chapter that is added again is
+    appended again, and the latest copy wins.
+    """
+
+    def __init__(self, directory: str, codec: str = None) -> None:
+        """Opens the archive of a novel's folder, creating it on the first write.
+
+        Args:
+            directory: The folder the archive files are kept in.
+            codec: The codec new chapters are compressed with, one of CODECS.
+                Defaults to default_codec().
+        """
+        self.directory = directory
+        self.pack_path = os.path.join(directory, PACK_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.codec = codec or default_codec()
+        if self.codec not in CODECS:
+            raise ValueError(f"Unknown codec: {self.codec}")
+        self.entries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._pack = None
+        self._index = None
+        self._map = None
+
+        pack_size = os.path.getsize(self.pack_path) if os.path.exists(self.pack_path) else 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if entry["offset"] + entry["length"] <= pack_size:
+                        self.entries[entry["url"]] = entry
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, url: str, title: str, text: str, file: str = None, number: int = None) -> dict:
+        """Appends a chapter to the archive.
+
+        Args:
+            url: The URL the chapter was downloaded from.
+            title: The title of the chapter.
+            text: The text of the chapter, as it is written to its text file.
+            file: The name of the chapter's text file, used when the archive is
+                exported to text files. Defaults to the title.
+            number: The position of the chapter in the novel, used to keep the
+                chapters in order. Defaults to the order they were added in.
+
+        Returns:
+            The index entry of the chapter.
+        """
+        data = compress(text.encode("utf-8"), self.codec)
+
+        with self._lock:
+            if self._pack is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._pack = open(self.pack_path, "ab")
+                self._index = open(self.index_path, "a", encoding="utf-8")
+
+            offset = self._pack.seek(0, os.SEEK_END)
+            self._pack.write(data)
+            self._pack.flush()
+
+            entry = {
+                "url": url,
+                "number": len(self.entries) if number is None else number,
+                "title": title,
+                "file": file or f"{title}.txt",
+                "offset": offset,
+                "length": len(data),
+                "codec": self.codec,
+            }
+            self._index.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index.flush()
+            self.entries[url] = entry
+        return entry
+
+    def chapters(self) -> list[dict]:
+        """Returns the index entries of all chapters in novel order."""
+        return sorted(self.entries.values(), key=lambda entry: entry["number"])
+
+    def read(self, url: str) -> str:
+        """Reads the text of one chapter.
+
+        Raises:
+            KeyError: If the chapter isn't in the archive.
+        """
+        return self.read_entry(self.entries[url])
+
+    def read_entry(self, entry: dict) -> str:
+        """Reads the text of the chapter of an index entry."""
+        with self._lock:
+            end = entry["offset"] + entry["length"]
+            if self._map is None or len(self._map) < end:
+                if self._map is not None:
+                    self._map.close()
+                with open(self.pack_path, "rb") as file:
+                    self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            data = self._map[entry["offset"]:end]
+        return decompress(data, entry["codec"]).decode("utf-8")
+
+    def close(self) -> None:
+        """Closes the archive files."""
+        with self._lock:
+            for file in (self._pack, self._index, self._map):
+                if file is not None:
+                    file.close()
+            self._pack = self._index = self._map = None
+
+    def __enter__(self) -> "ChapterArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def export_txt(archive: ChapterArchive, directory: str) -> int:
+    """Writes every chapter of an archive to its own text file, as the scrapers do.
+
+    Args:
+        archive: The archive to export.
+        directory: The folder the text files are written to.
+
+    Returns:
+        The number of files written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    chapters = archive.chapters()
+    for entry in chapters:
+        with open(os.path.join(directory, entry["file"]), "w", encoding="utf-8") as file:
+            file.write(archive.read_entry(entry))
+    return len(chapters)
+
+
+def xhtml_chapter(title: str, text: str) -> str:
+    """Renders a chapter as an XHTML document, one <p> per paragraph."""
+    paragraphs = "\n".join(f"<p>{html.escape(paragraph)}</p>" for paragraph in re.split(r"\n\n+", text) if paragraph.strip())
+    return ('<?xml version="1.0" encoding="utf-8"?>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml">\n'
+            f"<head><title>{html.escape(title)}</title></head>\n"
+            f"<body>\n<h1>{html.escape(title)}</h1>\n{paragraphs}\n</body>\n</html>\n")
+
+
+def export_epub(archive: ChapterArchive, path: str, title: str) -> int:
+    """Writes the chapters of an archive to an EPUB 3 book.
+
+    Args:
+        archive: The archive to export.
+        path: The path of the EPUB file.
+        title: The title of the book.
+
+    Returns:
+        The number of chapters in the book.
+    """
+    chapters = archive.chapters()
+    names = [f"chapter-{position:05d}.xhtml" for position in range(1, len(chapters) + 1)]
+    manifest = "\n".join(f'<item id="c{position}" href="{name}" media-type="application/xhtml+xml"/>'
+                         for position, name in enumerate(names, 1))
+    spine = "\n".join(f'<itemref idref="c{position}"/>' for position in range(1, len(chapters) + 1))
+    toc = "\n".join(f'<li><a href="{name}">{html.escape(entry["title"])}</a></li>'
+                    for name, entry in zip(names, chapters))
+
+    with zipfile.ZipFile(path, "w") as book:
+        book.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        book.writestr("META-INF/container.xml", (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            '</rootfiles>\n</container>\n'
+        ), compress_type=zipfile.ZIP_DEFLATED)
+        book.writestr("OEBPS/content.opf", (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">\n'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+            f'<dc:identifier id="id">{html.escape(os.path.basename(archive.directory) or title)}</dc:identifier>\n'
+            f"<dc:title>{html.escape(title)}</dc:title>\n<dc:language>en</dc:language>\n"
+            '<meta property="dcterms:modified">2000-01-01T00:00:00Z</meta>\n</metadata>\n'
+            f'<manifest>\n<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>\n'
+            f"{manifest}\n</manifest>\n<spine>\n{spine}\n</spine>\n</package>\n"
+        ), compress_type=zipfile.ZIP_DEFLATED)
+        book.writestr("OEBPS/nav.xhtml", (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">\n'
+            f"<head><title>{html.escape(title)}</title></head>\n"
+            f'<body>\n<nav epub:type="toc"><ol>\n{toc}\n</ol></nav>\n</body>\n</html>\n'
+        ), compress_type=zipfile.ZIP_DEFLATED)
+        for name, entry in zip(names, chapters):
+            book.writestr(f"OEBPS/{name}", xhtml_chapter(entry["title"], archive.read_entry(entry)),
+                          compress_type=zipfile.ZIP_DEFLATED)
+
+    return len(chapters)
+
+
+def main() -> None:
+    """Exports the chapter archive of a novel's folder.
+
+    Usage:
+        python chapter_archive.py txt <novel folder> [output folder]
+        python chapter_archive.py epub <novel folder> [book.epub] [title]
+    """
+    if len(sys.argv) < 3 or sys.argv[1] not in ("txt", "epub"):
+        print(main.__doc__)
+        sys.exit(2)
+
+    command, directory = sys.argv[1], sys.argv[2]
+    with ChapterArchive(directory) as archive:
+        if command == "txt":
+            output = sys.argv[3] if len(sys.argv) > 3 else directory
+            print(f"Wrote {export_txt(archive, output)} chapters to {output}")
+            return
+
+        name = os.path.basename(os.path.normpath(directory))
+        path = sys.argv[3] if len(sys.argv) > 3 else f"{name}.epub"
+        title = sys.argv[4] if len(sys.argv) > 4 else name.replace("-", " ").title()
+        print(f"Wrote {export_epub(archive, path, title)} chapters to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import re
+from typing import Callable
+
+from bs4 import BeautifulSoup, Tag
+
+
+def clean_price(text: str) -> str:
+    """Normalizes a scraped price string to the format used in the CSV files.
+
+    Args:
+        text: The raw price text, e.g. "12.990 Lekë".
+
+    Returns:
+        The price without the currency and with "," as thousands separator.
+    """
+    return text.replace("Lekë", "").replace(".", ",").strip()
+
+
+def digits_price(text: str) -> str:
+    """Normalizes a scraped price string to bare digits.
+
+    Args:
+        text: The raw price text, e.g. "1.690 Lekë".
+
+    Returns:
+        The price without currency and separators, e.g. "1690".
+    """
+    return re.sub(r"\D", "", text)
+
+
+def parse_price(text: str) -> int | None:
+    """Parses a scraped price into whole Lek.
+
+    Both "," and "." are thousands separators on the scraped sites.
+
+    Args:
+        text: The price text, e.g. "12,990", "12.990 Lekë" or "N/A".
+
+    Returns:
+        The price as an integer, or None if the text holds no price.
+    """
+    digits = re.sub(r"\D", "", text or "")
+    return int(digits) if digits else None
+
+
+class CardSelectors:
+    """Describes where a shop's category page keeps the parts of a product card.
+
+    Every selector is a (tag name, class) pair, where a class of None matches
+    any element with that tag name.
+    """
+    def __init__(self, title: tuple[str, str], price: tuple[str, str], old_price: tuple[str, str] = None,
+                 card_tag: str = "div", price_format: Callable[[str], str] = clean_price,
+                 sale_price: tuple[str, str] = None) -> None:
+        """Initializes the selectors.
+
+        Args:
+            title: The element holding the product title.
+            price: The element holding the current price.
+            old_price: The element holding the old price, or None if the shop
+                only shows one price.
+            card_tag: The tag name of the element wrapping a product card.
+            price_format: Turns the price text into the format of the shop's
+                CSV files.
+            sale_price: The element that wraps the current price of a product
+                on sale, next to the struck-out regular price, or None. The
+                price inside it is taken when a card has one.
+        """
+        self.title = title
+        self.price = price
+        self.old_price = old_price
+        self.card_tag = card_tag
+        self.price_format = price_format
+        self.sale_price = sale_price
+
+
+CS_CART = CardSelectors(title=("a", "product-title"), price=("span", "ty-price-num"), old_price=("bdi", None))
+
+
+def _find(element: Tag, selector: tuple[str, str], **kwargs):
+    """Finds the first element matching a (tag name, class) selector."""
+    name, class_ = selector
+    if class_ is None:
+        return element.find(name, **kwargs)
+    return element.find(name, class_=class_, **kwargs)
+
+
+def find_product_card(title_element: Tag, selectors: CardSelectors = CS_CART) -> Tag | None:
+    """Finds the product card that a product title belongs to.
+
+    The card is the innermost enclosing card element that also holds a price
+    and, if the shop has one, an old price. Containers that hold more than one
+    product title are never treated as a card.
+
+    Args:
+        title_element: The title element of a product.
+        selectors: The card selectors of the shop.
+
+    Returns:
+        The card element, or None if the title is not inside a complete card.
+    """
+    title_name, title_class = selectors.title
+    for card in title_element.find_parents(selectors.card_tag):
+        if len(card.find_all(title_name, class_=title_class, limit=2)) > 1:
+            return None
+        if _find(card, selectors.price) and (selectors.old_price is None or _find(card, selectors.old_price)):
+            return card
+    return None
+
+
+def extract_products(soup: BeautifulSoup, selectors: CardSelectors = CS_CART) -> list[tuple[str, str, str]]:
+    """Extracts (title, current price, old price) rows from a category page.
+
+    Every product card is visited exactly once, so the rows come out in page
+    order without the need for deduplication.
+
+    Args:
+        soup: BeautifulSoup object containing the HTML content.
+        selectors: The card selectors of the shop. Defaults to the CS-Cart
+            markup of Globe.
+
+    Returns:
+        A list of (title, current price, old price) tuples. The old price is
+        "N/A" for shops that only show one price.
+    """
+    rows = []
+    title_name, title_class = selectors.title
+
+    for title_element in soup.find_all(title_name, class_=title_class):
+        card = find_product_card(title_element, selectors)
+        if card is None:
+            continue
+
+        sale_element = _find(card, selectors.sale_price) if selectors.sale_price else None
+        price_element = _find(sale_element, selectors.price) if sale_element is not None else None
+        if price_element is None:
+            price_element = _find(card, selectors.price)
+        old_price_element = _find(card, selectors.old_price) if selectors.old_price else None
+
+        title = title_element.get_text(strip=True).strip()
+        current_price = selectors.price_format(price_element.get_text(strip=True))
+        old_price = selectors.price_format(old_price_element.get_text(strip=True)) if old_price_element else "N/A"
+
+        if old_price == '-' or old_price == "Home":
+            continue
+
+        rows.append((title, current_price, old_price))
+
+    return rows
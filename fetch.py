@@ -0,0 +1,173 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from http_cache import CACHE_DIRECTORY, MAX_BYTES, HttpCache
+import metrics
+
+DEFAULT_TIMEOUT = (10, 30)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HostRateLimiter:
+    """Spaces out requests so that no host gets more than a set request rate."""
+
+    def __init__(self, default_rate: float = None) -> None:
+        """Initializes the rate limiter.
+
+        Args:
+            default_rate: Requests per second allowed for hosts without their
+                own limit. None means no limit.
+        """
+        self.default_rate = default_rate
+        self._rates: dict[str, float] = {}
+        self._next_slot: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def set_rate(self, host: str, rate: float) -> None:
+        """Sets the allowed requests per second for one host."""
+        with self._lock:
+            self._rates[host] = rate
+
+    def wait(self, url: str) -> None:
+        """Blocks until a request to the host of the URL is allowed."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            rate = self._rates.get(host, self.default_rate)
+            if not rate:
+                return
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + 1 / rate
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def create_session(pool_size: int = 16, retries: int = 5, backoff_factor: float = 1.0) -> requests.Session:
+    """Creates a session with keep-alive connection pooling and retries.
+
+    Failed connections and responses with a status in RETRY_STATUSES are
+    retried with exponential backoff. A Retry-After header sent by the server
+    takes precedence over the backoff delay.
+
+    Args:
+        pool_size: The number of connections kept alive per host.
+        retries: The maximum number of retries for one request.
+        backoff_factor: The base delay in seconds of the exponential backoff.
+
+    Returns:
+        A configured requests.Session.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+rate_limiter = HostRateLimiter()
+cache = None
+
+
+def get_session() -> requests.Session:
+    """Returns the session shared by all scrapers, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def configure(pool_size: int = 16, retries: int = 5, backoff_factor: float = 1.0,
+              rate_limits: dict[str, float] = None, default_rate: float = None) -> None:
+    """Replaces the shared session and rate limits.
+
+    Args:
+        pool_size: The number of connections kept alive per host.
+        retries: The maximum number of retries for one request.
+        backoff_factor: The base delay in seconds of the exponential backoff.
+        rate_limits: Requests per second allowed per host name.
+        default_rate: Requests per second allowed for all other hosts.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = create_session(pool_size=pool_size, retries=retries, backoff_factor=backoff_factor)
+
+    rate_limiter.default_rate = default_rate
+    for host, rate in (rate_limits or {}).items():
+        rate_limiter.set_rate(host, rate)
+
+
+def enable_cache(directory: str = CACHE_DIRECTORY, max_bytes: int = MAX_BYTES,
+                 ttl: list[tuple[str, float]] = None) -> HttpCache:
+    """Sends all following requests through an on-disk HTTP cache.
+
+    Args:
+        directory: The cache directory.
+        max_bytes: The maximum total size of the cached bodies.
+        ttl: (regular expression, seconds) rules for how long the entries of
+            matching URLs are served without revalidation.
+
+    Returns:
+        The HttpCache in use.
+    """
+    global cache
+    cache = HttpCache(directory=directory, max_bytes=max_bytes, ttl=ttl)
+    return cache
+
+
+def get(url: str, headers: dict = None, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """Sends a GET request through the shared session.
+
+    When the cache is enabled, the request goes through it and the response
+    may come from disk; its from_cache attribute tells which.
+
+    Args:
+        url: The URL to send the GET request to.
+        headers: Optional HTTP headers to include in the request.
+        timeout: The connect and read timeout in seconds.
+        **kwargs: Extra arguments passed on to requests.
+
+    Returns:
+        The Response object. Its status code may still be an error status if
+        all retries were used up.
+    """
+    with metrics.stage("fetch"):
+        response = _get(url, headers=headers, timeout=timeout, **kwargs)
+    metrics.record_response(response)
+    return response
+
+
+def _get(url: str, headers: dict = None, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """Sends a GET request through the cache if it is enabled, see get."""
+    if cache is None:
+        rate_limiter.wait(url)
+        return get_session().get(url, headers=headers, timeout=timeout, **kwargs)
+
+    params = kwargs.pop("params", None)
+    full_url = requests.Request("GET", url, params=params).prepare().url
+
+    def send(request_url: str, request_headers: dict) -> requests.Response:
+        rate_limiter.wait(request_url)
+        return get_session().get(request_url, headers=request_headers, timeout=timeout, **kwargs)
+
+    return cache.get(send, full_url, headers=headers)
@@ -0,0 +1,330 @@
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+DATABASE = "crawl_frontier.sqlite3"
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+STATES = ("pending", "leased", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    category TEXT NOT NULL,
+    url TEXT NOT NULL,
+    data TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires_at REAL,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (site, url)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+"""
+
+CLAIM_QUERY = """
+UPDATE jobs SET state = 'leased', owner = :owner, lease_expires_at = :now + :lease,
+    attempts = attempts + 1, updated_at = :now
+WHERE id = (
+    SELECT id FROM jobs
+    WHERE (state = 'pending' OR (state = 'leased' AND lease_expires_at < :now)) {sites}
+    ORDER BY id LIMIT 1
+)
+RETURNING id, site, category, url, data, attempts, owner
+"""
+
+
+class LeaseLost(Exception):
+    """Raised by a worker that stops a job because its lease went to another worker."""
+
+
+def worker_name() -> str:
+    """Returns a name for the calling thread that is unique across hosts, e.g. "node1:4242:1"."""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class Job:
+    """A page or category claimed from the frontier."""
+    def __init__(self, job_id: int, site: str, category: str, url: str, data: dict, attempts: int,
+                 owner: str) -> None:
+        """Initializes a Job with the values of its row."""
+        self.id = job_id
+        self.site = site
+        self.category = category
+        self.url = url
+        self.data = data
+        self.attempts = attempts
+        self.owner = owner
+
+
+class Frontier:
+    """Persistent queue of crawl jobs that any number of workers take leases on.
+
+    A job is a (site, category, URL) with the data its worker needs, e.g.
+    the output file. Every URL is queued once per site. Workers claim a job
+    with a lease; a job whose lease runs out before it is completed, because
+    its worker crashed or left, can be claimed by another worker. A job is
+    tried max_attempts times before it is marked as failed.
+
+    The frontier lives in one SQLite database, so workers can join or leave
+    at any time and a crashed crawl continues from where it stopped. Worker
+    processes on other hosts need the database on a filesystem with working
+    locks. Jobs are done at least once: a job whose worker dies after the
+    work but before completing it is done again.
+    """
+
+    def __init__(self, path: str = DATABASE, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS) -> None:
+        """Opens the frontier, creating the database file if needed.
+
+        Args:
+            path: The path of the SQLite database file.
+            lease_seconds: How long a claimed job stays with its worker.
+            max_attempts: How many times a job is claimed before it fails.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def add(self, site: str, category: str, urls, data: dict = None) -> int:
+        """Queues pages of a category, skipping URLs the site already has a job for.
+
+        Args:
+            site: The name of the site.
+            category: The category of the pages.
+            urls: The URLs, or a single URL.
+            data: JSON data the worker needs for the jobs.
+
+        Returns:
+            The number of new jobs.
+        """
+        if isinstance(urls, str):
+            urls = [urls]
+        encoded = json.dumps(data or {}, ensure_ascii=False)
+        now = time.time()
+
+        with self._lock, self._connection:
+            cursor = self._connection.executemany(
+                "INSERT OR IGNORE INTO jobs (site, category, url, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(site, category, url, encoded, now) for url in urls if url]
+            )
+            return cursor.rowcount
+
+    def claim(self, owner: str = None, sites: list[str] = None) -> Job | None:
+        """Leases the oldest job that is pending or whose lease ran out.
+
+        Jobs whose lease ran out on their last attempt are marked as failed
+        first.
+
+        Args:
+            owner: The name of the worker. Defaults to worker_name().
+            sites: Only claim jobs of these sites. Defaults to all sites.
+
+        Returns:
+            The Job, or None if no job can be claimed now.
+        """
+        owner = owner or worker_name()
+        now = time.time()
+        parameters = {"owner": owner, "now": now, "lease": self.lease_seconds}
+        site_filter = ""
+        if sites:
+            parameters.update({f"site_{number}": site for number, site in enumerate(sites)})
+            site_filter = f"AND site IN ({', '.join(f':site_{number}' for number in range(len(sites)))})"
+        query = CLAIM_QUERY.format(sites=site_filter)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE jobs SET state = 'failed', owner = NULL, error = 'lease expired', updated_at = ? "
+                "WHERE state = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            row = self._connection.execute(query, parameters).fetchone()
+
+        if row is None:
+            return None
+        job_id, site, category, url, data, attempts, owner = row
+        return Job(job_id, site, category, url, json.loads(data), attempts, owner)
+
+    def renew(self, job: Job) -> bool:
+        """Extends the lease of a job that takes long.
+
+        Returns:
+            False if the lease was lost to another worker.
+        """
+        now = time.time()
+        return self._update(job, "UPDATE jobs SET lease_expires_at = ?, updated_at = ? "
+                                 "WHERE id = ? AND owner = ? AND state = 'leased'",
+                            (now + self.lease_seconds, now, job.id, job.owner))
+
+    @contextlib.contextmanager
+    def heartbeat(self, job: Job, interval: float = None):
+        """Renews the lease of a job from a background thread while the block runs.
+
+        Args:
+            job: The claimed job.
+            interval: Seconds between renewals. Defaults to a third of lease_seconds.
+
+        Yields:
+            A threading.Event that is set once a renewal fails because the
+            lease went to another worker. The worker should stop the job then.
+        """
+        interval = self.lease_seconds / 3 if interval is None else interval
+        lost = threading.Event()
+        stop = threading.Event()
+
+        def beat() -> None:
+            while not stop.wait(interval):
+                if not self.renew(job):
+                    lost.set()
+                    return
+
+        thread = threading.Thread(target=beat, name=f"heartbeat-{job.id}", daemon=True)
+        thread.start()
+        try:
+            yield lost
+        finally:
+            stop.set()
+            thread.join()
+
+    def complete(self, job: Job) -> bool:
+        """Marks a claimed job as done.
+
+        Returns:
+            False if the lease was lost to another worker.
+        """
+        return self._update(job, "UPDATE jobs SET state = 'done', owner = NULL, error = NULL, updated_at = ? "
+                                 "WHERE id = ? AND owner = ? AND state = 'leased'",
+                            (time.time(), job.id, job.owner))
+
+    def fail(self, job: Job, error: str) -> bool:
+        """Gives a claimed job back for another attempt, or marks it as failed on its last one.
+
+        Returns:
+            False if the lease was lost to another worker.
+        """
+        state = "failed" if job.attempts >= self.max_attempts else "pending"
+        return self._update(job, "UPDATE jobs SET state = ?, owner = NULL, error = ?, updated_at = ? "
+                                 "WHERE id = ? AND owner = ? AND state = 'leased'",
+                            (state, error, time.time(), job.id, job.owner))
+
+    def _update(self, job: Job, query: str, parameters: tuple) -> bool:
+        with self._lock, self._connection:
+            return self._connection.execute(query, parameters).rowcount == 1
+
+    def counts(self, sites: list[str] = None) -> dict[str, int]:
+        """Returns the number of jobs in every state."""
+        query = "SELECT state, COUNT(*) FROM jobs"
+        if sites:
+            query += f" WHERE site IN ({', '.join('?' * len(sites))})"
+        with self._lock:
+            counts = dict(self._connection.execute(f"{query} GROUP BY state", list(sites or ())).fetchall())
+        return {state: counts.get(state, 0) for state in STATES}
+
+    def unfinished(self, sites: list[str] = None) -> int:
+        """Returns the number of jobs that are pending or leased."""
+        counts = self.counts(sites)
+        return counts["pending"] + counts["leased"]
+
+    def failed(self) -> list[tuple[str, str, str]]:
+        """Returns the (site, URL, error) of the failed jobs."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT site, url, error FROM jobs WHERE state = 'failed' ORDER BY id"
+            ).fetchall()
+
+    def retry_failed(self) -> int:
+        """Queues the failed jobs again with fresh attempts.
+
+        Returns:
+            The number of jobs queued again.
+        """
+        with self._lock, self._connection:
+            return self._connection.execute(
+                "UPDATE jobs SET state = 'pending', attempts = 0, error = NULL, updated_at = ? WHERE state = 'failed'",
+                (time.time(),)
+            ).rowcount
+
+    def clear(self, sites: list[str] = None) -> int:
+        """Removes all jobs, or those of some sites, to start a new crawl.
+
+        Returns:
+            The number of jobs removed.
+        """
+        query = "DELETE FROM jobs"
+        if sites:
+            query += f" WHERE site IN ({', '.join('?' * len(sites))})"
+        with self._lock, self._connection:
+            return self._connection.execute(query, list(sites or ())).rowcount
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        self._connection.close()
+
+    def __enter__(self) -> "Frontier":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main() -> None:
+    """Runs a crawl through the frontier in DATABASE.
+
+    Every command takes site names, "neptun" included, and defaults to all
+    sites. Any number of work commands can run at once, on one or more hosts.
+
+    Usage:
+        python frontier.py seed [site ...]    queue the first page of every category
+        python frontier.py work [site ...]    claim and scrape jobs until none is left
+        python frontier.py status             show the number of jobs in every state
+        python frontier.py retry              queue the failed jobs again
+        python frontier.py clear [site ...]   remove the jobs to start a new crawl
+    """
+    import NeptunDataCollection
+    import scraper
+    from sites import SITES
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    names = sys.argv[2:]
+    shops = [name for name in names if name != "neptun"] if names else list(SITES)
+    neptun = not names or "neptun" in names
+
+    with Frontier() as frontier:
+        if command == "seed":
+            added = scraper.seed_frontier(frontier, scraper.category_jobs(shops)) if shops else 0
+            if neptun:
+                added += NeptunDataCollection.seed_frontier(frontier)
+            print(f"Queued {added} jobs")
+        elif command == "work":
+            done = scraper.work_frontier(frontier, shops) if shops else 0
+            if neptun:
+                done += NeptunDataCollection.work_frontier(frontier)
+            print(f"Completed {done} jobs")
+        elif command == "retry":
+            print(f"Queued {frontier.retry_failed()} failed jobs again")
+        elif command == "clear":
+            print(f"Removed {frontier.clear(names)} jobs")
+        elif command == "status":
+            print(", ".join(f"{count} {state}" for state, count in frontier.counts().items()))
+            for site, url, error in frontier.failed():
+                print(f"{site}\t{url}\t{error}")
+        else:
+            print(main.__doc__)
+            sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
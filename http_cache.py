@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_DIRECTORY = ".http_cache"
+MAX_BYTES = 512 * 1024 * 1024
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    headers TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+
+class HttpCache:
+    """On-disk cache of GET responses that revalidates with conditional requests.
+
+    Response bodies are stored as files and indexed in a SQLite database in
+    the cache directory. An entry younger than the TTL of its URL is served
+    without a request. An older entry is revalidated with If-None-Match and
+    If-Modified-Since, so an unchanged page costs a 304 response without a
+    body. When the cache grows beyond max_bytes, the least recently used
+    entries are evicted.
+
+    Responses served from the cache have from_cache set to True. They carry
+    the whole body and are parsed like responses from the server; the cache
+    only saves the download.
+    """
+
+    def __init__(self, directory: str = CACHE_DIRECTORY, max_bytes: int = MAX_BYTES,
+                 ttl: list[tuple[str, float]] = None) -> None:
+        """Opens the cache, creating its directory if needed.
+
+        Args:
+            directory: The cache directory.
+            max_bytes: The maximum total size of the cached bodies.
+            ttl: (regular expression, seconds) rules. The first pattern that
+                matches a URL sets how long its entry is served without
+                revalidation. URLs without a rule are always revalidated.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = [(re.compile(pattern), seconds) for pattern, seconds in (ttl or [])]
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def ttl_for(self, url: str) -> float:
+        """Returns the number of seconds an entry of the URL stays fresh."""
+        for pattern, seconds in self.ttl:
+            if pattern.search(url):
+                return seconds
+        return 0
+
+    def _body_path(self, url: str) -> str:
+        """Returns the path of the file that holds the body of a URL."""
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def _load(self, url: str, headers: str) -> requests.Response | None:
+        """Builds a response from a cached body."""
+        try:
+            with open(self._body_path(url), "rb") as file:
+                body = file.read()
+        except FileNotFoundError:
+            return None
+
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.url = url
+        response._content = body
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
+
+    def get(self, send, url: str, headers: dict = None) -> requests.Response:
+        """Sends a GET request through the cache.
+
+        Args:
+            send: Function called as send(url, headers) for requests that
+                have to reach the server.
+            url: The full URL, including its query string.
+            headers: Optional HTTP headers to include in the request.
+
+        Returns:
+            The Response object, from the server or from the cache. If the
+            server confirms an entry whose body is gone, the entry is dropped
+            and the page is requested again without validators.
+        """
+        now = time.time()
+        request_headers = headers
+        with self._lock:
+            entry = self._connection.execute(
+                "SELECT etag, last_modified, headers, stored_at FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+
+        if entry is not None:
+            etag, last_modified, stored_headers, stored_at = entry
+            if now - stored_at < self.ttl_for(url):
+                cached = self._load(url, stored_headers)
+                if cached is not None:
+                    self._touch(url, now)
+                    return cached
+
+            headers = dict(headers or {})
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = send(url, headers)
+
+        if response.status_code == 304 and entry is not None:
+            cached = self._load(url, entry[2])
+            if cached is not None:
+                self._touch(url, now, revalidated=True)
+                return cached
+            self._delete(url)
+            response = send(url, request_headers)
+
+        response.from_cache = False
+        if response.status_code == 200:
+            self._store(url, response, now)
+        return response
+
+    def _touch(self, url: str, now: float, revalidated: bool = False) -> None:
+        """Marks an entry as used, and as freshly validated if it was revalidated."""
+        with self._lock, self._connection:
+            if revalidated:
+                self._connection.execute(
+                    "UPDATE entries SET last_used = ?, stored_at = ? WHERE url = ?", (now, now, url)
+                )
+            else:
+                self._connection.execute("UPDATE entries SET last_used = ? WHERE url = ?", (now, url))
+
+    def _delete(self, url: str) -> None:
+        """Removes an entry and its body."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM entries WHERE url = ?", (url,))
+        try:
+            os.remove(self._body_path(url))
+        except FileNotFoundError:
+            pass
+
+    def _store(self, url: str, response: requests.Response, now: float) -> None:
+        """Stores a response that has validators or a TTL, then evicts old entries."""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not (etag or last_modified or self.ttl_for(url)):
+            return
+
+        body = response.content
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        path = self._body_path(url)
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(body)
+        os.replace(temporary_path, path)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, json.dumps(headers), now, now, len(body))
+            )
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits max_bytes."""
+        with self._lock, self._connection:
+            total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            for url, size in self._connection.execute(
+                "SELECT url, size FROM entries ORDER BY last_used"
+            ).fetchall():
+                self._connection.execute("DELETE FROM entries WHERE url = ?", (url,))
+                try:
+                    os.remove(self._body_path(url))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def close(self) -> None:
+        """Closes the index database."""
+        self._connection.close()
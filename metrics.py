@@ -0,0 +1,362 @@
+import bisect
+import contextlib
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+import requests
+
+PROMETHEUS_FILE = "scraper_metrics.prom"
+
+# Upper bounds of the stage timing histogram buckets, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+COUNTER_HELP = {
+    "bytes": "Bytes of response bodies received.",
+    "cache_hits": "Responses served from the HTTP cache.",
+    "responses": "HTTP responses received.",
+    "retries": "Retries made before the final response.",
+    "rows": "Rows handed to the output sinks.",
+}
+
+_labels = contextvars.ContextVar("metrics_labels", default=("", ""))
+
+
+class Histogram:
+    """Counts observations into the cumulative buckets of BUCKETS."""
+    def __init__(self) -> None:
+        """Initializes an empty Histogram."""
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Adds one observation."""
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """Returns the (upper bound, count) pairs of the buckets, ending with +Inf."""
+        bounds = [repr(bound) for bound in BUCKETS] + ["+Inf"]
+        totals, total = [], 0
+        for count in self.buckets:
+            total += count
+            totals.append(total)
+        return list(zip(bounds, totals))
+
+
+def label_value(value: str) -> str:
+    """Escapes a label value for the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Collects stage timings and counters per site and category.
+
+    Stage timings go into histograms and counters into totals, both keyed by
+    the site and category of the labels in effect. On close, they are
+    written to a Prometheus text file. With a log file, every observation is
+    also appended to it as one JSON object per line.
+    """
+
+    def __init__(self, prometheus_path: str = PROMETHEUS_FILE, log_path: str = None) -> None:
+        """Initializes the collector.
+
+        Args:
+            prometheus_path: The Prometheus text file written on close, or
+                None to not write one.
+            log_path: The JSON-lines log file appended to, or None for no log.
+        """
+        self.prometheus_path = prometheus_path
+        self._histograms: dict[tuple[str, str, str], Histogram] = {}
+        self._counters: dict[tuple[str, str, str], float] = {}
+        self._lock = threading.Lock()
+        self._log = open(log_path, "a", encoding="utf-8") if log_path else None
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Records the time one run of a stage took."""
+        site, category = _labels.get()
+        with self._lock:
+            key = (stage, site, category)
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+            self._histograms[key].observe(seconds)
+            self._write_event("stage", stage, site, category, seconds)
+
+    def count(self, name: str, value: float = 1) -> None:
+        """Adds to a counter, e.g. "bytes", "retries" or "rows"."""
+        site, category = _labels.get()
+        with self._lock:
+            key = (name, site, category)
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._write_event("count", name, site, category, value)
+
+    def _write_event(self, kind: str, name: str, site: str, category: str, value: float) -> None:
+        if self._log is not None:
+            self._log.write(json.dumps({
+                "time": round(time.time(), 6), "type": kind, "name": name,
+                "site": site, "category": category, "value": value,
+            }) + "\n")
+
+    def histogram(self, stage: str, site: str = "", category: str = "") -> Histogram | None:
+        """Returns the histogram of a stage for a site and category, if it ran."""
+        return self._histograms.get((stage, site, category))
+
+    def counter(self, name: str, site: str = "", category: str = "") -> float:
+        """Returns the total of a counter for a site and category."""
+        return self._counters.get((name, site, category), 0)
+
+    def prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP scraper_stage_seconds Time spent in each stage of the scrape pipeline.",
+            "# TYPE scraper_stage_seconds histogram",
+        ]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        for (stage, site, category), histogram in histograms:
+            labels = f'stage="{label_value(stage)}",site="{label_value(site)}",category="{label_value(category)}"'
+            for bound, total in histogram.cumulative():
+                lines.append(f'scraper_stage_seconds_bucket{{{labels},le="{bound}"}} {total}')
+            lines.append(f"scraper_stage_seconds_sum{{{labels}}} {histogram.sum!r}")
+            lines.append(f"scraper_stage_seconds_count{{{labels}}} {histogram.count}")
+
+        described = set()
+        for (name, site, category), value in counters:
+            metric = f"scraper_{name}_total"
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {metric} {COUNTER_HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f'{metric}{{site="{label_value(site)}",category="{label_value(category)}"}} {value!r}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str = None) -> None:
+        """Writes the metrics to a Prometheus text file, replacing it in one step."""
+        path = path or self.prometheus_path
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(self.prometheus())
+        os.replace(temporary, path)
+
+    def close(self) -> None:
+        """Writes the Prometheus file and closes the log."""
+        if self.prometheus_path:
+            self.write_prometheus()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def __enter__(self) -> "Metrics":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class Collector:
+    """Stands in for Metrics in a worker process and keeps what is recorded.
+
+    The records are sent back with the result of the work and replayed into
+    the registry of the parent process, under the labels in effect there.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty Collector."""
+        self.records: list[tuple[str, str, float]] = []
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Keeps the time one run of a stage took."""
+        self.records.append(("stage", stage, seconds))
+
+    def count(self, name: str, value: float = 1) -> None:
+        """Keeps an addition to a counter."""
+        self.records.append(("count", name, value))
+
+
+registry = None
+
+
+def enable(prometheus_path: str = PROMETHEUS_FILE, log_path: str = None) -> Metrics:
+    """Makes the scrapers record metrics.
+
+    Args:
+        prometheus_path: The Prometheus text file written on close, or None.
+        log_path: The JSON-lines log file, or None.
+
+    Returns:
+        The Metrics in use.
+    """
+    global registry
+    if registry is not None:
+        registry.close()
+    registry = Metrics(prometheus_path=prometheus_path, log_path=log_path)
+    return registry
+
+
+@contextlib.contextmanager
+def labels(site: str, category: str = ""):
+    """Attributes the metrics recorded inside the block to a site and category.
+
+    The labels follow the context: asyncio tasks and asyncio.to_thread keep
+    them, plain threads need bind.
+    """
+    token = _labels.set((site, category))
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def bind(func):
+    """Wraps a function so that it keeps the current labels when run by another thread."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Times the block as one run of a pipeline stage, if metrics are enabled."""
+    if registry is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """Decorates a function so that each call is timed as one run of a stage."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name: str, value: float = 1) -> None:
+    """Adds to a counter, if metrics are enabled."""
+    if registry is not None:
+        registry.count(name, value)
+
+
+def replay(records: list[tuple[str, str, float]]) -> None:
+    """Records what a Collector kept in another process, if metrics are enabled."""
+    if registry is None:
+        return
+
+    for kind, name, value in records:
+        if kind == "stage":
+            registry.observe(name, value)
+        else:
+            registry.count(name, value)
+
+
+def record_response(response: requests.Response) -> None:
+    """Counts a response, its body size and the retries it took, if metrics are enabled."""
+    if registry is None:
+        return
+
+    registry.count("responses")
+    registry.count("bytes", len(response.content))
+    retries = getattr(getattr(response.raw, "retries", None), "history", ())
+    if retries:
+        registry.count("retries", len(retries))
+    if getattr(response, "from_cache", False) is True:
+        registry.count("cache_hits")
+
+
+@contextlib.contextmanager
+def profile(path: str):
+    """Profiles the block with cProfile, in every thread started inside it.
+
+    The merged statistics are written to path, for pstats or snakeviz. For
+    py-spy nothing needs to be switched on: the stages are plain function
+    calls and show up in its flame graphs as they are.
+
+    From Python 3.12 on, cProfile is built on sys.monitoring, which allows
+    a single profiler per process and shows it the calls of every thread.
+    There, one profiler covers the whole block.
+
+    Raises:
+        RuntimeError: On Python 3.12 and later, if another profiler is
+            already active, e.g. under python -m cProfile.
+    """
+    if sys.version_info >= (3, 12):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as error:
+            raise RuntimeError(f"Cannot profile into {path}: another profiler is already active") from error
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+        return
+
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def start_thread_profiler(*_):
+        profiler = cProfile.Profile()
+        with lock:
+            profilers.append(profiler)
+        profiler.enable()
+
+    threading.setprofile(start_thread_profiler)
+    profilers[0].enable()
+    try:
+        yield
+    finally:
+        profilers[0].disable()
+        threading.setprofile(None)
+        with lock:
+            stats = pstats.Stats(*profilers)
+        stats.dump_stats(path)
+
+
+def from_environment() -> contextlib.ExitStack:
+    """Switches metrics and profiling on for one run from environment variables.
+
+    SCRAPER_METRICS names the Prometheus text file, SCRAPER_METRICS_LOG the
+    JSON-lines log and SCRAPER_PROFILE the file the cProfile statistics are
+    written to. Nothing is switched on for unset variables.
+
+    Returns:
+        A context manager that writes the files and switches everything off
+        on exit.
+    """
+    stack = contextlib.ExitStack()
+    prometheus_path = os.environ.get("SCRAPER_METRICS")
+    log_path = os.environ.get("SCRAPER_METRICS_LOG")
+
+    if prometheus_path or log_path:
+        stack.enter_context(enable(prometheus_path=prometheus_path, log_path=log_path))
+
+        @stack.callback
+        def disable():
+            global registry
+            registry = None
+
+    if os.environ.get("SCRAPER_PROFILE"):
+        stack.enter_context(profile(os.environ["SCRAPER_PROFILE"]))
+    return stack
@@ -0,0 +1,206 @@
+from collections import Counter
+import contextlib
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+DATABASE = "page_fingerprints.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    next_link TEXT,
+    rows TEXT NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+"""
+
+NOISE = re.compile(rb"<script\b.*?</script>|<!--.*?-->|\s+", re.IGNORECASE | re.DOTALL)
+
+
+def product_region(content: bytes, start: bytes, end: tuple[bytes, ...] = ()) -> bytes:
+    """Cuts the part of a page that holds its products out of the raw HTML.
+
+    Args:
+        content: The HTML of the page.
+        start: Marker at the start of the region.
+        end: Markers searched for one after the other from the start marker.
+            The region ends after the last one. Without end markers, or when
+            one is missing, the region runs to the end of the page.
+
+    Returns:
+        The region, or the whole page if the start marker is missing.
+    """
+    begin = content.find(start)
+    if begin == -1:
+        return content
+
+    position = begin
+    for marker in end:
+        found = content.find(marker, position)
+        if found == -1:
+            return content[begin:]
+        position = found + len(marker)
+
+    return content[begin:position] if end else content[begin:]
+
+
+def fingerprint(content: bytes | str, start: bytes = None, end: tuple[bytes, ...] = ()) -> str:
+    """Hashes the product region of a page.
+
+    Scripts, comments and whitespace are left out, so tracking snippets and
+    reformatting don't count as changes.
+
+    Args:
+        content: The HTML of the page.
+        start: Marker at the start of the product region. None hashes the
+            whole page.
+        end: Markers at the end of the product region, see product_region.
+
+    Returns:
+        The SHA-256 hex digest.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    if start is not None:
+        content = product_region(content, start, end)
+    return hashlib.sha256(NOISE.sub(b"", content)).hexdigest()
+
+
+class PageFingerprints:
+    """Remembers the fingerprint, rows and next link of every listing page.
+
+    A page whose fingerprint matches the stored one doesn't have to be parsed
+    again: its rows and next link are read from the store instead. The
+    number of parsed and skipped pages is counted per site.
+
+    Pages written to a sink are only stored once the sink is closed, see
+    track, so a page whose rows never reached the output is parsed again.
+    """
+
+    def __init__(self, path: str = DATABASE) -> None:
+        """Opens the store, creating the database file if needed.
+
+        Args:
+            path: The path of the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+        self._parsed = Counter()
+        self._skipped = Counter()
+        self._held: dict[int, list[tuple]] = {}
+
+    def unchanged(self, site: str, url: str, digest: str) -> tuple[list[tuple], str | None] | None:
+        """Looks up a page and counts it as skipped if its fingerprint matches.
+
+        Args:
+            site: The name of the scraped site.
+            url: The URL of the page.
+            digest: The fingerprint of the downloaded page.
+
+        Returns:
+            The stored rows and next link, or None if the page is new or changed.
+        """
+        with self._lock:
+            entry = self._connection.execute(
+                "SELECT rows, next_link FROM pages WHERE url = ? AND digest = ?", (url, digest)
+            ).fetchone()
+            if entry is None:
+                return None
+            self._skipped[site] += 1
+
+        rows, next_link = entry
+        return [tuple(row) for row in json.loads(rows)], next_link
+
+    def update(self, site: str, url: str, digest: str, rows: list[tuple], next_link: str = None,
+               sink=None) -> None:
+        """Stores a page that was parsed and counts it as parsed.
+
+        Args:
+            site: The name of the scraped site.
+            url: The URL of the page.
+            digest: The fingerprint of the downloaded page.
+            rows: The (title, current price, old price) rows of the page.
+            next_link: The URL of the next page, if any.
+            sink: The open sink the rows were written to. The page is held
+                back until release is called for the sink after it is closed.
+        """
+        entry = (url, digest, next_link or None, json.dumps(rows, ensure_ascii=False), int(time.time()))
+        with self._lock:
+            self._parsed[site] += 1
+            if sink is not None:
+                self._held.setdefault(id(sink), []).append(entry)
+                return
+            with self._connection:
+                self._connection.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)", entry)
+
+    def release(self, sink) -> None:
+        """Stores the pages held back for a sink that was closed."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)", self._held.pop(id(sink), [])
+            )
+
+    def drop(self, sink) -> None:
+        """Forgets the pages held back for a sink that failed."""
+        with self._lock:
+            self._held.pop(id(sink), None)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Returns the number of parsed and skipped pages of every site."""
+        with self._lock:
+            return {
+                site: {"parsed": self._parsed[site], "skipped": self._skipped[site]}
+                for site in sorted(set(self._parsed) | set(self._skipped))
+            }
+
+    def report(self) -> str:
+        """Formats the page counts as one line per site."""
+        lines = []
+        for site, counts in self.stats().items():
+            total = counts["parsed"] + counts["skipped"]
+            lines.append(f"{site}: {counts['skipped']} of {total} pages unchanged, {counts['parsed']} parsed")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        self._connection.close()
+
+
+store = None
+
+
+@contextlib.contextmanager
+def track(sink):
+    """Enters a sink and stores the fingerprints of the pages saved to it once it is closed.
+
+    Used as "with track(open_sink(...)) as sink". If the block fails, the
+    pages are dropped and parsed again on the next run.
+    """
+    fingerprints = store
+    with sink as entered:
+        try:
+            yield entered
+        except BaseException:
+            if fingerprints is not None:
+                fingerprints.drop(entered)
+            raise
+    if fingerprints is not None:
+        fingerprints.release(entered)
+
+
+def enable(path: str = DATABASE) -> PageFingerprints:
+    """Makes the scrapers skip unchanged pages, using the store in path.
+
+    Returns:
+        The PageFingerprints in use.
+    """
+    global store
+    store = PageFingerprints(path)
+    return store
@@ -0,0 +1,201 @@
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+
+def page_number(text: str) -> int | None:
+    """Returns the page number shown by a pagination element, or None if it isn't one."""
+    text = text.strip()
+    return int(text) if text.isdigit() else None
+
+
+def page_template(href: str, number: int) -> str | None:
+    """Turns the URL of a numbered page into a template for all pages.
+
+    The last occurrence of the page number that isn't part of a longer
+    number is replaced with {page}, e.g. "https://globe.al/telefonia/page-2/"
+    becomes "https://globe.al/telefonia/page-{page}/".
+
+    Args:
+        href: The URL of the page.
+        number: The page number of the URL.
+
+    Returns:
+        The template, or None if the number isn't in the URL.
+    """
+    if "{" in href or "}" in href:
+        return None
+    matches = list(re.finditer(rf"(?<!\d){number}(?!\d)", href))
+    if not matches:
+        return None
+    match = matches[-1]
+    return f"{href[:match.start()]}{{page}}{href[match.end():]}"
+
+
+def template_page_number(template: str, href: str) -> int | None:
+    """Reads the page number out of a URL that follows a template."""
+    pattern = re.escape(template).replace(r"\{page\}", r"(\d+)")
+    match = re.fullmatch(pattern, href)
+    return int(match.group(1)) if match else None
+
+
+def infer_template(pages: dict[int, str]) -> str | None:
+    """Infers the URL template of a pagination from its numbered links.
+
+    A template is only returned if it reproduces every link past the first
+    page, whose URL often has no page number at all.
+
+    Args:
+        pages: Mapping of page numbers to the URLs linked in the pagination.
+
+    Returns:
+        The template, or None if the links don't follow one.
+    """
+    numbered = {number: href for number, href in pages.items() if number > 1}
+    for number, href in numbered.items():
+        template = page_template(href, number)
+        if template is not None and all(
+            template.format(page=other) == other_href for other, other_href in numbered.items()
+        ):
+            return template
+    return None
+
+
+def plan_pages(pages: dict[int, str], current: int, last: int = None) -> list[str] | None:
+    """Lists the URLs of all pages after the current one.
+
+    Args:
+        pages: Mapping of page numbers to the URLs linked in the pagination.
+        current: The number of the current page.
+        last: The number of the last page, if the pagination tells it apart
+            from the linked pages. Defaults to the highest linked page.
+
+    Returns:
+        The URLs of pages current + 1 to last in order, an empty list if the
+        current page is the last one, or None if the URLs can't be inferred.
+    """
+    if last is None:
+        last = max(pages, default=current)
+    if last <= current:
+        return []
+
+    wanted = range(current + 1, last + 1)
+    if all(number in pages for number in wanted):
+        return [pages[number] for number in wanted]
+
+    template = infer_template(pages)
+    if template is None:
+        return None
+    return [template.format(page=number) for number in wanted]
+
+
+class NumberedPagination:
+    """Pagination where the current page is a number and the other pages are links."""
+
+    def __init__(self, container_class: str, link_class: str) -> None:
+        """Initializes the rule.
+
+        Args:
+            container_class: The class of the div holding the page numbers.
+            link_class: The class of the links to the other pages.
+        """
+        self.container_class = container_class
+        self.link_class = link_class
+
+    def strainer(self) -> SoupStrainer:
+        """Returns a SoupStrainer that parses only the pagination."""
+        return SoupStrainer("div", class_=self.container_class)
+
+    def page_links(self, soup: BeautifulSoup) -> tuple[int, dict[int, str]] | None:
+        """Reads the current page number and the numbered links of the pagination.
+
+        Returns:
+            The current page number and a mapping of page numbers to URLs, or
+            None if the page has no pagination.
+        """
+        div = soup.find("div", class_=self.container_class)
+        if div is None or div.find("span") is None:
+            return None
+
+        current = page_number(div.find("span").text)
+        pages = {}
+        for link in div.find_all("a", class_=self.link_class, href=True):
+            number = page_number(link.get_text())
+            if number is not None:
+                pages[number] = link["href"]
+        return current, pages
+
+    def next_link(self, soup: BeautifulSoup) -> str:
+        """Finds the URL for the next page in pagination.
+
+        Args:
+            soup: BeautifulSoup object containing the HTML content.
+
+        Returns:
+            The URL for the next page if available, otherwise False.
+        """
+        links = self.page_links(soup)
+        if links is None or links[0] is None:
+            return False
+        current, pages = links
+        return pages.get(current + 1, False)
+
+    def plan(self, soup: BeautifulSoup) -> list[str] | None:
+        """Lists the URLs of all pages after the current one, see plan_pages."""
+        links = self.page_links(soup)
+        if links is None:
+            return []
+        current, pages = links
+        return plan_pages(pages, current) if current is not None else None
+
+
+class NextLinkPagination:
+    """Pagination with a dedicated link to the next page."""
+
+    def __init__(self, link_tag: str, link_class: str, page_class: str = None) -> None:
+        """Initializes the rule.
+
+        Args:
+            link_tag: The tag name of the next link.
+            link_class: The class of the next link.
+            page_class: The class shared by the page number links and the
+                current page number, if the pagination shows them.
+        """
+        self.link_tag = link_tag
+        self.link_class = link_class
+        self.page_class = page_class
+
+    def strainer(self) -> SoupStrainer:
+        """Returns a SoupStrainer that parses only the pagination links."""
+        if self.page_class is None:
+            return SoupStrainer(self.link_tag, class_=self.link_class)
+        return SoupStrainer([self.link_tag, "span"], class_=self.page_class)
+
+    def next_link(self, soup: BeautifulSoup) -> str:
+        """Finds the URL for the next page in pagination.
+
+        Args:
+            soup: BeautifulSoup object containing the HTML content.
+
+        Returns:
+            The URL for the next page if available, otherwise False.
+        """
+        link = soup.find(self.link_tag, class_=self.link_class, href=True)
+        return link["href"] if link is not None else False
+
+    def plan(self, soup: BeautifulSoup) -> list[str] | None:
+        """Lists the URLs of all pages after the current one, see plan_pages."""
+        if self.page_class is None:
+            return None if self.next_link(soup) else []
+
+        current = soup.find("span", class_=self.page_class)
+        current = page_number(current.get_text()) if current is not None else None
+        if current is None:
+            return None if self.next_link(soup) else []
+
+        pages = {}
+        for link in soup.find_all(self.link_tag, class_=self.page_class, href=True):
+            number = page_number(link.get_text())
+            if number is not None:
+                pages[number] = link["href"]
+        return plan_pages(pages, current)
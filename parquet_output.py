@@ -0,0 +1,166 @@
+from datetime import datetime, timezone
+import os
+import sys
+from urllib.parse import quote
+import uuid
+
+from extraction import parse_price
+from sinks import CSV_ROOTS, iter_csv_files, iter_csv_rows
+
+PARQUET_ROOT = "parquet"
+
+
+def require_pyarrow():
+    """Imports pyarrow, which is only needed for the Parquet output mode."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError("The Parquet output mode requires pyarrow: pip install pyarrow") from error
+    return pyarrow
+
+
+def schema():
+    """Returns the Arrow schema of the data files."""
+    pa = require_pyarrow()
+    return pa.schema([
+        ("name", pa.string()),
+        ("current_price", pa.int64()),
+        ("old_price", pa.int64()),
+        ("scraped_at", pa.timestamp("s", tz="UTC")),
+    ])
+
+
+def partition_directory(root: str, site: str, category: str) -> str:
+    """Returns the directory of a site and category partition."""
+    return os.path.join(root, f"site={quote(site, safe='')}", f"category={quote(category, safe='')}")
+
+
+class ParquetSink:
+    """Streams product rows into a Parquet file of one site and category.
+
+    The files form a Hive-partitioned dataset with one directory per site and
+    category, e.g. parquet/site=globe/category=telefonia/part-....parquet.
+    Read it with pyarrow.dataset.dataset(root, partitioning="hive").
+
+    Has the same interface as sinks.CsvSink. Rows are buffered in columns and
+    written out as a row group every row_group_size rows, so memory stays
+    bounded however large the category is. Every sink writes a new part file
+    into the partition directory.
+    """
+
+    def __init__(self, site: str, category: str, root: str = PARQUET_ROOT,
+                 scraped_at: datetime = None, row_group_size: int = 10000) -> None:
+        """Opens a new part file.
+
+        Args:
+            site: The name of the scraped site, e.g. "globe".
+            category: The category path of the rows.
+            root: The root directory of the dataset.
+            scraped_at: The scrape time stored with every row. Defaults to now.
+            row_group_size: The number of rows per Parquet row group.
+        """
+        pa = require_pyarrow()
+        self.scraped_at = scraped_at or datetime.now(timezone.utc)
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self._columns = {"name": [], "current_price": [], "old_price": []}
+
+        directory = partition_directory(root, site, category)
+        os.makedirs(directory, exist_ok=True)
+        stamp = self.scraped_at.strftime("%Y%m%dT%H%M%S")
+        self.path = os.path.join(directory, f"part-{stamp}-{uuid.uuid4().hex[:6]}.parquet")
+        self._writer = pa.parquet.ParquetWriter(self.path, schema())
+
+    def write_row(self, row: tuple) -> None:
+        """Buffers one (title, current price, old price) row."""
+        title, current_price, old_price = row
+        self._columns["name"].append(title)
+        self._columns["current_price"].append(parse_price(current_price))
+        self._columns["old_price"].append(parse_price(old_price))
+        self.rows_written += 1
+        if len(self._columns["name"]) >= self.row_group_size:
+            self.flush()
+
+    def write_rows(self, rows) -> None:
+        """Buffers several rows."""
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self) -> None:
+        """Writes the buffered rows as one row group."""
+        if not self._columns["name"]:
+            return
+
+        pa = require_pyarrow()
+        count = len(self._columns["name"])
+        table = pa.Table.from_pydict(
+            {**self._columns, "scraped_at": [self.scraped_at] * count},
+            schema=schema()
+        )
+        self._writer.write_table(table)
+        self._columns = {"name": [], "current_price": [], "old_price": []}
+
+    def close(self) -> None:
+        """Writes the remaining rows and closes the file."""
+        if self._writer is not None:
+            self.flush()
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> "ParquetSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def convert_csv_file(path: str, site: str, category: str, root: str = PARQUET_ROOT) -> int:
+    """Converts one scraped CSV file to a Parquet part file.
+
+    The file's modification time is used as the scrape time. Files with a
+    single price column, like those of Shpresa.al, have no old price.
+
+    Args:
+        path: The path of the CSV file.
+        site: The name of the scraped site.
+        category: The category path of the rows.
+        root: The root directory of the dataset.
+
+    Returns:
+        The number of converted rows.
+    """
+    scraped_at = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc).replace(microsecond=0)
+    with ParquetSink(site, category, root=root, scraped_at=scraped_at) as sink:
+        sink.write_rows(iter_csv_rows(path))
+        return sink.rows_written
+
+
+def convert_csv_tree(roots: dict[str, str] = None, output_root: str = PARQUET_ROOT) -> int:
+    """Converts every CSV file under the scraper output folders.
+
+    Args:
+        roots: Mapping of output folders to site names. Defaults to CSV_ROOTS.
+        output_root: The root directory of the dataset.
+
+    Returns:
+        The number of converted rows.
+    """
+    total = 0
+    for path, site, category in iter_csv_files(roots or CSV_ROOTS):
+        total += convert_csv_file(path, site, category, root=output_root)
+    return total
+
+
+def main() -> None:
+    """Converts the CSV tree into a Parquet dataset.
+
+    Usage: python parquet_output.py [output_root]
+    """
+    output_root = sys.argv[1] if len(sys.argv) > 1 else PARQUET_ROOT
+    rows = convert_csv_tree(output_root=output_root)
+    print(f"Converted {rows} rows into {output_root}")
+
+
+if __name__ == "__main__":
+    main()
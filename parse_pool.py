@@ -0,0 +1,97 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+import threading
+
+import metrics
+
+
+def _run(collect: bool, func, *args, **kwargs):
+    """Runs a parse function in a worker process.
+
+    Returns:
+        The result of the function and the metrics it recorded.
+    """
+    collector = metrics.Collector() if collect else None
+    metrics.registry = collector
+    try:
+        return func(*args, **kwargs), collector.records if collector else []
+    finally:
+        metrics.registry = None
+
+
+class ParsePool:
+    """Parses pages in worker processes, so parsing doesn't hold the GIL of the fetchers.
+
+    Fetching threads hand the raw page to parse() and block until the worker
+    process sends back the parsed rows. At most max_pending pages are queued
+    for or inside the workers; further callers wait for a free slot, which
+    holds back the fetchers while the parsers are behind.
+    """
+
+    def __init__(self, processes: int = None, max_pending: int = None) -> None:
+        """Starts the worker processes.
+
+        Args:
+            processes: The number of worker processes. Defaults to the number
+                of CPU cores.
+            max_pending: The maximum number of pages queued for or inside
+                the workers. Defaults to twice the number of processes.
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.max_pending = max_pending or self.processes * 2
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = ProcessPoolExecutor(max_workers=self.processes)
+
+    def parse(self, func, *args, **kwargs):
+        """Runs a parse function in a worker process and returns its result.
+
+        The function and its arguments and result must be picklable, so pass
+        raw bytes or strings in and get rows out rather than soups. Metrics
+        the function records in the worker are added to those of this
+        process.
+        """
+        with self._slots:
+            result, records = self._executor.submit(_run, metrics.registry is not None, func,
+                                                    *args, **kwargs).result()
+        metrics.replay(records)
+        return result
+
+    def close(self) -> None:
+        """Shuts the worker processes down."""
+        self._executor.shutdown()
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+pool = None
+
+
+def enable(processes: int = None, max_pending: int = None) -> ParsePool:
+    """Makes the scrapers parse pages in a pool of worker processes.
+
+    Args:
+        processes: The number of worker processes. Defaults to the number of
+            CPU cores.
+        max_pending: The maximum number of pages queued for or inside the
+            workers.
+
+    Returns:
+        The ParsePool in use.
+    """
+    global pool
+    if pool is not None:
+        pool.close()
+    pool = ParsePool(processes=processes, max_pending=max_pending)
+    return pool
+
+
+def parse(func, *args, **kwargs):
+    """Runs a parse function in the pool if it is enabled, otherwise in the calling thread."""
+    with metrics.stage("parse"):
+        if pool is None:
+            return func(*args, **kwargs)
+        return pool.parse(func, *args, **kwargs)
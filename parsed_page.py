@@ -0,0 +1,88 @@
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+
+
+class Regions(SoupStrainer):
+    """A SoupStrainer that keeps every element matched by any of several strainers.
+
+    Text outside the matched elements is dropped, so a page parsed with it
+    holds the matched regions side by side and nothing else.
+    """
+    def __init__(self, strainers) -> None:
+        """Initializes the strainer.
+
+        Args:
+            strainers: The SoupStrainers of the regions.
+        """
+        super().__init__()
+        self.strainers = list(strainers)
+
+    def allow_tag_creation(self, nsprefix: str | None, name: str, attrs) -> bool:
+        """Keeps a top-level tag if one of the region strainers would keep it.
+
+        The class attribute is split into its classes first, so that a
+        strainer for one class also matches elements that have several.
+        """
+        if attrs and isinstance(attrs.get("class"), str):
+            attrs = {**attrs, "class": attrs["class"].split()}
+        return any(strainer.allow_tag_creation(nsprefix, name, attrs) for strainer in self.strainers)
+
+    def allow_string_creation(self, string: str) -> bool:
+        """Drops all text outside the regions."""
+        return False
+
+
+class ParsedPage:
+    """The regions of one page that a scraper reads, parsed in a single pass.
+
+    Each scraper declares its regions as a mapping of names to SoupStrainers,
+    e.g. the chapter list and the pagination of a novel's chapter page. The
+    page is parsed once with all of them together, and each region is then
+    looked up in the small tree that is left.
+    """
+
+    def __init__(self, content: bytes | str, regions: dict[str, SoupStrainer] = None,
+                 features: str = "lxml") -> None:
+        """Parses a page.
+
+        Args:
+            content: The HTML of the page.
+            regions: Mapping of region names to the SoupStrainers that match
+                them, or None to parse the whole page.
+            features: The parser BeautifulSoup uses.
+        """
+        self.regions = regions or {}
+        parse_only = Regions(self.regions.values()) if regions else None
+        self.soup = BeautifulSoup(content, features=features, parse_only=parse_only)
+
+    def region(self, name: str) -> list[Tag]:
+        """Returns the elements of a region, in page order.
+
+        Raises:
+            KeyError: If the page wasn't parsed with the region.
+        """
+        return self.soup.find_all(self.regions[name])
+
+    def find(self, name: str) -> Tag | None:
+        """Returns the first element of a region, or None if the page doesn't have it."""
+        return self.soup.find(self.regions[name])
+
+
+def parse(response, regions: dict[str, SoupStrainer] = None, features: str = "lxml") -> ParsedPage:
+    """Returns the parsed page of a response, parsing it on first use only.
+
+    The ParsedPage is kept on the response, so every function that reads
+    the same regions of the response shares one parse.
+
+    Args:
+        response: Response object from the requests library.
+        regions: The regions to parse, see ParsedPage.
+        features: The parser BeautifulSoup uses.
+
+    Returns:
+        The ParsedPage.
+    """
+    page = getattr(response, "parsed_page", None)
+    if not isinstance(page, ParsedPage) or page.regions != (regions or {}):
+        page = ParsedPage(response.content, regions, features=features)
+        response.parsed_page = page
+    return page
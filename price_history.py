@@ -0,0 +1,276 @@
+from datetime import datetime, timezone
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from extraction import parse_price
+from sinks import CSV_ROOTS, iter_csv_files, iter_csv_rows
+
+DATABASE = "price_history.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    first_seen_at INTEGER NOT NULL,
+    last_seen_at INTEGER NOT NULL,
+    UNIQUE (site, name)
+);
+CREATE TABLE IF NOT EXISTS observations (
+    product_id INTEGER NOT NULL REFERENCES products (id),
+    observed_at INTEGER NOT NULL,
+    current_price INTEGER,
+    old_price INTEGER,
+    PRIMARY KEY (product_id, observed_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS observations_observed_at ON observations (observed_at);
+CREATE TABLE IF NOT EXISTS latest (
+    product_id INTEGER PRIMARY KEY REFERENCES products (id),
+    observed_at INTEGER NOT NULL,
+    current_price INTEGER,
+    old_price INTEGER
+);
+CREATE INDEX IF NOT EXISTS latest_observed_at ON latest (observed_at);
+"""
+
+PRICE_DROPS_QUERY = """
+SELECT p.site, p.category, p.name, before.price, COALESCE(l.current_price, l.old_price)
+FROM latest AS l
+JOIN products AS p ON p.id = l.product_id
+JOIN (
+    SELECT o.product_id, COALESCE(o.current_price, o.old_price) AS price
+    FROM observations AS o
+    WHERE o.observed_at = (
+        SELECT MAX(observed_at) FROM observations
+        WHERE product_id = o.product_id AND observed_at <= :since
+    )
+) AS before ON before.product_id = l.product_id
+WHERE l.observed_at > :since
+  AND COALESCE(l.current_price, l.old_price) <= before.price * (1 - :drop)
+ORDER BY 1.0 * COALESCE(l.current_price, l.old_price) / before.price
+"""
+
+
+class PriceHistory:
+    """Embedded SQLite store with one price observation per product change.
+
+    A product is identified by its site and name. An observation is only
+    stored when a product's prices differ from its latest observation, so
+    unchanged products cost one indexed lookup per run and no new rows. The
+    latest prices are kept in their own table for that lookup.
+    """
+
+    def __init__(self, path: str = DATABASE) -> None:
+        """Opens the store, creating the database file if needed.
+
+        Args:
+            path: The path of the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def record(self, site: str, category: str, rows, observed_at: int = None) -> int:
+        """Records the products seen on one page or category in one transaction.
+
+        Args:
+            site: The name of the scraped site.
+            category: The category path of the rows.
+            rows: (title, current price, old price) rows as written to the CSVs.
+            observed_at: The observation time in Unix seconds. Defaults to now.
+
+        Returns:
+            The number of products whose price changed or that are new.
+        """
+        observed_at = int(time.time()) if observed_at is None else observed_at
+        changed = 0
+
+        with self._lock, self._connection:
+            for title, current_price, old_price in rows:
+                current_price, old_price = parse_price(current_price), parse_price(old_price)
+                product_id = self._product_id(site, category, title, observed_at)
+
+                latest = self._connection.execute(
+                    "SELECT current_price, old_price FROM latest WHERE product_id = ?", (product_id,)
+                ).fetchone()
+                if latest == (current_price, old_price):
+                    continue
+
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?)",
+                    (product_id, observed_at, current_price, old_price)
+                )
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?)",
+                    (product_id, observed_at, current_price, old_price)
+                )
+                changed += 1
+
+        return changed
+
+    def _product_id(self, site: str, category: str, name: str, seen_at: int) -> int:
+        """Returns the id of a product, creating the product if it is new."""
+        row = self._connection.execute(
+            "UPDATE products SET last_seen_at = ?, category = ? WHERE site = ? AND name = ? RETURNING id",
+            (seen_at, category, site, name)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+
+        cursor = self._connection.execute(
+            "INSERT INTO products (site, name, category, first_seen_at, last_seen_at) VALUES (?, ?, ?, ?, ?)",
+            (site, name, category, seen_at, seen_at)
+        )
+        return cursor.lastrowid
+
+    def price_drops(self, since: int, drop: float = 0.1) -> list[tuple]:
+        """Finds products whose price dropped by at least a fraction since a time.
+
+        The price of a product is its current price, or its old price if it
+        has no current one.
+
+        Args:
+            since: The start of the period in Unix seconds.
+            drop: The minimum drop as a fraction, e.g. 0.1 for 10%.
+
+        Returns:
+            (site, category, name, price before, price now) tuples, biggest
+            drop first.
+        """
+        with self._lock:
+            return self._connection.execute(PRICE_DROPS_QUERY, {"since": since, "drop": drop}).fetchall()
+
+    def history(self, site: str, name: str) -> list[tuple[int, int, int]]:
+        """Returns the (observed_at, current price, old price) changes of a product."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT o.observed_at, o.current_price, o.old_price FROM observations AS o "
+                "JOIN products AS p ON p.id = o.product_id "
+                "WHERE p.site = ? AND p.name = ? ORDER BY o.observed_at",
+                (site, name)
+            ).fetchall()
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        self._connection.close()
+
+
+class PriceHistorySink:
+    """Writes scraped rows into a PriceHistory, with the interface of sinks.CsvSink.
+
+    Rows are recorded in batches of batch_size, each in its own transaction.
+    All rows of one sink share the observation time of the sink's run.
+    """
+
+    def __init__(self, store: PriceHistory, site: str, category: str,
+                 observed_at: int = None, batch_size: int = 500) -> None:
+        """Initializes the sink.
+
+        Args:
+            store: The PriceHistory to write to.
+            site: The name of the scraped site.
+            category: The category path of the rows.
+            observed_at: The observation time in Unix seconds. Defaults to now.
+            batch_size: The number of rows recorded per transaction.
+        """
+        self.store = store
+        self.site = site
+        self.category = category
+        self.observed_at = int(time.time()) if observed_at is None else observed_at
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._batch = []
+
+    def write_row(self, row: tuple) -> None:
+        """Buffers one (title, current price, old price) row."""
+        self._batch.append(row)
+        self.rows_written += 1
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def write_rows(self, rows) -> None:
+        """Buffers several rows."""
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self) -> None:
+        """Records the buffered rows."""
+        if self._batch:
+            self.store.record(self.site, self.category, self._batch, observed_at=self.observed_at)
+            self._batch = []
+
+    def close(self) -> None:
+        """Records the remaining rows."""
+        self.flush()
+
+    def __enter__(self) -> "PriceHistorySink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def import_csv_tree(store: PriceHistory, roots: dict[str, str] = None) -> int:
+    """Records the rows of the existing CSV files, observed at their mtime.
+
+    Files with a single price column, like those of Shpresa.al, are recorded
+    without an old price.
+
+    Args:
+        store: The PriceHistory to write to.
+        roots: Mapping of output folders to site names. Defaults to CSV_ROOTS.
+
+    Returns:
+        The number of products whose price changed or that are new.
+    """
+    changed = 0
+    for path, site, category in iter_csv_files(roots or CSV_ROOTS):
+        rows = list(iter_csv_rows(path))
+        changed += store.record(site, category, rows, observed_at=int(os.path.getmtime(path)))
+    return changed
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def default_store() -> PriceHistory:
+    """Returns the store in DATABASE shared by the scrapers, opening it on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = PriceHistory()
+        return _default_store
+
+
+def main() -> None:
+    """Imports the CSV tree or lists recent price drops.
+
+    Usage:
+        python price_history.py import
+        python price_history.py drops [days] [fraction]
+    """
+    store = default_store()
+    command = sys.argv[1] if len(sys.argv) > 1 else "drops"
+
+    if command == "import":
+        print(f"Recorded {import_csv_tree(store)} price changes in {store.path}")
+        return
+
+    days = float(sys.argv[2]) if len(sys.argv) > 2 else 7
+    drop = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    since = int(time.time() - days * 86400)
+    for site, category, name, before, now in store.price_drops(since, drop):
+        print(f"{site}\t{category}\t{name}\t{before} -> {now}")
+    print(f"Changes since {datetime.fromtimestamp(since, timezone.utc):%Y-%m-%d %H:%M} UTC")
+
+
+if __name__ == "__main__":
+    main()
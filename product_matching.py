@@ -0,0 +1,342 @@
+import csv
+import json
+import os
+import re
+import sys
+import unicodedata
+
+from extraction import parse_price
+from sinks import CSV_ROOTS, iter_csv_files
+
+INDEX_FILE = "product_index.json"
+
+# Tokens that look like model codes but are sizes, capacities, ratings,
+# resolutions or Wi-Fi classes.
+UNIT_PATTERN = re.compile(
+    r"\d+(?:[.,]\d+)?(?:GB|TB|MB|MAH|WH|W|KW|HZ|L|KG|G|MM|CM|M|INCH|K|V|A|BTU|RPM|MP|MPX|P)|\d+X\d+|A[CX]\d+"
+)
+
+
+def normalize_title(title: str) -> str:
+    """Lowercases a product title and strips accents and punctuation.
+
+    E.g. "Frigorifer LG GP-FPA346VAATW, 346L" becomes
+    "frigorifer lg gp fpa346vaatw 346l".
+    """
+    text = unicodedata.normalize("NFKD", title)
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def model_codes(title: str) -> set[str]:
+    """Extracts the model codes of a product title, without separators.
+
+    A model code is a word of at least six letters and digits, which may be
+    joined by "-" or "/", that holds both letters and digits and isn't a
+    size or capacity, e.g. "GP-FPA346VAATW" gives "GPFPA346VAATW".
+    """
+    codes = set()
+    for word in re.findall(r"[A-Z0-9]+(?:[-/][A-Z0-9]+)*", title.upper()):
+        code = re.sub(r"[-/]", "", word)
+        if (len(code) >= 6 and re.search(r"[A-Z]", code) and re.search(r"\d", code)
+                and not UNIT_PATTERN.fullmatch(code)):
+            codes.add(code)
+    return codes
+
+
+def trigrams(text: str) -> set[str]:
+    """Returns the character trigrams of a normalized title."""
+    text = f" {text} "
+    return {text[start:start + 3] for start in range(len(text) - 2)}
+
+
+def similarity(first: set, second: set) -> float:
+    """Returns the Jaccard similarity of two sets."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class Product:
+    """A product of one site, identified by its site and name as in the price history."""
+    def __init__(self, site: str, name: str, category: str = "", price: int = None) -> None:
+        """Initializes a Product and derives its matching keys from the name."""
+        self.site = site
+        self.name = name
+        self.category = category
+        self.price = price
+        self.title = normalize_title(name)
+        self.tokens = set(self.title.split())
+        self.variants = {token for token in self.tokens if re.search(r"[a-z]", token) and re.search(r"\d", token)}
+        self.codes = model_codes(name)
+        self.grams = trigrams(self.title)
+
+    def conflicts_with(self, other: "Product") -> bool:
+        """Tells whether two products differ in their model codes or in their
+        tokens of letters and digits, like "ax72" and "ax12" or "128gb" and
+        "256gb".
+        """
+        return ((self.codes and other.codes and not self.codes & other.codes)
+                or (self.variants and other.variants and not self.variants & other.variants))
+
+
+class ProductIndex:
+    """Links the same product across sites into clusters.
+
+    Products are added one at a time and only compared with the candidates
+    that the inverted indexes return: products of other sites that share a
+    model code, or that share title tokens which are rare enough to tell
+    products apart. Tokens that appear in more than max_postings products,
+    like brand names, are left out of the candidate search, so the work per
+    product stays bounded and an index of all sites is built in close to
+    linear time.
+
+    A product joins a product of another site with the same model code, or
+    otherwise the one whose title trigrams are the most similar, if the
+    similarity reaches the threshold and the two don't conflict, see
+    Product.conflicts_with. A cluster holds at most one product per site, so two clusters are
+    only joined if their sites don't overlap, which keeps similar models from
+    chaining into one cluster. Clusters are kept in a union-find forest and
+    grow as new runs are added.
+    """
+
+    def __init__(self, threshold: float = 0.6, max_postings: int = 200, max_candidates: int = 20,
+                 max_code_postings: int = 6) -> None:
+        """Initializes an empty index.
+
+        Args:
+            threshold: The minimum trigram similarity of two titles without a
+                shared model code.
+            max_postings: Tokens in more products than this aren't used to
+                find candidates.
+            max_candidates: The number of candidates with the most shared
+                tokens that are scored per product.
+            max_code_postings: Model codes in more products than this, like
+                "INSTA360", name a product line rather than a model and don't
+                match products on their own.
+        """
+        self.threshold = threshold
+        self.max_postings = max_postings
+        self.max_candidates = max_candidates
+        self.max_code_postings = max_code_postings
+        self.products: list[Product] = []
+        self.files: dict[str, float] = {}
+        self._ids: dict[tuple[str, str], int] = {}
+        self._parents: list[int] = []
+        self._sites: dict[int, set[str]] = {}
+        self._tokens: dict[str, list[int]] = {}
+        self._codes: dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def add(self, site: str, name: str, category: str = "", price: int = None) -> int:
+        """Adds a product, or updates the category and price of a known one.
+
+        Args:
+            site: The name of the scraped site.
+            name: The product title.
+            category: The category path of the product.
+            price: The price in whole Lek, or None.
+
+        Returns:
+            The id of the product.
+        """
+        product_id = self._ids.get((site, name))
+        if product_id is not None:
+            product = self.products[product_id]
+            product.category = category or product.category
+            product.price = price if price is not None else product.price
+            return product_id
+
+        product = Product(site, name, category, price)
+        product_id = len(self.products)
+        self.products.append(product)
+        self._parents.append(product_id)
+        self._sites[product_id] = {site}
+        self._ids[(site, name)] = product_id
+
+        for other_id in self._matches(product):
+            self._union(product_id, other_id)
+        self._index(product_id, product)
+        return product_id
+
+    def _index(self, product_id: int, product: Product) -> None:
+        for token in product.tokens:
+            self._tokens.setdefault(token, []).append(product_id)
+        for code in product.codes:
+            self._codes.setdefault(code, []).append(product_id)
+
+    def _matches(self, product: Product) -> list[int]:
+        """Finds the product of every other site that is the same as the new product."""
+        best: dict[str, tuple[float, int]] = {}
+
+        for code in product.codes:
+            postings = self._codes.get(code, ())
+            if len(postings) > self.max_code_postings:
+                continue
+            for other_id in postings:
+                other = self.products[other_id]
+                if other.site != product.site:
+                    best[other.site] = (2.0, other_id)
+
+        shared: dict[int, int] = {}
+        for token in product.tokens:
+            postings = self._tokens.get(token, ())
+            if len(postings) > self.max_postings:
+                continue
+            for other_id in postings:
+                shared[other_id] = shared.get(other_id, 0) + 1
+
+        candidates = sorted(shared, key=lambda other_id: (-shared[other_id], other_id))
+        scored = 0
+        for other_id in candidates:
+            if scored >= self.max_candidates:
+                break
+            other = self.products[other_id]
+            if other.site == product.site or best.get(other.site, (0.0,))[0] >= 2.0:
+                continue
+            scored += 1
+            if product.conflicts_with(other):
+                continue
+            score = similarity(product.grams, other.grams)
+            if score >= self.threshold and score > best.get(other.site, (0.0,))[0]:
+                best[other.site] = (score, other_id)
+
+        return [other_id for _, other_id in sorted(best.values(), reverse=True)]
+
+    def _find(self, product_id: int) -> int:
+        root = product_id
+        while self._parents[root] != root:
+            root = self._parents[root]
+        while self._parents[product_id] != root:
+            self._parents[product_id], product_id = root, self._parents[product_id]
+        return root
+
+    def _union(self, first: int, second: int) -> None:
+        first, second = self._find(first), self._find(second)
+        if first == second or self._sites[first] & self._sites[second]:
+            return
+        root, child = min(first, second), max(first, second)
+        self._parents[child] = root
+        self._sites[root] |= self._sites.pop(child)
+
+    def cluster_of(self, site: str, name: str) -> list[Product]:
+        """Returns the products that are the same as a product, itself included.
+
+        Raises:
+            KeyError: If the product isn't in the index.
+        """
+        root = self._find(self._ids[(site, name)])
+        return [product for product_id, product in enumerate(self.products) if self._find(product_id) == root]
+
+    def clusters(self, min_sites: int = 2) -> list[list[Product]]:
+        """Groups the products into clusters of the same product.
+
+        Args:
+            min_sites: The minimum number of sites a cluster spans.
+
+        Returns:
+            The clusters in the order of their first product, each in the
+            order the products were added.
+        """
+        groups: dict[int, list[Product]] = {}
+        for product_id, product in enumerate(self.products):
+            groups.setdefault(self._find(product_id), []).append(product)
+        return [group for group in groups.values() if len({product.site for product in group}) >= min_sites]
+
+    def import_csv_tree(self, roots: dict[str, str] = None) -> int:
+        """Adds the products of the CSV files written since the last import.
+
+        Files whose modification time is the same as at the last import are
+        skipped.
+
+        Args:
+            roots: Mapping of output folders to site names. Defaults to CSV_ROOTS.
+
+        Returns:
+            The number of new products.
+        """
+        before = len(self.products)
+        for path, site, category in iter_csv_files(roots or CSV_ROOTS):
+            modified = os.path.getmtime(path)
+            if self.files.get(path) == modified:
+                continue
+
+            with open(path, newline='', encoding='utf-8') as file:
+                reader = csv.reader(file)
+                next(reader, None)
+                for row in reader:
+                    if not row or not row[0]:
+                        continue
+                    prices = [parse_price(value) for value in row[1:3]]
+                    price = next((value for value in prices if value is not None), None)
+                    self.add(site, row[0], category, price)
+            self.files[path] = modified
+        return len(self.products) - before
+
+    def save(self, path: str = INDEX_FILE) -> None:
+        """Writes the products, their clusters and the imported files to a JSON file."""
+        data = {
+            "options": {
+                "threshold": self.threshold,
+                "max_postings": self.max_postings,
+                "max_candidates": self.max_candidates,
+                "max_code_postings": self.max_code_postings,
+            },
+            "files": self.files,
+            "products": [
+                [product.site, product.name, product.category, product.price, self._find(product_id)]
+                for product_id, product in enumerate(self.products)
+            ],
+        }
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE, **kwargs) -> "ProductIndex":
+        """Reads an index written by save, keeping its clusters.
+
+        Args:
+            path: The JSON file. A new index is returned if it doesn't exist.
+            **kwargs: The ProductIndex options.
+        """
+        if not os.path.exists(path):
+            return cls(**kwargs)
+
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        index = cls(**{**data["options"], **kwargs})
+        index.files = data["files"]
+        for product_id, (site, name, category, price, root) in enumerate(data["products"]):
+            product = Product(site, name, category, price)
+            index.products.append(product)
+            index._parents.append(root)
+            index._sites.setdefault(root, set()).add(site)
+            index._ids[(site, name)] = product_id
+            index._index(product_id, product)
+        return index
+
+
+def main() -> None:
+    """Updates the product index from the CSV tree and prints the price comparison.
+
+    Usage: python product_matching.py [index file]
+    """
+    path = sys.argv[1] if len(sys.argv) > 1 else INDEX_FILE
+    index = ProductIndex.load(path)
+    added = index.import_csv_tree()
+    index.save(path)
+
+    for cluster in index.clusters():
+        priced = sorted((product for product in cluster if product.price is not None), key=lambda product: product.price)
+        print(cluster[0].name)
+        for product in priced or cluster:
+            print(f"\t{product.site}\t{product.price}\t{product.name}")
+    print(f"{added} new products, {len(index)} products, {len(index.clusters())} clusters across sites")
+
+
+if __name__ == "__main__":
+    main()
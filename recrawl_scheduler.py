@@ -0,0 +1,492 @@
+import math
+import sqlite3
+import sys
+import threading
+import time
+from typing import Callable
+
+DATABASE = "recrawl_schedule.sqlite3"
+DAY = 24 * 3600
+DAILY_BUDGET = 2000
+MIN_INTERVAL = 3600
+MAX_INTERVAL = 7 * DAY
+DECAY = 0.95
+# A category without history counts as one visit a day ago that found half a change.
+PRIOR_VISITS = 1.0
+PRIOR_CHANGES = 0.5
+PRIOR_SECONDS = DAY
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    site TEXT NOT NULL,
+    category TEXT NOT NULL,
+    digest TEXT,
+    pages INTEGER NOT NULL DEFAULT 1,
+    visits REAL NOT NULL DEFAULT 0,
+    changes REAL NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    crawled_at REAL,
+    interval REAL,
+    not_before REAL,
+    PRIMARY KEY (site, category)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    site TEXT NOT NULL,
+    category TEXT NOT NULL,
+    crawled_at REAL NOT NULL,
+    pages INTEGER NOT NULL,
+    changed INTEGER
+);
+"""
+
+
+def change_rate(visits: float, changes: float, seconds: float) -> float:
+    """Estimates how often a category changes, in changes per second.
+
+    A visit only tells whether the category changed since the last one, not
+    how often, so the share of changed visits is corrected for the changes
+    that fell between the same two visits: with n visits, X of them changed,
+    over T seconds, the rate is -ln((n - X + 0.5) / (n + 0.5)) * n / T. The
+    prior keeps categories with little history from looking static.
+
+    Args:
+        visits: The number of visits that were compared with the one before.
+        changes: The number of those visits that found a change.
+        seconds: The time between the compared visits, added up.
+    """
+    visits += PRIOR_VISITS
+    changes += PRIOR_CHANGES
+    seconds += PRIOR_SECONDS
+    return -math.log((visits - changes + 0.5) / (visits + 0.5)) * visits / seconds
+
+
+def marginal_freshness(rate: float, frequency: float) -> float:
+    """Returns how much the freshness of a category grows with its crawl frequency.
+
+    A category that changes rate times a second and is crawled frequency
+    times a second is up to date a share (1 - e^-x) / x of the time, with
+    x = rate / frequency. This is the derivative of that share by frequency.
+    """
+    if rate <= 0:
+        return 0.0
+    x = rate / frequency
+    if x < 1e-4:
+        return x / (2 * frequency)
+    return (1 - (1 + x) * math.exp(-x)) / rate
+
+
+def best_frequency(rate: float, cost: float, price: float, low: float, high: float) -> float:
+    """Finds the crawl frequency at which one more request gains a category price in freshness.
+
+    Args:
+        rate: The change rate of the category, per second.
+        cost: The number of requests per crawl.
+        price: The freshness a request has to gain.
+        low: The lowest frequency, per second.
+        high: The highest frequency, per second.
+    """
+    if marginal_freshness(rate, low) <= price * cost:
+        return low
+    if marginal_freshness(rate, high) >= price * cost:
+        return high
+    for _ in range(40):
+        middle = math.sqrt(low * high)
+        if marginal_freshness(rate, middle) > price * cost:
+            low = middle
+        else:
+            high = middle
+    return math.sqrt(low * high)
+
+
+def allocate(rates: list[float], costs: list[float], budget: float, min_interval: float = MIN_INTERVAL,
+             max_interval: float = MAX_INTERVAL) -> list[float]:
+    """Splits a request budget into crawl intervals that keep the most categories up to date.
+
+    Every category is crawled at the frequency where one more request gains
+    the same freshness for all of them, with that gain set so the requests
+    add up to the budget. Categories that rarely change get long intervals.
+    So do categories that change far faster than they can be crawled within
+    the budget, as crawling them more often hardly keeps them fresher.
+
+    Args:
+        rates: The change rate of every category, per second.
+        costs: The number of requests a crawl of every category takes.
+        budget: The number of requests per second.
+        min_interval: The shortest interval in seconds.
+        max_interval: The longest interval in seconds. Every category is
+            crawled at least this often, even if that exceeds the budget.
+
+    Returns:
+        The crawl interval of every category in seconds.
+    """
+    low, high = 1 / max_interval, 1 / min_interval
+
+    def frequencies(price: float) -> list[float]:
+        return [best_frequency(rate, cost, price, low, high) for rate, cost in zip(rates, costs)]
+
+    def load(chosen: list[float]) -> float:
+        return sum(cost * frequency for cost, frequency in zip(costs, chosen))
+
+    chosen = frequencies(0.0)
+    if load(chosen) > budget and sum(costs) * low < budget:
+        dear = math.log(max(marginal_freshness(rate, low) / cost for rate, cost in zip(rates, costs)))
+        cheap = dear + math.log(1e-12)
+        for _ in range(60):
+            middle = (cheap + dear) / 2
+            if load(frequencies(math.exp(middle))) > budget:
+                cheap = middle
+            else:
+                dear = middle
+        chosen = frequencies(math.exp(dear))
+    elif load(chosen) > budget:
+        chosen = [low] * len(rates)
+    return [1 / frequency for frequency in chosen]
+
+
+class RecrawlScheduler:
+    """Learns how often every category changes and decides when to crawl it again.
+
+    After every crawl, the fingerprint of a category's products and prices
+    is compared with the one of the crawl before. The visits, the changes
+    found and the time between visits are kept per category, with older
+    visits weighed down by decay, so the change rate follows a category
+    whose pace changes. plan splits the daily request budget into crawl
+    intervals, see allocate, using the number of pages of the last crawl as
+    its cost.
+
+    The schedule lives in one SQLite database, so a restarted daemon keeps
+    what it learned.
+    """
+
+    def __init__(self, path: str = DATABASE, daily_budget: float = DAILY_BUDGET, min_interval: float = MIN_INTERVAL,
+                 max_interval: float = MAX_INTERVAL, decay: float = DECAY) -> None:
+        """Opens the schedule, creating the database file if needed.
+
+        Args:
+            path: The path of the SQLite database file.
+            daily_budget: The number of requests per day all categories share.
+            min_interval: The shortest time between two crawls of a category, in seconds.
+            max_interval: The longest time between two crawls of a category, in seconds.
+            decay: The weight a visit keeps with every newer visit.
+        """
+        self.path = path
+        self.daily_budget = daily_budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.decay = decay
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def register(self, site: str, category: str) -> bool:
+        """Adds a category, which is due at once.
+
+        Returns:
+            True if the category is new.
+        """
+        with self._lock, self._connection:
+            return self._connection.execute(
+                "INSERT OR IGNORE INTO categories (site, category) VALUES (?, ?)", (site, category)
+            ).rowcount == 1
+
+    def record(self, site: str, category: str, digest: str, pages: int, now: float = None) -> bool | None:
+        """Records a crawl of a category.
+
+        Args:
+            site: The name of the site.
+            category: The category.
+            digest: The fingerprint of the category's products and prices.
+            pages: The number of requests the crawl took.
+            now: The time of the crawl. Defaults to the current time.
+
+        Returns:
+            Whether the category changed since its last crawl, or None on its first crawl.
+        """
+        now = time.time() if now is None else now
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO categories (site, category) VALUES (?, ?)", (site, category)
+            )
+            last_digest, crawled_at = self._connection.execute(
+                "SELECT digest, crawled_at FROM categories WHERE site = ? AND category = ?", (site, category)
+            ).fetchone()
+
+            changed = None
+            if last_digest is not None and crawled_at is not None:
+                changed = digest != last_digest
+                self._connection.execute(
+                    "UPDATE categories SET visits = visits * :decay + 1, changes = changes * :decay + :changed, "
+                    "seconds = seconds * :decay + :elapsed WHERE site = :site AND category = :category",
+                    {"decay": self.decay, "changed": int(changed), "elapsed": max(now - crawled_at, 0.0),
+                     "site": site, "category": category}
+                )
+            self._connection.execute(
+                "UPDATE categories SET digest = ?, pages = ?, crawled_at = ?, not_before = NULL "
+                "WHERE site = ? AND category = ?",
+                (digest, max(pages, 1), now, site, category)
+            )
+            self._connection.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?)",
+                (site, category, now, pages, None if changed is None else int(changed))
+            )
+        return changed
+
+    def postpone(self, site: str, category: str, seconds: float = None, now: float = None) -> None:
+        """Keeps a category whose crawl failed from being due again for a while.
+
+        Args:
+            site: The name of the site.
+            category: The category.
+            seconds: How long to wait. Defaults to min_interval.
+            now: The current time. Defaults to time.time().
+        """
+        now = time.time() if now is None else now
+        seconds = self.min_interval if seconds is None else seconds
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE categories SET not_before = ? WHERE site = ? AND category = ?", (now + seconds, site, category)
+            )
+
+    def _rows(self, keys: list[tuple[str, str]] = None) -> list[tuple]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT site, category, pages, visits, changes, seconds, crawled_at, interval, not_before "
+                "FROM categories ORDER BY site, category"
+            ).fetchall()
+        if keys is None:
+            return rows
+        wanted = set(keys)
+        return [row for row in rows if (row[0], row[1]) in wanted]
+
+    def plan(self, keys: list[tuple[str, str]] = None) -> dict[tuple[str, str], float]:
+        """Sets the crawl interval of every category from its change rate and cost.
+
+        Args:
+            keys: The (site, category) pairs that share the budget. Defaults
+                to every category in the schedule.
+
+        Returns:
+            The interval of every category in seconds.
+        """
+        rows = self._rows(keys)
+        if not rows:
+            return {}
+        intervals = allocate(
+            [change_rate(visits, changes, seconds) for _, _, _, visits, changes, seconds, *_ in rows],
+            [pages for _, _, pages, *_ in rows],
+            self.daily_budget / DAY, self.min_interval, self.max_interval
+        )
+        planned = {(row[0], row[1]): interval for row, interval in zip(rows, intervals)}
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE categories SET interval = ? WHERE site = ? AND category = ?",
+                [(interval, site, category) for (site, category), interval in planned.items()]
+            )
+        return planned
+
+    def next_crawl(self, crawled_at: float | None, interval: float | None, not_before: float | None) -> float:
+        """Returns the time a category is due, 0 for a category that was never crawled."""
+        due = 0.0 if crawled_at is None else crawled_at + (self.min_interval if interval is None else interval)
+        return max(due, not_before or 0.0)
+
+    def due(self, keys: list[tuple[str, str]] = None, now: float = None) -> list[tuple[str, str]]:
+        """Lists the categories whose interval is over, the longest overdue first.
+
+        Args:
+            keys: The (site, category) pairs to look at. Defaults to every category.
+            now: The current time. Defaults to time.time().
+        """
+        now = time.time() if now is None else now
+        due = [(self.next_crawl(*row[6:]), row[0], row[1]) for row in self._rows(keys)]
+        return [(site, category) for at, site, category in sorted(due) if at <= now]
+
+    def seconds_until_due(self, keys: list[tuple[str, str]] = None, now: float = None) -> float | None:
+        """Returns how long until the next category is due, or None if there are no categories."""
+        now = time.time() if now is None else now
+        times = [self.next_crawl(*row[6:]) for row in self._rows(keys)]
+        return max(min(times) - now, 0.0) if times else None
+
+    def status(self, keys: list[tuple[str, str]] = None) -> list[dict]:
+        """Returns the pages, changes, change rate and interval of every category.
+
+        The change rate is in changes per day and the interval in hours.
+        """
+        return [{
+            "site": site,
+            "category": category,
+            "pages": pages,
+            "visits": visits,
+            "changes": changes,
+            "rate": change_rate(visits, changes, seconds) * DAY,
+            "interval": None if interval is None else interval / 3600,
+            "due": self.next_crawl(crawled_at, interval, not_before),
+        } for site, category, pages, visits, changes, seconds, crawled_at, interval, not_before in self._rows(keys)]
+
+    def planned_requests(self, keys: list[tuple[str, str]] = None) -> float:
+        """Returns the number of requests per day that the planned intervals take."""
+        return sum(pages * DAY / (interval or self.min_interval) for _, _, pages, *_, interval, _ in self._rows(keys))
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        self._connection.close()
+
+    def __enter__(self) -> "RecrawlScheduler":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def run(scheduler: RecrawlScheduler, targets: dict[tuple[str, str], Callable[[], tuple[str, int]]],
+        rounds: int = None, max_sleep: float = 300.0) -> int:
+    """Crawls categories whenever they are due, as a long-lived daemon.
+
+    Every round plans the intervals, crawls the due categories one after the
+    other and records what they found, then sleeps until the next category
+    is due. A category whose crawl fails is postponed by min_interval.
+
+    Args:
+        scheduler: The RecrawlScheduler to plan with.
+        targets: Mapping of (site, category) pairs to functions that crawl
+            the category and return the fingerprint of its products and
+            prices and the number of requests, like scraper.scrape_category.
+        rounds: The number of rounds to run. Defaults to running until interrupted.
+        max_sleep: The longest sleep between rounds, in seconds.
+
+    Returns:
+        The number of categories crawled.
+    """
+    keys = list(targets)
+    for site, category in keys:
+        scheduler.register(site, category)
+
+    crawled = 0
+    round_number = 0
+    while rounds is None or round_number < rounds:
+        scheduler.plan(keys)
+        for site, category in scheduler.due(keys):
+            try:
+                digest, pages = targets[(site, category)]()
+            except Exception as error:
+                print(f"Category {site}/{category} failed: {error}")
+                scheduler.postpone(site, category)
+                continue
+            changed = scheduler.record(site, category, digest, pages)
+            crawled += 1
+            print(f"Crawled {site}/{category}: {pages} pages, {'changed' if changed else 'unchanged'}")
+
+        round_number += 1
+        if rounds is None or round_number < rounds:
+            wait = scheduler.seconds_until_due(keys)
+            time.sleep(max_sleep if wait is None else min(wait, max_sleep))
+    return crawled
+
+
+def crawl_targets(names: list[str] = None, output_format: str = "history",
+                  drivers: dict = None) -> dict[tuple[str, str], Callable]:
+    """Lists the categories of the named sites with the function that crawls each.
+
+    Neptun is only crawled when it is named. Its categories are rendered in
+    a browser, started on first use and kept for the following categories.
+
+    Args:
+        names: The names of the sites, "neptun" included. Defaults to the
+            registered sites.
+        output_format: "csv", "parquet" or "history". Defaults to the price
+            history store, since the CSV files of a category grow by a full
+            copy of it with every crawl.
+        drivers: Receives the browser started for Neptun under the key
+            "neptun", so that the caller can quit it.
+    """
+    from selenium.common.exceptions import WebDriverException
+
+    import NeptunDataCollection
+    import scraper
+    from sites import SITES
+
+    shops = [name for name in names if name != "neptun"] if names else list(SITES)
+    targets = {
+        (site.name, slug): (lambda site=site, slug=slug, filename=filename:
+                            scraper.scrape_category(site, slug, filename, output_format=output_format))
+        for site, slug, filename in (scraper.category_jobs(shops) if shops else [])
+    }
+
+    drivers = {} if drivers is None else drivers
+
+    def crawl_neptun(job: NeptunDataCollection.CategoryJob) -> tuple[str, int]:
+        if "neptun" not in drivers:
+            drivers["neptun"] = NeptunDataCollection.setup_driver()
+        try:
+            return NeptunDataCollection.run_job(job, drivers["neptun"])
+        except WebDriverException:
+            try:
+                drivers.pop("neptun").quit()
+            except WebDriverException:
+                pass
+            raise
+
+    if names and "neptun" in names:
+        for job in NeptunDataCollection.list_category_jobs(output_format):
+            targets[("neptun", NeptunDataCollection.category_name(job.directory, job.filename))] = (
+                lambda job=job: crawl_neptun(job)
+            )
+    return targets
+
+
+def main() -> None:
+    """Recrawls categories at intervals learned from how often they change.
+
+    Every command takes site names and defaults to the registered sites.
+    Neptun is only crawled when "neptun" is named; its categories are
+    rendered in a browser. A category that fails is tried again after
+    MIN_INTERVAL. The products are recorded in the
+    price history store.
+
+    Usage:
+        python recrawl_scheduler.py run [site ...]      crawl due categories until interrupted
+        python recrawl_scheduler.py once [site ...]     crawl the due categories once
+        python recrawl_scheduler.py status [site ...]   show the change rate and interval of every category
+    """
+    import fetch
+    import metrics
+    import page_fingerprints
+    import parse_pool
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    names = sys.argv[2:]
+
+    with RecrawlScheduler() as scheduler:
+        if command in ("run", "once"):
+            drivers = {}
+            targets = crawl_targets(names, drivers=drivers)
+            fetch.enable_cache()
+            page_fingerprints.enable()
+            with metrics.from_environment(), parse_pool.enable():
+                try:
+                    crawled = run(scheduler, targets, rounds=1 if command == "once" else None)
+                except KeyboardInterrupt:
+                    return
+                finally:
+                    for driver in drivers.values():
+                        driver.quit()
+            print(f"Crawled {crawled} categories")
+        elif command == "status":
+            rows = [row for row in scheduler.status() if not names or row["site"] in names]
+            for row in rows:
+                interval = "unplanned" if row["interval"] is None else f"every {row['interval']:.1f}h"
+                due = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["due"])) if row["due"] else "now"
+                print(f"{row['site']}\t{row['category']}\t{row['pages']} pages\t"
+                      f"{row['changes']:.1f} of {row['visits']:.1f} visits changed\t"
+                      f"{row['rate']:.2f} changes/day\t{interval}\tdue {due}")
+            keys = [(row["site"], row["category"]) for row in rows]
+            print(f"{scheduler.planned_requests(keys):.0f} of {scheduler.daily_budget} requests per day planned")
+        else:
+            print(main.__doc__)
+            sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+
+def route_key(url: str) -> str:
+    """Returns the lookup key of a URL: its path and its sorted query string."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{parts.path}?{query}" if query else parts.path
+
+
+class Recording:
+    """Represents one recorded HTTP response."""
+    def __init__(self, body: bytes, content_type: str = "text/html; charset=utf-8", status: int = 200) -> None:
+        """Initializes a Recording with the response body, type and status."""
+        self.body = body
+        self.content_type = content_type
+        self.status = status
+
+
+class ReplayServer:
+    """Serves recorded responses over HTTP on localhost.
+
+    Requests are matched on their path and query string, with the query
+    parameters in any order. Unknown URLs get a 404 response. The server runs
+    in a background thread and can be used as a context manager.
+
+    Each response can be delayed by a fixed latency plus a random jitter, to
+    stand in for the round trip to the real site.
+    """
+
+    def __init__(self, recordings: dict[str, Recording] = None, latency: float = 0.0, jitter: float = 0.0) -> None:
+        """Initializes the server.
+
+        Args:
+            recordings: Mapping of URLs or paths to the recorded responses.
+            latency: Seconds every response is delayed by.
+            jitter: Up to this many seconds are added to the delay at random.
+        """
+        self.recordings = {route_key(url): recording for url, recording in (recordings or {}).items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.requests: list[str] = []
+        self._server = None
+        self._thread = None
+
+    @classmethod
+    def from_directory(cls, directory: str, latency: float = 0.0, jitter: float = 0.0) -> "ReplayServer":
+        """Loads the recordings listed in a directory's routes.json file.
+
+        routes.json maps each URL path to a file in the same directory, either
+        as a file name or as an object with "file", "content_type" and
+        "status" keys.
+
+        Args:
+            directory: The directory with routes.json and the recorded files.
+            latency: Seconds every response is delayed by.
+            jitter: Up to this many seconds are added to the delay at random.
+
+        Returns:
+            A ReplayServer serving those recordings.
+        """
+        with open(os.path.join(directory, "routes.json"), encoding="utf-8") as file:
+            routes = json.load(file)
+
+        recordings = {}
+        for url, route in routes.items():
+            if isinstance(route, str):
+                route = {"file": route}
+            with open(os.path.join(directory, route["file"]), "rb") as file:
+                body = file.read()
+            content_type = route.get("content_type")
+            if content_type is None:
+                is_json = route["file"].endswith(".json")
+                content_type = "application/json" if is_json else "text/html; charset=utf-8"
+            recordings[url] = Recording(body, content_type, route.get("status", 200))
+
+        return cls(recordings, latency=latency, jitter=jitter)
+
+    @property
+    def url(self) -> str:
+        """The base URL of the running server, without a trailing slash."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add(self, url: str, recording: Recording) -> None:
+        """Adds or replaces the recorded response for a URL or path."""
+        self.recordings[route_key(url)] = recording
+
+    def handle(self, handler: BaseHTTPRequestHandler) -> None:
+        """Writes the recorded response for a request."""
+        self.requests.append(handler.path)
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        recording = self.recordings.get(route_key(handler.path))
+        if recording is None:
+            recording = Recording(b"Not Found", "text/plain", 404)
+
+        handler.send_response(recording.status)
+        handler.send_header("Content-Type", recording.content_type)
+        handler.send_header("Content-Length", str(len(recording.body)))
+        handler.end_headers()
+        handler.wfile.write(recording.body)
+
+    def start(self) -> "ReplayServer":
+        """Starts serving on a free localhost port."""
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                replay.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the server and closes its socket."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "ReplayServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,435 @@
+import asyncio
+import hashlib
+import sys
+import time
+
+from bs4 import BeautifulSoup
+import requests
+
+from async_crawl import AsyncCrawler
+from extraction import extract_products
+import fetch
+from frontier import Frontier, Job
+import metrics
+import page_fingerprints
+from page_fingerprints import fingerprint
+import parse_pool
+import parsed_page
+from parsed_page import ParsedPage
+from sinks import CsvSink, file_lock, open_sink
+from sites import SITES, Site
+
+# The number of rows a frontier worker collects for a category before writing them.
+BATCH_ROWS = 5000
+
+
+def write_rows(site: Site, rows: list[tuple], filename: str, sink: CsvSink = None) -> None:
+    """Writes the rows of one page to the sink, or to the CSV file if there is none."""
+    metrics.count("rows", len(rows))
+    if sink is None:
+        with CsvSink(site.output_path(filename), fieldnames=site.fieldnames) as page_sink:
+            page_sink.write_rows(rows)
+    else:
+        sink.write_rows(rows)
+
+
+def parse_page(site: Site, content: bytes) -> tuple[list[tuple], str]:
+    """Parses a category page. Runs in a worker process when the parse pool is enabled.
+
+    Only the product grid and the pagination of the site are parsed, in
+    one pass.
+
+    Args:
+        site: The site the page belongs to.
+        content: The HTML of the page.
+
+    Returns:
+        The (title, current price, old price) rows and the URL for the next
+        page or False.
+    """
+    page = ParsedPage(content, site.page_regions)
+    return extract_products(page.soup, site.selectors), find_next_link(site, page.soup)
+
+
+@metrics.timed("find_next_link")
+def find_next_link(site: Site, soup: BeautifulSoup) -> str:
+    """Finds the URL for the next page of a category page.
+
+    Args:
+        site: The site the page belongs to.
+        soup: BeautifulSoup object containing the HTML content.
+
+    Returns:
+        The URL for the next page if available, otherwise False.
+    """
+    return site.pagination.next_link(soup)
+
+
+@metrics.timed("save")
+def save(site: Site, response: requests.Response, filename: str, sink: CsvSink = None) -> str:
+    """Saves product data from a category page and finds the next page.
+
+    When page fingerprints are enabled, a page whose product region is the
+    same as on the last run isn't parsed again; its stored rows are written
+    instead. Pages served from the HTTP cache are parsed like any other,
+    since the cache only saves the download.
+
+    Args:
+        site: The site the page belongs to.
+        response: Response object from the requests library.
+        filename: Name of the file to save the data to.
+        sink: Optional open sink of the category to write the rows to.
+            Without one, the CSV file is opened for this page only.
+
+    Returns:
+        The URL for the next page if available, otherwise False.
+
+    Raises:
+        ValueError: If the response status code is not 200.
+    """
+    if response.status_code != 200:
+        raise ValueError(f"Error: Problem with opening the website. Status code: {response.status_code}")
+
+    if page_fingerprints.store is not None:
+        start, end = site.product_region or (None, ())
+        digest = fingerprint(response.content, start=start, end=end)
+        stored = page_fingerprints.store.unchanged(site.name, response.url, digest)
+
+        if stored is not None:
+            rows, next_link = stored
+            write_rows(site, rows, filename, sink)
+            return next_link or False
+
+        rows, next_link = parse_pool.parse(parse_page, site, response.content)
+        write_rows(site, rows, filename, sink)
+        page_fingerprints.store.update(site.name, response.url, digest, rows, next_link, sink=sink)
+        return next_link
+
+    rows, next_link = parse_pool.parse(parse_page, site, response.content)
+    write_rows(site, rows, filename, sink)
+    return next_link
+
+
+def open_category_sink(site: Site, slug: str, filename: str, output_format: str = "csv"):
+    """Opens the sink that the products of a category are appended to.
+
+    Page fingerprints of the pages saved to it are stored once it is closed.
+    """
+    return page_fingerprints.track(open_sink(site.output_path(filename), site.name, slug,
+                                             output_format=output_format, fieldnames=site.fieldnames))
+
+
+def scrape_category(site: Site, slug: str, filename: str, output_format: str = "csv") -> tuple[str, int]:
+    """Scrapes every page of one category, one page after the other.
+
+    Args:
+        site: The site the category belongs to.
+        slug: The category name for the URL.
+        filename: The file name to save the data to.
+        output_format: "csv", "parquet" or "history".
+
+    Returns:
+        The fingerprint of the product regions of all pages, which changes
+        with the products and prices of the category, and the number of pages.
+    """
+    url = site.category_url(slug)
+    start, end = site.product_region or (None, ())
+    digest = hashlib.sha256()
+    pages = 0
+
+    with metrics.labels(site.name, slug), open_category_sink(site, slug, filename, output_format) as sink:
+        while url:
+            response = fetch.get(url)
+            digest.update(fingerprint(response.content, start=start, end=end).encode())
+            pages += 1
+            url = save(site, response, filename=filename, sink=sink)
+
+    return digest.hexdigest(), pages
+
+
+@metrics.timed("plan")
+def plan_pages(site: Site, response: requests.Response) -> list[str] | None:
+    """Lists the URLs of the category pages after the one in the response.
+
+    Only the pagination of the page is parsed.
+
+    Args:
+        site: The site the page belongs to.
+        response: Response object of a category page.
+
+    Returns:
+        The URLs in page order, or None if the pagination doesn't tell them.
+    """
+    page = parsed_page.parse(response, site.pagination_regions)
+    return site.pagination.plan(page.soup)
+
+
+async def crawl_category(crawler: AsyncCrawler, site: Site, slug: str, filename: str,
+                         output_format: str = "csv") -> None:
+    """Scrapes every page of a category through a shared crawler.
+
+    Once the first page is in, the remaining pages are planned from its
+    pagination and requested all at once; they are still saved in page
+    order. If the last planned page links to further pages, as when the
+    pagination only shows a window of page numbers, planning starts again
+    from there. Pages are followed one after the other through their next
+    links whenever the pagination can't be planned.
+
+    Args:
+        crawler: The AsyncCrawler used to fetch the pages.
+        site: The site the category belongs to.
+        slug: The category name for the URL.
+        filename: The file name to save the data to.
+        output_format: "csv", "parquet" or "history".
+    """
+    url = site.category_url(slug)
+
+    with metrics.labels(site.name, slug), open_category_sink(site, slug, filename, output_format) as sink:
+        response = await crawler.fetch(url)
+        next_link = await crawler.run(save, site, response, filename=filename, sink=sink)
+
+        while next_link:
+            planned = await crawler.run(plan_pages, site, response)
+
+            if not planned or planned[0] != next_link:
+                response = await crawler.fetch(next_link)
+                next_link = await crawler.run(save, site, response, filename=filename, sink=sink)
+                continue
+
+            responses = await asyncio.gather(*(crawler.fetch(page_url) for page_url in planned))
+            for response in responses:
+                next_link = await crawler.run(save, site, response, filename=filename, sink=sink)
+
+
+def category_jobs(names: list[str] = None) -> list[tuple[Site, str, str]]:
+    """Lists the categories of registered sites.
+
+    Args:
+        names: The names of the sites. Defaults to all registered sites.
+
+    Returns:
+        (site, category URL name, file name) tuples.
+
+    Raises:
+        KeyError: If a site isn't registered.
+    """
+    sites = [SITES[name] for name in names] if names else list(SITES.values())
+    return [(site, slug, filename) for site in sites for slug, filename in site.categories.items()]
+
+
+async def crawl(jobs: list[tuple[Site, str, str]] = None, max_concurrency: int = 8, per_host: int = 6,
+                output_format: str = "csv") -> None:
+    """Scrapes categories of any number of sites concurrently.
+
+    All categories share one crawler, so the request limits and the pooled
+    connections of the fetch module are shared across sites.
+
+    Args:
+        jobs: (site, category URL name, file name) tuples. Defaults to every
+            category of every registered site.
+        max_concurrency: The maximum number of requests in flight overall.
+        per_host: The maximum number of requests in flight to one host.
+        output_format: "csv", "parquet" or "history".
+    """
+    if jobs is None:
+        jobs = category_jobs()
+
+    crawler = AsyncCrawler(max_concurrency=max_concurrency, per_host=per_host)
+    results = await asyncio.gather(
+        *(crawl_category(crawler, site, slug, filename, output_format) for site, slug, filename in jobs),
+        return_exceptions=True
+    )
+
+    for (site, slug, _), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            print(f"Category {site.name}/{slug} failed: {result}")
+
+
+def seed_frontier(frontier: Frontier, jobs: list[tuple[Site, str, str]] = None, output_format: str = "csv") -> int:
+    """Queues the first page of every category in a crawl frontier.
+
+    Args:
+        frontier: The Frontier to queue the pages in.
+        jobs: (site, category URL name, file name) tuples. Defaults to every
+            category of every registered site.
+        output_format: "csv", "parquet" or "history".
+
+    Returns:
+        The number of new jobs.
+    """
+    if jobs is None:
+        jobs = category_jobs()
+    return sum(
+        frontier.add(site.name, slug, site.category_url(slug), {"filename": filename, "output_format": output_format})
+        for site, slug, filename in jobs
+    )
+
+
+class PageBatch:
+    """Collects the rows of the frontier pages of one category that a worker scraped.
+
+    The rows are written with one sink when the batch is closed, so a
+    category gets one write per batch instead of one per page: one Parquet
+    part file or one price history transaction. Workers in any number of
+    processes write batches of the same category, so the write holds a lock
+    on the category's file: the first batch writes the header, and the rows
+    of one batch stay together. Page fingerprints of the pages in the batch
+    are stored once it is written.
+    """
+
+    def __init__(self, site: Site, category: str, filename: str, output_format: str = "csv") -> None:
+        """Initializes an empty batch.
+
+        Args:
+            site: The site the category belongs to.
+            category: The category URL name.
+            filename: The file name of the category.
+            output_format: "csv", "parquet" or "history".
+        """
+        self.site = site
+        self.category = category
+        self.filename = filename
+        self.output_format = output_format
+        self.rows: list[tuple] = []
+        self.jobs: list[Job] = []
+        self.started_at = time.time()
+        self._fingerprints = page_fingerprints.store
+
+    def write_rows(self, rows) -> None:
+        """Adds the rows of a page to the batch."""
+        self.rows.extend(rows)
+
+    def close(self) -> None:
+        """Writes the rows to the category's sink under the lock of its file."""
+        try:
+            with file_lock(self.site.output_path(self.filename)), \
+                    open_sink(self.site.output_path(self.filename), self.site.name, self.category,
+                              output_format=self.output_format, fieldnames=self.site.fieldnames) as sink:
+                sink.write_rows(self.rows)
+        except BaseException:
+            self.discard()
+            raise
+        if self._fingerprints is not None:
+            self._fingerprints.release(self)
+        self.rows = []
+
+    def discard(self) -> None:
+        """Forgets the rows and the page fingerprints of the batch."""
+        if self._fingerprints is not None:
+            self._fingerprints.drop(self)
+        self.rows = []
+
+
+def scrape_job(frontier: Frontier, job: Job, sink=None) -> None:
+    """Scrapes one category page claimed from a frontier and queues the pages it links to.
+
+    Without a sink, the page is saved on its own under a lock on the
+    category's file, like a PageBatch of one page.
+
+    Args:
+        frontier: The Frontier the job was claimed from.
+        job: The claimed page.
+        sink: Optional PageBatch of the job's category to add the rows to.
+    """
+    site = SITES[job.site]
+    filename, output_format = job.data["filename"], job.data.get("output_format", "csv")
+
+    with metrics.labels(site.name, job.category):
+        response = fetch.get(job.url)
+        if sink is None:
+            with file_lock(site.output_path(filename)), \
+                    open_category_sink(site, job.category, filename, output_format) as page_sink:
+                next_link = save(site, response, filename=filename, sink=page_sink)
+        else:
+            next_link = save(site, response, filename=filename, sink=sink)
+        if next_link:
+            frontier.add(site.name, job.category, [*(plan_pages(site, response) or []), next_link], job.data)
+
+
+def work_frontier(frontier: Frontier, sites: list[str] = None, owner: str = None, poll_interval: float = 5.0,
+                  batch_rows: int = BATCH_ROWS) -> int:
+    """Claims category pages from a crawl frontier and scrapes them until the crawl is finished.
+
+    Each page queues its next page and, when the pagination tells them, all
+    the pages after it, so that other workers can take them right away. As
+    long as other workers hold leases, the worker waits for the pages they
+    may still queue.
+
+    The rows of each category are collected in a PageBatch and written once
+    it holds batch_rows rows, once half the lease of its first page has
+    passed, or when there is no page left to claim. Only then are its pages
+    completed; if the worker stops before, their leases run out and they
+    are scraped again. The rows of a category are written in the order the
+    workers finish its pages, not in page order.
+
+    Args:
+        frontier: The Frontier to claim pages from.
+        sites: The names of the sites to work on. Defaults to all registered sites.
+        owner: The name of the worker. Defaults to frontier.worker_name().
+        poll_interval: Seconds to wait before looking for new pages again.
+        batch_rows: The number of rows after which a batch is written.
+
+    Returns:
+        The number of pages scraped.
+    """
+    sites = sites or list(SITES)
+    batches: dict[tuple[str, str, str, str], PageBatch] = {}
+    done = 0
+
+    def write(key: tuple[str, str, str, str]) -> int:
+        batch = batches.pop(key)
+        try:
+            batch.close()
+        except OSError as error:
+            print(f"Couldn't write {len(batch.jobs)} pages of {key[0]}/{key[1]}: {error}")
+            for job in batch.jobs:
+                frontier.fail(job, str(error))
+            return 0
+        return sum(frontier.complete(job) for job in batch.jobs)
+
+    try:
+        while True:
+            for key in [key for key, batch in batches.items()
+                        if len(batch.rows) >= batch_rows
+                        or time.time() - batch.started_at >= frontier.lease_seconds / 2]:
+                done += write(key)
+
+            job = frontier.claim(owner, sites=sites)
+            if job is None:
+                for key in list(batches):
+                    done += write(key)
+                if not frontier.unfinished(sites):
+                    return done
+                time.sleep(poll_interval)
+                continue
+
+            key = (job.site, job.category, job.data["filename"], job.data.get("output_format", "csv"))
+            if key not in batches:
+                batches[key] = PageBatch(SITES[job.site], *key[1:])
+            try:
+                scrape_job(frontier, job, batches[key])
+            except (ValueError, OSError, requests.RequestException) as error:
+                print(f"Page {job.url} failed on attempt {job.attempts}: {error}")
+                frontier.fail(job, str(error))
+                continue
+            batches[key].jobs.append(job)
+    finally:
+        for batch in batches.values():
+            batch.discard()
+
+
+def main() -> None:
+    """Scrapes the sites named on the command line, or all registered sites.
+
+    Usage: python scraper.py [site ...]
+    """
+    jobs = category_jobs(sys.argv[1:])
+    fetch.enable_cache()
+    fingerprints = page_fingerprints.enable()
+    with metrics.from_environment(), parse_pool.enable():
+        asyncio.run(crawl(jobs))
+    print(fingerprints.report())
+
+
+if __name__ == '__main__':
+    main()
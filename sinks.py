@@ -0,0 +1,184 @@
+import contextlib
+import csv
+import os
+
+FIELDNAMES = ("Emri", "Cmimi aktual", "Cmimi i vjeter")
+CSV_ROOTS = {"Globe": "globe", "Shpresa.al": "shpresa", "Neptun.al": "neptun"}
+
+
+class CsvSink:
+    """Streams product rows into a CSV file that stays open for a whole category.
+
+    Rows are written as soon as they are parsed through a buffered file, so
+    memory use doesn't grow with the size of the category. The buffer is
+    flushed every flush_every rows and on close, and fsync=True additionally
+    forces each flush to disk. Rows are cut to the columns of the header, so
+    files with fewer columns than FIELDNAMES take the same rows.
+    """
+
+    def __init__(self, path: str, mode: str = "a", fieldnames: tuple[str, ...] = FIELDNAMES,
+                 buffer_size: int = 64 * 1024, flush_every: int = 1000, fsync: bool = False) -> None:
+        """Opens the CSV file.
+
+        Args:
+            path: The path of the CSV file.
+            mode: "a" to append to an existing file, or "w" to overwrite it.
+                The header is written whenever the file starts out empty.
+            fieldnames: The header of the CSV file.
+            buffer_size: The size of the write buffer in bytes.
+            flush_every: The number of rows after which the buffer is flushed.
+            fsync: Whether to force every flush to disk.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if mode == "a" and not (os.path.exists(path) and os.path.getsize(path) > 0):
+            mode = "w"
+
+        self.path = path
+        self.flush_every = flush_every
+        self.fsync = fsync
+        self.rows_written = 0
+        self._columns = len(fieldnames)
+        self._unflushed = 0
+        self._file = open(path, mode, newline='', encoding='utf-8', errors='strict', buffering=buffer_size)
+        self._writer = csv.writer(self._file)
+
+        if mode == "w":
+            self._writer.writerow(fieldnames)
+
+    def write_row(self, row: tuple) -> None:
+        """Writes one row and flushes the buffer if the flush policy says so."""
+        self._writer.writerow(row[:self._columns])
+        self.rows_written += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def write_rows(self, rows) -> None:
+        """Writes several rows."""
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self) -> None:
+        """Flushes the write buffer, and forces it to disk if fsync is set."""
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._unflushed = 0
+
+    def close(self) -> None:
+        """Flushes the remaining rows and closes the file."""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> "CsvSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+@contextlib.contextmanager
+def file_lock(path: str):
+    """Holds an exclusive lock on the file path + ".lock" while the block runs.
+
+    The lock is taken with flock, or msvcrt on Windows, so it keeps out
+    other processes as well as other threads that take it.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(f"{path}.lock", "a+b") as lock_file:
+        if os.name == "nt":
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def open_sink(path: str, site: str, category: str, output_format: str = "csv", mode: str = "a",
+              fieldnames: tuple[str, ...] = FIELDNAMES):
+    """Opens the sink of a category for the chosen output format.
+
+    Args:
+        path: The path of the CSV file, used by the "csv" format.
+        site: The name of the scraped site, used by the other formats.
+        category: The category path, used by the other formats.
+        output_format: "csv", "parquet", or "history" for the SQLite price
+            history store.
+        mode: The CsvSink file mode.
+        fieldnames: The header of the CSV file.
+
+    Returns:
+        A CsvSink, parquet_output.ParquetSink or price_history.PriceHistorySink.
+
+    Raises:
+        ValueError: If the output format is unknown.
+    """
+    if output_format == "csv":
+        return CsvSink(path, mode=mode, fieldnames=fieldnames)
+    if output_format == "parquet":
+        from parquet_output import ParquetSink
+        return ParquetSink(site, category)
+    if output_format == "history":
+        from price_history import PriceHistorySink, default_store
+        return PriceHistorySink(default_store(), site, category)
+    raise ValueError(f"Unknown output format: {output_format}")
+
+
+def iter_csv_files(roots: dict[str, str] = None):
+    """Lists the CSV files written by the scrapers.
+
+    The category of a file is its path inside the site folder without the
+    .csv extension, e.g. "Audio/Personal Audio/Bokse Bluetooth".
+
+    Args:
+        roots: Mapping of output folders to site names. Defaults to CSV_ROOTS.
+
+    Yields:
+        (path, site, category) tuples.
+    """
+    for directory, site in (roots or CSV_ROOTS).items():
+        for current, _, files in os.walk(directory):
+            for name in sorted(files):
+                if name.endswith(".csv"):
+                    path = os.path.join(current, name)
+                    category = os.path.relpath(path, directory)[:-len(".csv")].replace(os.sep, "/")
+                    yield path, site, category
+
+
+def iter_csv_rows(path: str):
+    """Reads the product rows of a CSV file written by the scrapers.
+
+    Files with a single price column, like those of Shpresa.al, are read
+    with "N/A" as old price, as shops without an old price are scraped.
+    Rows with any other number of columns are skipped.
+
+    Args:
+        path: The path of the CSV file.
+
+    Yields:
+        (name, current price, old price) tuples.
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        for row in reader:
+            if len(row) == 3:
+                yield tuple(row)
+            elif len(row) == 2:
+                yield row[0], row[1], "N/A"
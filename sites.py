@@ -0,0 +1,116 @@
+from bs4 import SoupStrainer
+
+from extraction import CS_CART, CardSelectors, digits_price
+from pagination import NextLinkPagination, NumberedPagination
+from sinks import FIELDNAMES
+
+
+class Site:
+    """Describes one shop that the shared scraper engine can crawl."""
+
+    def __init__(self, name: str, base_url: str, output_directory: str, categories: dict[str, str],
+                 selectors: CardSelectors = CS_CART, pagination=None, category_path: str = "{slug}/",
+                 fieldnames: tuple[str, ...] = FIELDNAMES,
+                 product_region: tuple[bytes, tuple[bytes, ...]] = None,
+                 product_grid: SoupStrainer = None) -> None:
+        """Initializes a Site.
+
+        Args:
+            name: The short name of the site, used in the other output formats
+                and in reports, e.g. "globe".
+            base_url: The URL of the shop, ending in "/".
+            output_directory: The folder the CSV files are written to.
+            categories: Mapping of category URL names to CSV file names.
+            selectors: The product card selectors of the category pages.
+            pagination: The pagination rule, an object with next_link(soup),
+                plan(soup) and strainer() methods. Defaults to CS-Cart's numbered pagination.
+            category_path: The path of a category below base_url, with {slug}
+                standing for the category URL name.
+            fieldnames: The header of the CSV files. Rows are cut to its
+                columns.
+            product_region: (start marker, end markers) of the part of a page
+                that page fingerprints are taken of. None uses the whole page.
+            product_grid: The element holding all product cards, parsed
+                together with the pagination. None parses the whole page.
+        """
+        self.name = name
+        self.base_url = base_url
+        self.output_directory = output_directory
+        self.categories = categories
+        self.selectors = selectors
+        self.pagination = pagination or NumberedPagination(
+            "ty-pagination__items", "cm-history ty-pagination__item cm-ajax"
+        )
+        self.category_path = category_path
+        self.fieldnames = fieldnames
+        self.product_region = product_region
+        self.product_grid = product_grid
+        self.pagination_regions = {"pagination": self.pagination.strainer()}
+        self.page_regions = (
+            {"products": product_grid, **self.pagination_regions} if product_grid is not None else None
+        )
+
+    def category_url(self, slug: str) -> str:
+        """Returns the URL of the first page of a category."""
+        return f"{self.base_url}{self.category_path.format(slug=slug)}"
+
+    def output_path(self, filename: str) -> str:
+        """Returns the path of the CSV file of a category."""
+        return f"{self.output_directory}/{filename}"
+
+
+SITES: dict[str, Site] = {}
+
+
+def register(site: Site) -> Site:
+    """Adds a site to the registry, replacing a site with the same name."""
+    SITES[site.name] = site
+    return site
+
+
+register(Site(
+    name="globe",
+    base_url="https://globe.al/",
+    output_directory="Globe",
+    categories={
+        "elektroshtepiake-te-medha-sq": "GlobeElektroshtepiakeTeMedha2.csv",
+        "elektroshtepiake-te-vogla-sq": "GlobeElektroshtepiakeTeVogla.csv",
+        "foto-video-sq": "GlobeFotoDheVideo.csv",
+        "kompjutera-dhe-rrjeti": "GlobeKompjuteraDheRrjeti.csv",
+        "kondicionimi": "GlobeKondicionimi.csv",
+        "telefonia": "GlobeTelefonia.csv",
+    },
+    product_region=(b'id="pagination_contents"', (b'class="ty-pagination__items"', b'</div>')),
+    product_grid=SoupStrainer("div", id="pagination_contents"),
+))
+
+# The slugs and selectors follow the stock WooCommerce markup and the existing CSV file names.
+# They and tests/fixtures/shpresa are yet to be checked against pages recorded from the shop.
+register(Site(
+    name="shpresa",
+    base_url="https://shop.shpresa.al/",
+    output_directory="Shpresa.al",
+    categories={
+        "dron-kamera-gimbal": "DronKameraGimbal.csv",
+        "elektroshtepiake": "Elektroshtepiake.csv",
+        "fitness": "Fitness.csv",
+        "informatike": "Informatike.csv",
+        "lojera-argetim": "LojeraArgetim.csv",
+        "pjese-kembimi": "PjeseKembimi.csv",
+        "pre-owned": "PreOwned.csv",
+        "tv-video-audio": "TVVideoAudio.csv",
+        "telefon-tablet": "TelefonTablet.csv",
+    },
+    selectors=CardSelectors(
+        title=("h2", "woocommerce-loop-product__title"),
+        price=("span", "woocommerce-Price-amount"),
+        card_tag="li",
+        price_format=digits_price,
+        sale_price=("ins", None),
+    ),
+    pagination=NextLinkPagination("a", "next", page_class="page-numbers"),
+    category_path="product-category/{slug}/",
+    fieldnames=("Emri", "Cmimi"),
+    product_region=(b'<ul class="products', (b"</ul>",)),
+    product_grid=SoupStrainer("ul", class_="products"),
+))
@@ -0,0 +1,38 @@
+import unittest
+from unittest.mock import Mock
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from browser import BLOCKED_URLS, BLOCKING_PREFS, block_urls, chrome_options
+
+
+class TestBrowser(unittest.TestCase):
+
+    def test_chrome_options_block_resources(self):
+        options = chrome_options()
+
+        self.assertIn('--headless', options.arguments)
+        self.assertEqual(options.experimental_options['prefs'], BLOCKING_PREFS)
+        self.assertEqual(options.page_load_strategy, 'eager')
+
+    def test_chrome_options_without_blocking(self):
+        options = chrome_options(headless=False, block_resources=False)
+
+        self.assertNotIn('--headless', options.arguments)
+        self.assertNotIn('prefs', options.experimental_options)
+        self.assertEqual(options.page_load_strategy, 'normal')
+
+    def test_block_urls(self):
+        driver = Mock()
+
+        block_urls(driver)
+
+        driver.execute_cdp_cmd.assert_any_call('Network.enable', {})
+        driver.execute_cdp_cmd.assert_called_with('Network.setBlockedURLs', {'urls': list(BLOCKED_URLS)})
+        self.assertIn('*.woff2', BLOCKED_URLS)
+
+
+if __name__ == '__main__':
+    unittest.main()
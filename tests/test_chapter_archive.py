@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+import zipfile
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chapter_archive import ChapterArchive, INDEX_FILE, PACK_FILE, export_epub, export_txt
+
+
+class TestChapterArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_chapters_are_read_back_in_novel_order(self):
+        with ChapterArchive(self.path, codec='gzip') as archive:
+            archive.add('/chapter-2', 'Chapter 2', 'Two\n\n' * 100, number=1)
+            archive.add('/chapter-1', 'Chapter 1', 'One\n\n' * 100, number=0)
+            self.assertEqual(archive.read('/chapter-2'), 'Two\n\n' * 100)
+
+        archive = ChapterArchive(self.path)
+        self.assertEqual(len(archive), 2)
+        self.assertIn('/chapter-1', archive)
+        self.assertEqual([entry['title'] for entry in archive.chapters()], ['Chapter 1', 'Chapter 2'])
+        self.assertEqual(archive.read('/chapter-1'), 'One\n\n' * 100)
+        self.assertLess(os.path.getsize(os.path.join(self.path, PACK_FILE)), 200)
+        archive.close()
+
+    def test_latest_copy_wins(self):
+        with ChapterArchive(self.path) as archive:
+            archive.add('/chapter-1', 'Chapter 1', 'Old')
+            archive.add('/chapter-1', 'Chapter 1', 'New')
+
+        with ChapterArchive(self.path) as archive:
+            self.assertEqual(len(archive), 1)
+            self.assertEqual(archive.read('/chapter-1'), 'New')
+
+    def test_interrupted_write_is_ignored(self):
+        with ChapterArchive(self.path) as archive:
+            archive.add('/chapter-1', 'Chapter 1', 'One')
+        with open(os.path.join(self.path, INDEX_FILE), 'a', encoding='utf-8') as file:
+            file.write('{"url": "/chapter-2", "number": 1, "title": "Chapter 2", "file": "Chapter 2.txt", '
+                       '"offset": 1000, "length": 10, "codec": "gzip"}\n{"url": "/chapter-3", "num')
+        with open(os.path.join(self.path, PACK_FILE), 'ab') as file:
+            file.write(b'partial')
+
+        with ChapterArchive(self.path) as archive:
+            self.assertEqual(list(archive.entries), ['/chapter-1'])
+            archive.add('/chapter-2', 'Chapter 2', 'Two')
+            self.assertEqual(archive.read('/chapter-2'), 'Two')
+            self.assertEqual(archive.read('/chapter-1'), 'One')
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            ChapterArchive(self.path, codec='bz2')
+
+    def test_export(self):
+        with ChapterArchive(self.path) as archive:
+            archive.add('/chapter-2', 'Chapter 2 <End>', 'Chapter 2\n\nLast & final.\n\n', file='Chapter 2 End.txt')
+            archive.add('/chapter-1', 'Chapter 1', 'Chapter 1\n\nFirst.\n\n', file='Chapter 1.txt', number=-1)
+
+            output = os.path.join(self.path, 'txt')
+            self.assertEqual(export_txt(archive, output), 2)
+            with open(os.path.join(output, 'Chapter 2 End.txt'), encoding='utf-8') as file:
+                self.assertEqual(file.read(), 'Chapter 2\n\nLast & final.\n\n')
+
+            book = os.path.join(self.path, 'novel.epub')
+            self.assertEqual(export_epub(archive, book, 'Novel'), 2)
+
+        with zipfile.ZipFile(book) as epub:
+            first = epub.infolist()[0]
+            self.assertEqual((first.filename, first.compress_type), ('mimetype', zipfile.ZIP_STORED))
+            self.assertEqual(epub.read('mimetype'), b'application/epub+zip')
+            self.assertIn(b'Chapter 1', epub.read('OEBPS/chapter-00001.xhtml'))
+            self.assertIn(b'<p>Last &amp; final.</p>', epub.read('OEBPS/chapter-00002.xhtml'))
+            self.assertIn(b'Chapter 2 &lt;End&gt;', epub.read('OEBPS/nav.xhtml'))
+
+
+if __name__ == '__main__':
+    unittest.main()
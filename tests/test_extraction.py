@@ -0,0 +1,76 @@
+import unittest
+from bs4 import BeautifulSoup
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from extraction import clean_price, digits_price, extract_products, parse_price
+from sites import SITES
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'globe')
+
+
+class TestExtraction(unittest.TestCase):
+
+    def test_clean_price(self):
+        self.assertEqual(clean_price("12.990 Lekë"), "12,990")
+        self.assertEqual(clean_price("690"), "690")
+
+    def test_digits_price(self):
+        self.assertEqual(digits_price("1.690\xa0Lekë"), "1690")
+        self.assertEqual(digits_price("3,490 L"), "3490")
+
+    def test_parse_price(self):
+        self.assertEqual(parse_price("12,990"), 12990)
+        self.assertEqual(parse_price("12.990 Lekë"), 12990)
+        self.assertIsNone(parse_price("N/A"))
+
+    def test_extract_products_from_fixture(self):
+        with open(os.path.join(FIXTURES, 'elektroshtepiake_te_vogla_page15.html'), 'rb') as file:
+            soup = BeautifulSoup(file.read(), features="lxml")
+
+        rows = extract_products(soup)
+        self.assertEqual(len(rows), 40)
+        self.assertEqual(len(rows), len(set(rows)))
+        self.assertIn(("Aksesore vere Antidrip Ring BOJ 01219201", "220", "290"), rows)
+
+    def test_extract_products_skips_incomplete_cards(self):
+        html_content = '''
+        <div class="ty-breadcrumbs"><bdi>Home</bdi></div>
+        <div class="grid-list">
+            <div class="card">
+                <a class="product-title">No price</a>
+            </div>
+            <div class="card">
+                <a class="product-title">Phone</a>
+                <bdi>1.990 Lekë</bdi>
+                <span class="ty-price-num">1.490</span>
+            </div>
+        </div>
+        '''
+        soup = BeautifulSoup(html_content, 'html.parser')
+        self.assertEqual(extract_products(soup), [("Phone", "1,490", "1,990")])
+
+    def test_extract_products_takes_the_sale_price(self):
+        html_content = '''
+        <ul class="products">
+            <li class="product">
+                <h2 class="woocommerce-loop-product__title">Yoga Mat</h2>
+                <span class="price">
+                    <del aria-hidden="true"><span class="woocommerce-Price-amount amount"><bdi>2.990&nbsp;L</bdi></span></del>
+                    <ins><span class="woocommerce-Price-amount amount"><bdi>2.490&nbsp;L</bdi></span></ins>
+                </span>
+            </li>
+            <li class="product">
+                <h2 class="woocommerce-loop-product__title">Dumbbell</h2>
+                <span class="price"><span class="woocommerce-Price-amount amount"><bdi>1.690&nbsp;L</bdi></span></span>
+            </li>
+        </ul>
+        '''
+        soup = BeautifulSoup(html_content, 'html.parser')
+        self.assertEqual(extract_products(soup, SITES['shpresa'].selectors),
+                         [("Yoga Mat", "2490", "N/A"), ("Dumbbell", "1690", "N/A")])
+
+if __name__ == '__main__':
+    unittest.main()
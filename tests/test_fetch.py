@@ -0,0 +1,69 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import fetch
+from fetch import HostRateLimiter, create_session
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 with a Retry-After header once, then 200."""
+    calls = 0
+
+    def do_GET(self):
+        FlakyHandler.calls += 1
+        if FlakyHandler.calls == 1:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFetch(unittest.TestCase):
+
+    def test_retries_on_server_error(self):
+        server = HTTPServer(("127.0.0.1", 0), FlakyHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            session = create_session(retries=2, backoff_factor=0)
+            response = session.get(f"http://127.0.0.1:{server.server_port}/", timeout=5)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(FlakyHandler.calls, 2)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @patch('fetch.time.sleep')
+    @patch('fetch.time.monotonic', return_value=100.0)
+    def test_rate_limiter_spaces_requests_per_host(self, mock_monotonic, mock_sleep):
+        limiter = HostRateLimiter()
+        limiter.set_rate("globe.al", 2)
+
+        limiter.wait("https://globe.al/telefonia/")
+        mock_sleep.assert_not_called()
+        limiter.wait("https://globe.al/kondicionimi/")
+        mock_sleep.assert_called_once_with(0.5)
+        limiter.wait("https://www.neptun.al/")
+        mock_sleep.assert_called_once()
+
+    @patch('fetch.get_session')
+    def test_get_uses_shared_session(self, mock_get_session):
+        fetch.get("https://globe.al/")
+        mock_get_session.return_value.get.assert_called_once_with(
+            "https://globe.al/", headers=None, timeout=fetch.DEFAULT_TIMEOUT
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import csv
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch, Mock
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from frontier import Frontier
+import scraper
+from sites import SITES, Site
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'shpresa')
+FITNESS = 'https://shop.shpresa.al/product-category/fitness/'
+
+
+def claim_all(path: str, owner: str, results) -> None:
+    """Claims and completes jobs until none is left, reporting each claimed URL."""
+    with Frontier(path) as frontier:
+        while (job := frontier.claim(owner)) is not None:
+            results.put(job.url)
+            frontier.complete(job)
+
+
+def fixture_response(url: str) -> Mock:
+    """Returns a mocked response with the recorded Shpresa.al page for a URL."""
+    name = 'fitness_page2.html' if url.endswith('/page/2/') else 'fitness_page1.html'
+    with open(os.path.join(FIXTURES, name), 'rb') as file:
+        return Mock(status_code=200, content=file.read(), url=url, from_cache=False)
+
+
+class TestFrontier(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'frontier.sqlite3')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_jobs_are_queued_once_and_claimed_in_order(self):
+        with Frontier(self.path) as frontier:
+            self.assertEqual(frontier.add('globe', 'telefonia', ['https://globe.al/telefonia/', ''], {'filename': 'T.csv'}), 1)
+            self.assertEqual(frontier.add('globe', 'telefonia', ['https://globe.al/telefonia/',
+                                                                 'https://globe.al/telefonia/page-2/']), 1)
+            self.assertEqual(frontier.add('shpresa', 'fitness', FITNESS), 1)
+
+            job = frontier.claim('worker-1', sites=['globe'])
+            self.assertEqual((job.url, job.data, job.attempts), ('https://globe.al/telefonia/', {'filename': 'T.csv'}, 1))
+            self.assertEqual(frontier.claim('worker-1', sites=['shpresa']).url, FITNESS)
+            self.assertEqual(frontier.counts(), {'pending': 1, 'leased': 2, 'done': 0, 'failed': 0})
+
+            self.assertTrue(frontier.complete(job))
+            self.assertEqual(frontier.counts(['globe']), {'pending': 1, 'leased': 0, 'done': 1, 'failed': 0})
+            self.assertEqual(frontier.unfinished(['globe']), 1)
+
+    def test_expired_lease_is_claimed_by_another_worker(self):
+        with Frontier(self.path, lease_seconds=0.05) as frontier:
+            frontier.add('globe', 'telefonia', 'https://globe.al/telefonia/')
+            crashed = frontier.claim('worker-1')
+            self.assertIsNone(frontier.claim('worker-2'))
+
+            time.sleep(0.1)
+            job = frontier.claim('worker-2')
+            self.assertEqual((job.id, job.attempts), (crashed.id, 2))
+            self.assertFalse(frontier.complete(crashed))
+            self.assertTrue(frontier.complete(job))
+
+    def test_failed_jobs_are_retried_up_to_max_attempts(self):
+        with Frontier(self.path, max_attempts=2) as frontier:
+            frontier.add('globe', 'telefonia', 'https://globe.al/telefonia/')
+            frontier.fail(frontier.claim('worker-1'), 'timeout')
+            self.assertEqual(frontier.counts()['pending'], 1)
+            frontier.fail(frontier.claim('worker-1'), 'timeout')
+            self.assertIsNone(frontier.claim('worker-1'))
+            self.assertEqual(frontier.failed(), [('globe', 'https://globe.al/telefonia/', 'timeout')])
+
+            self.assertEqual(frontier.retry_failed(), 1)
+            self.assertEqual(frontier.claim('worker-1').attempts, 1)
+            self.assertEqual(frontier.clear(['globe']), 1)
+
+    def test_heartbeat_keeps_the_lease(self):
+        with Frontier(self.path, lease_seconds=0.2) as frontier:
+            frontier.add('neptun', 'Audio/Bokse', 'https://www.neptun.al/bokse')
+            job = frontier.claim('worker-1')
+            with frontier.heartbeat(job, interval=0.05) as lost:
+                time.sleep(0.5)
+                self.assertIsNone(frontier.claim('worker-2'))
+            self.assertFalse(lost.is_set())
+            self.assertTrue(frontier.complete(job))
+
+    def test_heartbeat_reports_a_lost_lease(self):
+        with Frontier(self.path, lease_seconds=0.05) as frontier:
+            frontier.add('neptun', 'Audio/Bokse', 'https://www.neptun.al/bokse')
+            job = frontier.claim('worker-1')
+            time.sleep(0.1)
+            frontier.claim('worker-2')
+            with frontier.heartbeat(job, interval=0.01) as lost:
+                self.assertTrue(lost.wait(5))
+
+    def test_state_survives_reopening(self):
+        with Frontier(self.path) as frontier:
+            frontier.add('globe', 'telefonia', ['https://globe.al/telefonia/', 'https://globe.al/telefonia/page-2/'])
+            frontier.complete(frontier.claim('worker-1'))
+
+        with Frontier(self.path) as frontier:
+            self.assertEqual(frontier.claim('worker-2').url, 'https://globe.al/telefonia/page-2/')
+
+    def test_processes_claim_every_job_once(self):
+        with Frontier(self.path) as frontier:
+            frontier.add('globe', 'telefonia', [f'https://globe.al/telefonia/page-{page}/' for page in range(60)])
+
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        workers = [context.Process(target=claim_all, args=(self.path, f'worker-{number}', results))
+                   for number in range(3)]
+        for worker in workers:
+            worker.start()
+        claimed = [results.get(timeout=60) for _ in range(60)]
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sorted(claimed), sorted(f'https://globe.al/telefonia/page-{page}/' for page in range(60)))
+        with Frontier(self.path) as frontier:
+            self.assertEqual(frontier.counts()['done'], 60)
+
+    @patch('scraper.fetch.get', side_effect=fixture_response)
+    def test_work_frontier_follows_pages(self, mock_get):
+        shpresa = SITES['shpresa']
+        site = Site(shpresa.name, shpresa.base_url, self.directory.name, {'fitness': 'Fitness.csv'},
+                    selectors=shpresa.selectors, pagination=shpresa.pagination, category_path=shpresa.category_path,
+                    fieldnames=shpresa.fieldnames, product_grid=shpresa.product_grid)
+
+        with patch.dict('scraper.SITES', {'shpresa': site}), Frontier(self.path) as frontier, \
+                patch('scraper.open_sink', wraps=scraper.open_sink) as mock_open_sink:
+            self.assertEqual(scraper.seed_frontier(frontier, [(site, 'fitness', 'Fitness.csv')]), 1)
+            self.assertEqual(scraper.work_frontier(frontier, ['shpresa'], owner='worker-1'), 2)
+            self.assertEqual(frontier.counts(), {'pending': 0, 'leased': 0, 'done': 2, 'failed': 0})
+
+        self.assertEqual([call.args[0] for call in mock_get.call_args_list],
+                         [FITNESS, f'{FITNESS}page/2/'])
+        mock_open_sink.assert_called_once()
+        with open(os.path.join(self.directory.name, 'Fitness.csv'), encoding='utf-8') as file:
+            self.assertEqual(len(file.read().splitlines()), 13)
+
+    @patch('scraper.open_sink', side_effect=OSError('disk full'))
+    @patch('scraper.fetch.get', side_effect=fixture_response)
+    def test_pages_of_an_unwritten_batch_are_not_completed(self, mock_get, mock_open_sink):
+        shpresa = SITES['shpresa']
+        site = Site(shpresa.name, shpresa.base_url, self.directory.name, {'fitness': 'Fitness.csv'},
+                    selectors=shpresa.selectors, pagination=shpresa.pagination, category_path=shpresa.category_path,
+                    fieldnames=shpresa.fieldnames, product_grid=shpresa.product_grid)
+
+        with patch.dict('scraper.SITES', {'shpresa': site}), Frontier(self.path, max_attempts=2) as frontier:
+            scraper.seed_frontier(frontier, [(site, 'fitness', 'Fitness.csv')])
+            self.assertEqual(scraper.work_frontier(frontier, ['shpresa'], owner='worker-1', poll_interval=0), 0)
+            self.assertEqual(frontier.counts(), {'pending': 0, 'leased': 0, 'done': 0, 'failed': 2})
+        self.assertEqual(mock_open_sink.call_count, 2)
+
+    @patch('scraper.fetch.get', side_effect=fixture_response)
+    def test_concurrent_workers_write_whole_pages_once(self, mock_get):
+        shpresa = SITES['shpresa']
+        site = Site(shpresa.name, shpresa.base_url, self.directory.name, {'fitness': 'Fitness.csv'},
+                    selectors=shpresa.selectors, pagination=shpresa.pagination, category_path=shpresa.category_path,
+                    fieldnames=shpresa.fieldnames, product_grid=shpresa.product_grid)
+        urls = [f'{FITNESS}?orderby={number}' for number in range(20)]
+        rows_per_page = [len(scraper.parse_page(site, fixture_response(url).content)[0])
+                         for url in [*urls, f'{FITNESS}page/2/']]
+
+        with patch.dict('scraper.SITES', {'shpresa': site}), Frontier(self.path) as frontier:
+            frontier.add('shpresa', 'fitness', urls, {'filename': 'Fitness.csv'})
+            workers = [threading.Thread(target=scraper.work_frontier,
+                                        args=(frontier, ['shpresa'], f'worker-{number}', 0.01))
+                       for number in range(4)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        with open(os.path.join(self.directory.name, 'Fitness.csv'), newline='', encoding='utf-8') as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(rows[0], list(site.fieldnames))
+        self.assertEqual(len(rows), 1 + sum(rows_per_page))
+        self.assertNotIn(rows[0], rows[1:])
+        self.assertTrue(all(len(row) == len(site.fieldnames) for row in rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 from unittest.mock import patch, Mock
 from bs4 import BeautifulSoup
@@ -15,7 +16,10 @@ from GlobeDataCollection import (
     get_elektroshtepiake_te_medha,
     get_elektroshtepiake_te_vogla,
     get_kompjutera_dhe_rrjeti,
-    get_kondicionimi
+    get_kondicionimi,
+    crawl,
+    CATEGORIES,
+    SITE
 )
 
 class TestGlobeDataCollection(unittest.TestCase):
@@ -40,6 +44,17 @@ class TestGlobeDataCollection(unittest.TestCase):
         next_link = find_next_link(soup)
         self.assertFalse(next_link)
 
+    def test_find_next_link_matches_whole_page_numbers(self):
+        html_content = '''
+        <div class="ty-pagination__items">
+            <span>1</span>
+            <a class="cm-history ty-pagination__item cm-ajax" href="https://globe.al/kondicionimi/page-11/">11</a>
+            <a class="cm-history ty-pagination__item cm-ajax" href="https://globe.al/kondicionimi/page-2/">2</a>
+        </div>
+        '''
+        soup = BeautifulSoup(html_content, 'html.parser')
+        self.assertEqual(find_next_link(soup), "https://globe.al/kondicionimi/page-2/")
+
     @patch('GlobeDataCollection.requests.get')
     def test_save(self, mock_get):
         mock_response = Mock()
@@ -54,20 +69,26 @@ class TestGlobeDataCollection(unittest.TestCase):
             next_link = save(mock_response, test_filename)
             self.assertFalse(next_link)
             mock_file.assert_called_once_with(
-                expected_path, 'w', newline='', encoding='utf-8', errors='strict'
+                expected_path, 'w', newline='', encoding='utf-8', errors='strict', buffering=64 * 1024
             )
 
-    @patch('GlobeDataCollection.save')
-    @patch('GlobeDataCollection.requests.get')
-    def test_submain(self, mock_get, mock_save):
-        mock_response = Mock()
+    @patch('scraper.open_sink')
+    @patch('scraper.save')
+    @patch('scraper.fetch.get')
+    def test_submain(self, mock_get, mock_save, mock_sink):
+        mock_response = Mock(content=b"<html></html>")
         mock_response.status_code = 200
         mock_get.return_value = mock_response
         mock_save.return_value = False
 
         submain('telefonia', filename='test.csv')
         mock_get.assert_called_once_with('https://globe.al/telefonia/')
-        mock_save.assert_called_once_with(mock_response, filename='test.csv')
+        mock_sink.assert_called_once_with(
+            'Globe/test.csv', 'globe', 'telefonia', output_format='csv', fieldnames=SITE.fieldnames
+        )
+        mock_save.assert_called_once_with(
+            SITE, mock_response, filename='test.csv', sink=mock_sink.return_value.__enter__.return_value
+        )
 
     @patch('GlobeDataCollection.submain')
     def test_category_functions(self, mock_submain):
@@ -89,5 +110,35 @@ class TestGlobeDataCollection(unittest.TestCase):
         get_kondicionimi()
         mock_submain.assert_called_with('kondicionimi', filename='GlobeKondicionimi.csv')
 
+    @patch('scraper.plan_pages', return_value=None)
+    @patch('scraper.open_sink')
+    @patch('scraper.save')
+    @patch('scraper.AsyncCrawler.fetch')
+    def test_crawl(self, mock_fetch, mock_save, mock_sink, mock_plan):
+        mock_fetch.return_value = Mock(status_code=200)
+        mock_save.side_effect = lambda site, response, filename, sink: (
+            'https://globe.al/telefonia/page-2/' if mock_fetch.call_count == 1 else False
+        )
+
+        asyncio.run(crawl({'telefonia': 'test.csv'}))
+        self.assertEqual(mock_fetch.call_count, 2)
+        mock_fetch.assert_called_with('https://globe.al/telefonia/page-2/')
+        mock_save.assert_called_with(
+            SITE, mock_fetch.return_value, filename='test.csv', sink=mock_sink.return_value.__enter__.return_value
+        )
+
+    @patch('scraper.open_sink')
+    @patch('scraper.save')
+    @patch('scraper.AsyncCrawler.fetch')
+    def test_crawl_all_categories(self, mock_fetch, mock_save, mock_sink):
+        mock_fetch.return_value = Mock(status_code=200)
+        mock_save.return_value = False
+
+        asyncio.run(crawl())
+        fetched = {call.args[0] for call in mock_fetch.call_args_list}
+        self.assertEqual(fetched, {f'https://globe.al/{name}/' for name in CATEGORIES})
+        saved = {call.kwargs['filename'] for call in mock_save.call_args_list}
+        self.assertEqual(saved, set(CATEGORIES.values()))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,103 @@
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+
+from http_cache import HttpCache
+
+
+class EtagHandler(BaseHTTPRequestHandler):
+    """Serves a page with an ETag and answers 304 when it matches."""
+    statuses = []
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            EtagHandler.statuses.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = f"page {self.path}".encode()
+        EtagHandler.statuses.append(200)
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def setUp(self):
+        EtagHandler.statuses = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), EtagHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.directory = tempfile.TemporaryDirectory()
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.session.close()
+        self.directory.cleanup()
+
+    def send(self, url, headers):
+        return self.session.get(url, headers=headers, timeout=5)
+
+    def test_revalidates_with_etag(self):
+        cache = HttpCache(self.directory.name)
+
+        first = cache.get(self.send, f"{self.base}/telefonia/")
+        second = cache.get(self.send, f"{self.base}/telefonia/")
+
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(EtagHandler.statuses, [200, 304])
+
+    def test_refetches_when_the_cached_body_is_gone(self):
+        cache = HttpCache(self.directory.name)
+        url = f"{self.base}/telefonia/"
+
+        first = cache.get(self.send, url)
+        os.remove(cache._body_path(url))
+        second = cache.get(self.send, url)
+
+        self.assertFalse(second.from_cache)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(EtagHandler.statuses, [200, 304, 200])
+        self.assertTrue(cache.get(self.send, url).from_cache)
+
+    def test_fresh_entries_skip_the_request(self):
+        cache = HttpCache(self.directory.name, ttl=[(r"/chapter-", 3600)])
+
+        cache.get(self.send, f"{self.base}/novel/chapter-1")
+        cached = cache.get(self.send, f"{self.base}/novel/chapter-1")
+
+        self.assertTrue(cached.from_cache)
+        self.assertEqual(EtagHandler.statuses, [200])
+
+    def test_evicts_least_recently_used(self):
+        cache = HttpCache(self.directory.name, max_bytes=15)
+
+        for page in ("a", "b", "c"):
+            cache.get(self.send, f"{self.base}/{page}")
+        cache.get(self.send, f"{self.base}/a")
+
+        self.assertEqual(EtagHandler.statuses, [200, 200, 200, 200])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import tempfile
+import unittest
+from unittest.mock import patch, Mock
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chapter_archive import ChapterArchive, export_txt
+from LightNovelWorldDataCollection import download_chapters, save_chapter, BASE_URL, ChapterManifest
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'lightnovelworld')
+NOVEL = '/novel/shadow-slave-1365'
+
+
+def fixture_response(url: str, headers: dict = None) -> Mock:
+    """Returns a mocked response with the recorded page for a URL."""
+    path = url[len(BASE_URL):]
+    if path.startswith(f'{NOVEL}/chapters'):
+        page = path.rsplit('=', 1)[-1] if '?page=' in path else '1'
+        name = f'chapters_page{page}.html'
+    else:
+        name = f"chapter_{path.rsplit('-', 1)[-1]}.html"
+
+    with open(os.path.join(FIXTURES, name), 'rb') as file:
+        return Mock(status_code=200, content=file.read())
+
+
+def windowed_response(url: str, headers: dict = None) -> Mock:
+    """Returns a mocked chapter list page whose pagination only links the next page.
+
+    Page 1 lists chapters 1 and 2, page 2 chapter 3 and page 3 chapters 4 and 5.
+    """
+    page = int(url.rsplit('=', 1)[-1]) if '?page=' in url else 1
+    if not url.startswith(f'{BASE_URL}{NOVEL}/chapters'):
+        return fixture_response(url)
+
+    chapters = {1: [1, 2], 2: [3], 3: [4, 5]}[page]
+    items = ''.join(f'<li><a href="{NOVEL}/chapter-{number}">{number}</a></li>' for number in chapters)
+    pagenav = f'<li class="active"><span>{page}</span></li>'
+    if page < 3:
+        pagenav += (f'<li><a href="{NOVEL}/chapters?page={page + 1}">{page + 1}</a></li>'
+                    f'<li class="PagedList-skipToNext"><a href="{NOVEL}/chapters?page={page + 1}">&gt;</a></li>')
+    content = (f'<html><body><ul class="chapter-list">{items}</ul>'
+               f'<div class="pagenav"><ul class="pagination">{pagenav}</ul></div></body></html>')
+    return Mock(status_code=200, content=content.encode())
+
+
+class TestLightNovelWorldDataCollection(unittest.TestCase):
+
+    @patch('LightNovelWorldDataCollection.request', side_effect=fixture_response)
+    def test_download_chapters(self, mock_request):
+        first_page = fixture_response(f'{BASE_URL}{NOVEL}/chapters')
+
+        with tempfile.TemporaryDirectory() as directory:
+            saved = download_chapters(first_page, directory, workers=3, requests_per_second=None)
+
+            self.assertEqual(saved, 5)
+            self.assertEqual(len([name for name in os.listdir(directory) if name.endswith('.txt')]), 5)
+            with open(os.path.join(directory, 'Chapter 4 Forgotten Shore.txt'), encoding='utf-8') as file:
+                content = file.read()
+            self.assertTrue(content.startswith('Chapter 4: Forgotten Shore\n\n'))
+            self.assertIn('Paragraph 6 of chapter 4.', content)
+
+    @patch('LightNovelWorldDataCollection.request')
+    def test_download_chapters_skips_failed_chapters(self, mock_request):
+        def flaky(url, headers=None):
+            if url.endswith('chapter-2'):
+                raise ValueError("Couldn't open the link, status code: 404")
+            return fixture_response(url)
+        mock_request.side_effect = flaky
+        first_page = fixture_response(f'{BASE_URL}{NOVEL}/chapters')
+
+        with tempfile.TemporaryDirectory() as directory:
+            saved = download_chapters(first_page, directory, workers=2, requests_per_second=None)
+            self.assertEqual(saved, 4)
+
+    @patch('LightNovelWorldDataCollection.request')
+    def test_download_chapters_survives_unexpected_errors(self, mock_request):
+        def broken(url, headers=None):
+            if url.endswith('chapter-2'):
+                raise RuntimeError("unexpected markup")
+            return fixture_response(url)
+        def save(chapter, novel_title):
+            if chapter.title.startswith('Chapter 3'):
+                raise KeyError(chapter.title)
+            return save_chapter(chapter, novel_title)
+        mock_request.side_effect = broken
+        first_page = fixture_response(f'{BASE_URL}{NOVEL}/chapters')
+
+        with tempfile.TemporaryDirectory() as directory, \
+                patch('LightNovelWorldDataCollection.save_chapter', side_effect=save) as mock_save:
+            saved = download_chapters(first_page, directory, workers=1, requests_per_second=None)
+            self.assertEqual(saved, 3)
+            self.assertEqual(mock_save.call_count, 4)
+
+    @patch('LightNovelWorldDataCollection.request', side_effect=windowed_response)
+    def test_download_chapters_beyond_pagination_window(self, mock_request):
+        first_page = windowed_response(f'{BASE_URL}{NOVEL}/chapters')
+
+        with tempfile.TemporaryDirectory() as directory:
+            saved = download_chapters(first_page, directory, workers=2, requests_per_second=None)
+            self.assertEqual(saved, 5)
+
+    @patch('LightNovelWorldDataCollection.request', side_effect=fixture_response)
+    def test_download_chapters_resumes_from_manifest(self, mock_request):
+        first_page = fixture_response(f'{BASE_URL}{NOVEL}/chapters')
+
+        with tempfile.TemporaryDirectory() as directory:
+            download_chapters(first_page, directory, workers=2, requests_per_second=None)
+            manifest = ChapterManifest(directory)
+            self.assertEqual(len(manifest.entries), 5)
+            self.assertTrue(manifest.is_saved(f'{NOVEL}/chapter-1'))
+
+            os.remove(os.path.join(directory, 'Chapter 3 Ascension.txt'))
+            mock_request.reset_mock()
+            saved = download_chapters(first_page, directory, workers=2, requests_per_second=None)
+
+            self.assertEqual(saved, 1)
+            fetched = {call.args[0] for call in mock_request.call_args_list}
+            self.assertEqual(fetched, {f'{BASE_URL}{NOVEL}/chapters?page=2', f'{BASE_URL}{NOVEL}/chapter-3'})
+
+    @patch('LightNovelWorldDataCollection.request', side_effect=fixture_response)
+    def test_download_chapters_to_archive(self, mock_request):
+        first_page = fixture_response(f'{BASE_URL}{NOVEL}/chapters')
+
+        with tempfile.TemporaryDirectory() as directory:
+            text_directory = os.path.join(directory, 'txt')
+            archive_directory = os.path.join(directory, 'archive')
+            download_chapters(first_page, text_directory, workers=3, requests_per_second=None)
+            saved = download_chapters(first_page, archive_directory, workers=3, requests_per_second=None,
+                                      output_format='archive')
+
+            self.assertEqual(saved, 5)
+            self.assertEqual(sorted(os.listdir(archive_directory)), ['chapters.idx', 'chapters.pack'])
+            with ChapterArchive(archive_directory) as archive:
+                self.assertEqual([entry['url'] for entry in archive.chapters()],
+                                 [f'{NOVEL}/chapter-{number}' for number in range(1, 6)])
+                export_txt(archive, os.path.join(directory, 'exported'))
+
+            for name in os.listdir(text_directory):
+                if name.endswith('.txt'):
+                    with open(os.path.join(text_directory, name), encoding='utf-8') as expected, \
+                            open(os.path.join(directory, 'exported', name), encoding='utf-8') as exported:
+                        self.assertEqual(exported.read(), expected.read())
+
+            mock_request.reset_mock()
+            self.assertEqual(download_chapters(first_page, archive_directory, workers=2, requests_per_second=None,
+                                               output_format='archive'), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import pstats
+import tempfile
+import threading
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metrics
+from replay_server import Recording, ReplayServer
+import scraper
+from sites import SITES, Site
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'shpresa')
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.prometheus_path = os.path.join(self.directory.name, 'metrics.prom')
+        self.log_path = os.path.join(self.directory.name, 'metrics.jsonl')
+
+    def tearDown(self):
+        if metrics.registry is not None:
+            metrics.registry.close()
+            metrics.registry = None
+        self.directory.cleanup()
+
+    def test_category_metrics(self):
+        registry = metrics.enable(prometheus_path=self.prometheus_path, log_path=self.log_path)
+
+        with ReplayServer() as server:
+            for path, name in (('/product-category/fitness/', 'fitness_page1.html'),
+                               ('/product-category/fitness/page/2/', 'fitness_page2.html')):
+                with open(os.path.join(FIXTURES, name), 'rb') as file:
+                    server.add(path, Recording(file.read().replace(b'https://shop.shpresa.al', server.url.encode())))
+            shpresa = SITES['shpresa']
+            site = Site(shpresa.name, f'{server.url}/', self.directory.name, {'fitness': 'Fitness.csv'},
+                        selectors=shpresa.selectors, pagination=shpresa.pagination,
+                        category_path=shpresa.category_path, fieldnames=shpresa.fieldnames,
+                        product_region=shpresa.product_region, product_grid=shpresa.product_grid)
+            scraper.scrape_category(site, 'fitness', 'Fitness.csv')
+
+        labels = ('shpresa', 'fitness')
+        self.assertEqual(registry.counter('responses', *labels), 2)
+        self.assertEqual(registry.counter('rows', *labels), 12)
+        self.assertGreater(registry.counter('bytes', *labels), 0)
+        self.assertEqual(registry.histogram('fetch', *labels).count, 2)
+        self.assertEqual(registry.histogram('parse', *labels).count, 2)
+        self.assertEqual(registry.histogram('find_next_link', *labels).count, 2)
+
+        registry.close()
+        with open(self.prometheus_path, encoding='utf-8') as file:
+            exposition = file.read()
+        self.assertIn('# TYPE scraper_stage_seconds histogram', exposition)
+        self.assertIn('scraper_stage_seconds_count{stage="fetch",site="shpresa",category="fitness"} 2', exposition)
+        self.assertIn('scraper_rows_total{site="shpresa",category="fitness"} 12', exposition)
+
+        with open(self.log_path, encoding='utf-8') as file:
+            events = [json.loads(line) for line in file]
+        self.assertIn({'type': 'stage', 'name': 'fetch', 'site': 'shpresa'},
+                      [{key: event[key] for key in ('type', 'name', 'site')} for event in events])
+
+    def test_disabled_metrics_are_not_recorded(self):
+        with metrics.labels('globe', 'telefonia'), metrics.stage('fetch'):
+            metrics.count('rows', 3)
+        self.assertIsNone(metrics.registry)
+
+    def test_bind_keeps_labels_in_threads(self):
+        registry = metrics.enable(prometheus_path=None)
+        with metrics.labels('globe', 'telefonia'):
+            bound = metrics.bind(metrics.count)
+        threads = [threading.Thread(target=bound, args=('rows', 2)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(registry.counter('rows', 'globe', 'telefonia'), 6)
+
+    def test_profile_covers_threads(self):
+        path = os.path.join(self.directory.name, 'run.prof')
+
+        def busy():
+            return sum(range(10000))
+
+        with metrics.profile(path):
+            thread = threading.Thread(target=busy)
+            thread.start()
+            thread.join()
+
+        functions = {name for _, _, name in pstats.Stats(path).stats}
+        self.assertIn('busy', functions)
+
+    @unittest.skipIf(sys.version_info < (3, 12), 'cProfile allows one active profiler from Python 3.12 on')
+    def test_profile_fails_clearly_under_another_profiler(self):
+        import cProfile
+        other = cProfile.Profile()
+        other.enable()
+        try:
+            with self.assertRaises(RuntimeError):
+                with metrics.profile(os.path.join(self.directory.name, 'run.prof')):
+                    pass
+        finally:
+            other.disable()
+
+
+if __name__ == '__main__':
+    unittest.main()
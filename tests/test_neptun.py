@@ -0,0 +1,205 @@
+import csv
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, Mock
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from frontier import Frontier, LeaseLost
+from NeptunDataCollection import (CategoryJob, load_category_jobs, page_count, run_browser_pool,
+                                  save_category_jobs, scrape_product_data, seed_frontier, work_frontier)
+
+RENDERED_PAGE = '''
+<div class="ng-scope product-list-item-grid"><div class="white-box">
+  <h2 class="product-list-item__content--title ng-binding">JBL Flip 6</h2>
+  <div class="product-list-item__prices pt35">
+    <div class="newPriceModel"><span class="product-price__amount--value ng-binding">16.999</span></div>
+    <div class="HappyCard"><span class="product-price__amount--value ng-binding">14.999</span></div>
+  </div>
+</div></div>
+'''
+
+
+def rendered_driver(pagination: list[str]) -> Mock:
+    """Returns a mocked WebDriver showing a rendered product list page."""
+    driver = Mock(page_source=RENDERED_PAGE)
+    driver.execute_script.return_value = RENDERED_PAGE
+
+    def find_elements(by, xpath):
+        if 'affix2' in xpath:
+            return [Mock(text=text) for text in pagination]
+        return [Mock()]
+
+    driver.find_elements.side_effect = find_elements
+    return driver
+
+
+class TestNeptunDataCollection(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch('NeptunDataCollection.browser.install_driver', return_value='/drivers/chromedriver')
+        self.mock_install_driver = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('NeptunDataCollection.run_job')
+    @patch('NeptunDataCollection.setup_driver')
+    def test_run_browser_pool(self, mock_setup_driver, mock_run_job):
+        drivers = [Mock(), Mock()]
+        mock_setup_driver.side_effect = drivers
+        jobs = [CategoryJob(f'https://www.neptun.al/c{i}?items=100&page=', 'Neptun.al', f'C{i}') for i in range(5)]
+
+        failed = run_browser_pool(jobs, workers=2)
+
+        self.assertEqual(failed, [])
+        self.assertEqual(mock_run_job.call_count, 5)
+        for driver in drivers[:mock_setup_driver.call_count]:
+            driver.quit.assert_called_once()
+
+    @patch('NeptunDataCollection.run_job')
+    @patch('NeptunDataCollection.setup_driver')
+    def test_run_browser_pool_installs_the_driver_once(self, mock_setup_driver, mock_run_job):
+        mock_setup_driver.side_effect = lambda **kwargs: Mock()
+        jobs = [CategoryJob(f'https://www.neptun.al/c{i}?items=100&page=', 'Neptun.al', f'C{i}') for i in range(4)]
+
+        run_browser_pool(jobs, workers=4)
+
+        self.mock_install_driver.assert_called_once_with()
+        for call in mock_setup_driver.call_args_list:
+            self.assertEqual(call.kwargs, {'driver_path': '/drivers/chromedriver'})
+
+    @patch('NeptunDataCollection.run_job')
+    @patch('NeptunDataCollection.setup_driver')
+    def test_run_browser_pool_restarts_crashed_browsers(self, mock_setup_driver, mock_run_job):
+        crashed, replacement = Mock(), Mock()
+        mock_setup_driver.side_effect = [crashed, replacement]
+        mock_run_job.side_effect = [WebDriverException("tab crashed"), None]
+        job = CategoryJob('https://www.neptun.al/c?items=100&page=', 'Neptun.al', 'C')
+
+        failed = run_browser_pool([job], workers=1)
+
+        self.assertEqual(failed, [])
+        self.assertEqual(job.attempts, 2)
+        crashed.quit.assert_called_once()
+        replacement.quit.assert_called_once()
+        mock_run_job.assert_called_with(job, replacement)
+
+    @patch('NeptunDataCollection.run_job', side_effect=WebDriverException("tab crashed"))
+    @patch('NeptunDataCollection.setup_driver')
+    def test_run_browser_pool_gives_up_after_max_attempts(self, mock_setup_driver, mock_run_job):
+        job = CategoryJob('https://www.neptun.al/c?items=100&page=', 'Neptun.al', 'C')
+
+        failed = run_browser_pool([job], workers=1, max_attempts=3)
+
+        self.assertEqual(failed, [job])
+        self.assertEqual(mock_setup_driver.call_count, 3)
+
+    def test_page_count(self):
+        self.assertEqual(page_count(rendered_driver(['<', '1', '2', '3', '>'])), 3)
+        self.assertEqual(page_count(rendered_driver([])), 1)
+
+    @patch('NeptunDataCollection.WebDriverWait')
+    def test_page_count_waits_for_pagination(self, mock_wait):
+        driver = rendered_driver(['<', '1', '2', '3', '>'])
+        self.assertEqual(page_count(driver), 3)
+
+        mock_wait.return_value.until.side_effect = TimeoutException()
+        self.assertEqual(page_count(driver), 1)
+
+    @patch('NeptunDataCollection.WebDriverWait')
+    def test_scrape_product_data_waits_once_per_page(self, mock_wait):
+        driver = rendered_driver([])
+
+        with tempfile.TemporaryDirectory() as directory:
+            scrape_product_data('https://www.neptun.al/c?items=100&page=', 2, driver, directory, 'C')
+            with open(os.path.join(directory, 'C.csv'), encoding='utf-8') as file:
+                rows = list(csv.reader(file))
+
+        self.assertEqual(mock_wait.return_value.until.call_count, 2)
+        self.assertEqual(rows[1:], [['JBL Flip 6', '14.999', '16.999']] * 2)
+
+    @patch('NeptunDataCollection.WebDriverWait')
+    def test_scrape_product_data_reads_page_count_from_first_page(self, mock_wait):
+        driver = rendered_driver(['<', '1', '2', '3', '>'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            scrape_product_data('https://www.neptun.al/c?items=100&page=', None, driver, directory, 'C')
+
+        # Products and pagination of the first page, then the products of the others.
+        self.assertEqual(mock_wait.return_value.until.call_count, 4)
+        self.assertEqual([call.args[0] for call in driver.get.call_args_list], [
+            'https://www.neptun.al/c?items=100&page=1',
+            'https://www.neptun.al/c?items=100&page=2',
+            'https://www.neptun.al/c?items=100&page=3',
+        ])
+
+    @patch('NeptunDataCollection.WebDriverWait')
+    def test_scrape_product_data_stops_when_cancelled(self, mock_wait):
+        driver = rendered_driver([])
+        cancelled = threading.Event()
+        driver.get.side_effect = lambda url: cancelled.set()
+
+        with tempfile.TemporaryDirectory() as directory, self.assertRaises(LeaseLost):
+            scrape_product_data('https://www.neptun.al/c?items=100&page=', 3, driver, directory, 'C',
+                                cancelled=cancelled)
+        self.assertEqual(driver.get.call_count, 1)
+
+    def test_category_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'categories.json')
+            base_directory = os.path.join(directory, 'Neptun.al')
+            job = CategoryJob('https://www.neptun.al/kategorii/c?items=100&page=',
+                              os.path.join(base_directory, 'Audio'), 'C')
+
+            self.assertIsNone(load_category_jobs(base_directory, path=path))
+            save_category_jobs([job], base_directory, path=path)
+            jobs = load_category_jobs(base_directory, output_format='parquet', path=path)
+
+            self.assertEqual([(loaded.link, loaded.directory, loaded.filename, loaded.output_format) for loaded in jobs],
+                             [(job.link, job.directory, 'C', 'parquet')])
+            self.assertTrue(os.path.isdir(job.directory))
+            self.assertIsNone(load_category_jobs(base_directory, path=path, ttl=-1))
+            self.assertIsNone(load_category_jobs(os.path.join(directory, 'Other'), path=path))
+
+    @patch('NeptunDataCollection.run_job')
+    @patch('NeptunDataCollection.setup_driver')
+    def test_run_browser_pool_reuses_running_browser(self, mock_setup_driver, mock_run_job):
+        driver = Mock()
+        job = CategoryJob('https://www.neptun.al/c?items=100&page=', 'Neptun.al', 'C')
+
+        failed = run_browser_pool([job], workers=1, driver=driver)
+
+        self.assertEqual(failed, [])
+        mock_setup_driver.assert_not_called()
+        mock_run_job.assert_called_once_with(job, driver)
+        driver.quit.assert_called_once()
+
+    @patch('NeptunDataCollection.run_job')
+    @patch('NeptunDataCollection.setup_driver')
+    @patch('NeptunDataCollection.load_category_jobs')
+    def test_frontier(self, mock_load, mock_setup_driver, mock_run_job):
+        mock_load.return_value = [CategoryJob(f'https://www.neptun.al/c{i}?items=100&page=', 'Neptun.al/Audio', f'C{i}')
+                                  for i in range(3)]
+        mock_run_job.side_effect = [WebDriverException('crashed'), None, None, None]
+        drivers = [Mock(), Mock()]
+        mock_setup_driver.side_effect = drivers
+
+        with tempfile.TemporaryDirectory() as directory, \
+                Frontier(os.path.join(directory, 'frontier.sqlite3')) as frontier:
+            self.assertEqual(seed_frontier(frontier), 3)
+            self.assertEqual(seed_frontier(frontier), 0)
+            self.assertEqual(work_frontier(frontier, owner='worker-1', poll_interval=0), 3)
+            self.assertEqual(frontier.counts(['neptun'])['done'], 3)
+
+        self.assertEqual(mock_run_job.call_count, 4)
+        self.assertEqual(mock_run_job.call_args_list[0].args[1], drivers[0])
+        self.assertEqual(mock_run_job.call_args.args[1], drivers[1])
+        drivers[0].quit.assert_called_once()
+        drivers[1].quit.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
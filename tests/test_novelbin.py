@@ -0,0 +1,81 @@
+import importlib
+import os
+import re
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from replay_server import Recording, ReplayServer
+
+novelbin = importlib.import_module('NovelDownloader(NovelBin)')
+
+NOVEL_PAGE = b'''
+<html><body>
+<h3 class="title">A Flashing Genius</h3>
+<ul class="nav nav-tabs"><li><a href="#tab-chapters-title">Chapters</a></li></ul>
+<div id="list-chapter"></div>
+</body></html>
+'''
+
+
+def chapter_archive(url: str) -> bytes:
+    """Returns the chapter list served by the archive endpoint."""
+    links = ''.join(
+        f'<li><a href="{url}/book/a-flashing-genius/chapter-{number}">Chapter {number}</a></li>'
+        for number in range(1, 4)
+    )
+    return f'<ul class="list-chapter">{links}</ul>'.encode()
+
+
+def chapter_page(number: int) -> bytes:
+    """Returns a chapter page with its breadcrumb title and paragraphs."""
+    return (
+        '<html><body><ol class="breadcrumb">'
+        '<li><span itemprop="name">Novel</span></li>'
+        '<li><span itemprop="name">A Flashing Genius</span></li>'
+        f'<li><span itemprop="name">Chapter {number}: Opening {number}</span></li></ol>'
+        f'<div id="chr-content"><p>First paragraph of chapter {number}.</p><p>Second paragraph.</p></div>'
+        '</body></html>'
+    ).encode()
+
+
+class TestNovelBinDownloader(unittest.TestCase):
+
+    @patch.object(novelbin, 'get_chapter_links_with_browser')
+    def test_setup_reads_chapter_archive_over_http(self, mock_browser):
+        with ReplayServer() as server, tempfile.TemporaryDirectory() as directory:
+            server.add('/b/a-flashing-genius', Recording(NOVEL_PAGE))
+            server.add('/ajax/chapter-archive?novelId=a-flashing-genius', Recording(chapter_archive(server.url)))
+            for number in range(1, 3):
+                server.add(f'/book/a-flashing-genius/chapter-{number}', Recording(chapter_page(number)))
+            pattern = re.compile(re.escape(server.url) + r'/book/a-flashing-genius/chapter-[\w-]+')
+
+            saved = novelbin.setup(f'{server.url}/b/a-flashing-genius', pattern, directory)
+
+            self.assertEqual(saved, 2)
+            mock_browser.assert_not_called()
+            self.assertEqual(sorted(os.listdir(directory)), ['Chapter 1 Opening 1.txt', 'Chapter 2 Opening 2.txt'])
+            with open(os.path.join(directory, 'Chapter 2 Opening 2.txt'), encoding='utf-8') as file:
+                self.assertEqual(file.read(), 'First paragraph of chapter 2.\n\nSecond paragraph.\n\n')
+
+    def test_chapter_archive_url(self):
+        self.assertEqual(
+            novelbin.chapter_archive_url('https://novelbin.com/b/a-flashing-genius#tab-chapters-title'),
+            'https://novelbin.com/ajax/chapter-archive?novelId=a-flashing-genius'
+        )
+
+    @patch.object(novelbin, 'get_chapter_links_with_browser', return_value=[])
+    def test_setup_falls_back_to_selenium(self, mock_browser):
+        with ReplayServer() as server, tempfile.TemporaryDirectory() as directory:
+            pattern = re.compile(r'.*/chapter-\d+')
+            saved = novelbin.setup(f'{server.url}/b/a-flashing-genius', pattern, directory)
+
+        self.assertEqual(saved, 0)
+        mock_browser.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
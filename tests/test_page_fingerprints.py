@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+from unittest.mock import patch, Mock
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import GlobeDataCollection
+import page_fingerprints
+from page_fingerprints import PageFingerprints, fingerprint
+import scraper
+from sinks import CsvSink
+from sites import SITES
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'globe')
+
+
+class TestPageFingerprints(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = PageFingerprints(os.path.join(self.directory.name, 'pages.sqlite3'))
+        with open(os.path.join(FIXTURES, 'telefonia_page1.html'), 'rb') as file:
+            self.page = file.read()
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_fingerprint_ignores_scripts_outside_products(self):
+        start, end = SITES['globe'].product_region
+        changed_script = self.page.replace(b'var _gaq', b'var _gaq2')
+        changed_price = self.page.replace(b'ty-price-num">', b'ty-price-num">9', 1)
+
+        self.assertEqual(fingerprint(self.page, start, end), fingerprint(changed_script, start, end))
+        self.assertNotEqual(fingerprint(self.page, start, end), fingerprint(changed_price, start, end))
+
+    def test_unchanged_page_is_not_parsed_again(self):
+        response = Mock(status_code=200, content=self.page, url='https://globe.al/telefonia/')
+        sink = Mock(spec=CsvSink)
+        sink.__enter__ = Mock(return_value=sink)
+        sink.__exit__ = Mock(return_value=False)
+
+        with patch.object(page_fingerprints, 'store', self.store), \
+                patch('scraper.extract_products', wraps=scraper.extract_products) as mock_extract:
+            with page_fingerprints.track(sink):
+                first = GlobeDataCollection.save(response, 'test.csv', sink=sink)
+            with page_fingerprints.track(sink):
+                second = GlobeDataCollection.save(response, 'test.csv', sink=sink)
+
+        self.assertEqual(first, 'https://globe.al/telefonia/page-2/')
+        self.assertEqual(second, first)
+        self.assertEqual(mock_extract.call_count, 1)
+        self.assertEqual(sink.write_rows.call_args_list[0], sink.write_rows.call_args_list[1])
+        self.assertEqual(self.store.stats(), {'globe': {'parsed': 1, 'skipped': 1}})
+
+    def test_page_is_stored_once_its_sink_is_closed(self):
+        response = Mock(status_code=200, content=self.page, url='https://globe.al/telefonia/')
+        digest = fingerprint(self.page, *SITES['globe'].product_region)
+        path = os.path.join(self.directory.name, 'test.csv')
+
+        with patch.object(page_fingerprints, 'store', self.store):
+            with self.assertRaises(OSError):
+                with page_fingerprints.track(CsvSink(path)) as sink:
+                    scraper.save(SITES['globe'], response, filename='test.csv', sink=sink)
+                    self.assertIsNone(self.store.unchanged('globe', response.url, digest))
+                    raise OSError('crashed before the rows were flushed')
+            self.assertIsNone(self.store.unchanged('globe', response.url, digest))
+
+            with page_fingerprints.track(CsvSink(path)) as sink:
+                scraper.save(SITES['globe'], response, filename='test.csv', sink=sink)
+            self.assertIsNotNone(self.store.unchanged('globe', response.url, digest))
+
+
+if __name__ == '__main__':
+    unittest.main()
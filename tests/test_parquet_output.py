@@ -0,0 +1,59 @@
+import importlib.util
+import shutil
+import tempfile
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from parquet_output import ParquetSink, convert_csv_tree
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+class TestParquetOutput(unittest.TestCase):
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_sink_writes_typed_partitioned_rows(self):
+        import pyarrow.dataset as ds
+
+        with tempfile.TemporaryDirectory() as directory:
+            with ParquetSink("globe", "telefonia", root=directory, row_group_size=1) as sink:
+                sink.write_rows([("Phone", "1,490", "1,990"), ("Cable", "N/A", "690")])
+
+            table = ds.dataset(directory, partitioning="hive").to_table()
+            rows = table.sort_by("name").to_pylist()
+            self.assertEqual([row["current_price"] for row in rows], [None, 1490])
+            self.assertEqual([row["old_price"] for row in rows], [690, 1990])
+            self.assertEqual({row["site"] for row in rows}, {"globe"})
+            self.assertEqual({row["category"] for row in rows}, {"telefonia"})
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_convert_csv_tree(self):
+        import pyarrow.dataset as ds
+
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'Neptun.al', 'Audio')
+            shutil.copytree(os.path.join(ROOT, 'Neptun.al', 'Audio'), source)
+            os.makedirs(os.path.join(directory, 'Shpresa.al'))
+            with open(os.path.join(directory, 'Shpresa.al', 'Fitness.csv'), 'w', encoding='utf-8') as file:
+                file.write('Emri,Cmimi\nPuluz 27 in 1 Memory Card Case,1690\nYoga Mat,"2,490"\n')
+            output = os.path.join(directory, 'parquet')
+
+            rows = convert_csv_tree({os.path.join(directory, 'Neptun.al'): "neptun",
+                                     os.path.join(directory, 'Shpresa.al'): "shpresa"}, output_root=output)
+
+            table = ds.dataset(output, partitioning="hive").to_table()
+            self.assertEqual(table.num_rows, rows)
+            categories = set(table.column("category").to_pylist())
+            self.assertIn("Audio/Personal Audio/Bokse Bluetooth", categories)
+
+            shpresa = table.filter(ds.field("site") == "shpresa").sort_by("name").to_pylist()
+            self.assertEqual([(row["name"], row["current_price"], row["old_price"]) for row in shpresa],
+                             [("Puluz 27 in 1 Memory Card Case", 1690, None), ("Yoga Mat", 2490, None)])
+            self.assertEqual({row["category"] for row in shpresa}, {"Fitness"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import Mock
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metrics
+import parse_pool
+from parse_pool import ParsePool
+import scraper
+from sites import SITES
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'globe')
+
+
+class TestParsePool(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(FIXTURES, 'telefonia_page1.html'), 'rb') as file:
+            self.page = file.read()
+
+    def tearDown(self):
+        if parse_pool.pool is not None:
+            parse_pool.pool.close()
+            parse_pool.pool = None
+        metrics.registry = None
+
+    def test_parse_in_worker_process(self):
+        site = SITES['globe']
+        expected = scraper.parse_page(site, self.page)
+
+        with ParsePool(processes=2, max_pending=1) as pool:
+            self.assertEqual(pool.parse(scraper.parse_page, site, self.page), expected)
+
+    def test_save_uses_enabled_pool(self):
+        response = Mock(status_code=200, content=self.page, from_cache=True, url='https://globe.al/telefonia/')
+        without_pool = scraper.save(SITES['globe'], response, filename='test.csv', sink=Mock())
+
+        parse_pool.enable(processes=1)
+        self.assertEqual(scraper.save(SITES['globe'], response, filename='test.csv', sink=Mock()), without_pool)
+        self.assertTrue(without_pool)
+
+    def test_save_writes_rows_parsed_in_pool(self):
+        site = SITES['globe']
+        response = Mock(status_code=200, content=self.page, from_cache=False, url='https://globe.al/telefonia/')
+        expected_rows, expected_link = scraper.parse_page(site, self.page)
+        sink = Mock()
+
+        parse_pool.enable(processes=1)
+        self.assertEqual(scraper.save(site, response, filename='test.csv', sink=sink), expected_link)
+        sink.write_rows.assert_called_once_with(expected_rows)
+        self.assertTrue(expected_rows)
+
+    def test_metrics_recorded_in_worker_process(self):
+        site = SITES['globe']
+        registry = metrics.enable(prometheus_path=None)
+
+        with ParsePool(processes=1) as pool, metrics.labels('globe', 'telefonia'):
+            pool.parse(scraper.parse_page, site, self.page)
+            pool.parse(scraper.parse_page, site, self.page)
+
+        self.assertEqual(registry.histogram('find_next_link', 'globe', 'telefonia').count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import patch, Mock
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from extraction import extract_products
+import LightNovelWorldDataCollection as lightnovelworld
+import parsed_page
+from parsed_page import ParsedPage
+from sites import SITES
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(*path: str) -> bytes:
+    with open(os.path.join(FIXTURES, *path), 'rb') as file:
+        return file.read()
+
+
+class TestParsedPage(unittest.TestCase):
+
+    def test_only_regions_are_parsed(self):
+        page = ParsedPage(b'<html><body><p>Intro</p><div class="pagenav x"><a href="/2">2</a></div>'
+                          b'<ul class="chapter-list"><li>One</li></ul><footer>End</footer></body></html>',
+                          lightnovelworld.CHAPTER_LIST_REGIONS)
+
+        self.assertEqual([tag.name for tag in page.soup.contents], ['div', 'ul'])
+        self.assertEqual(page.find('pagenav').a['href'], '/2')
+        self.assertEqual([tag.get_text() for tag in page.region('chapters')], ['One'])
+        with self.assertRaises(KeyError):
+            page.region('products')
+
+    def test_site_regions_match_full_parse(self):
+        for name, fixture in [('globe', 'telefonia_page1.html'), ('shpresa', 'fitness_page1.html')]:
+            site = SITES[name]
+            content = read_fixture(name, fixture)
+            full = BeautifulSoup(content, features='lxml')
+            page = ParsedPage(content, site.page_regions)
+
+            with self.subTest(site=name):
+                self.assertEqual(extract_products(page.soup, site.selectors), extract_products(full, site.selectors))
+                self.assertEqual(site.pagination.next_link(page.soup), site.pagination.next_link(full))
+                self.assertEqual(site.pagination.plan(page.soup), site.pagination.plan(full))
+
+    def test_response_is_parsed_once(self):
+        response = Mock(content=read_fixture('lightnovelworld', 'chapters_page1.html'), spec=['content'])
+
+        with patch('parsed_page.BeautifulSoup', wraps=BeautifulSoup) as parsed:
+            links = lightnovelworld.get_chapter_links(response)
+            pages = lightnovelworld.get_chapter_pages(response)
+
+        parsed.assert_called_once()
+        self.assertTrue(links)
+        self.assertIsNotNone(pages)
+        self.assertIs(parsed_page.parse(response, lightnovelworld.CHAPTER_LIST_REGIONS), response.parsed_page)
+
+    def test_other_regions_parse_again(self):
+        response = Mock(content=b'<div class="pagenav"></div><ul class="chapter-list"></ul>', spec=['content'])
+        chapters = parsed_page.parse(response, lightnovelworld.CHAPTER_LIST_REGIONS)
+        pagenav = parsed_page.parse(response, {'pagenav': SoupStrainer('div', class_='pagenav')})
+
+        self.assertIsNot(chapters, pagenav)
+        self.assertIsNone(pagenav.soup.find('ul'))
+
+
+if __name__ == '__main__':
+    unittest.main()
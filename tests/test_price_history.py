@@ -0,0 +1,59 @@
+import tempfile
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_history import PriceHistory, PriceHistorySink, import_csv_tree
+
+DAY = 86400
+
+
+class TestPriceHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = PriceHistory(os.path.join(self.directory.name, 'history.sqlite3'))
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_only_changed_prices_are_recorded(self):
+        rows = [("Phone", "14,990", "14,990"), ("Cable", "690", "690")]
+        self.assertEqual(self.store.record("globe", "telefonia", rows, observed_at=DAY), 2)
+        self.assertEqual(self.store.record("globe", "telefonia", rows, observed_at=2 * DAY), 0)
+
+        rows[0] = ("Phone", "12,990", "14,990")
+        self.assertEqual(self.store.record("globe", "telefonia", rows, observed_at=3 * DAY), 1)
+        self.assertEqual(self.store.history("globe", "Phone"), [(DAY, 14990, 14990), (3 * DAY, 12990, 14990)])
+        self.assertEqual(len(self.store.history("globe", "Cable")), 1)
+
+    def test_price_drops(self):
+        with PriceHistorySink(self.store, "neptun", "Audio/Bokse", observed_at=DAY) as sink:
+            sink.write_rows([("JBL GO 3", "N/A", "4.990"), ("JBL CLIP 4", "5.990", "6.990"), ("AKAI", "1.297", "2.690")])
+        with PriceHistorySink(self.store, "neptun", "Audio/Bokse", observed_at=10 * DAY) as sink:
+            sink.write_rows([("JBL GO 3", "3.997", "4.990"), ("JBL CLIP 4", "5.790", "6.990"), ("AKAI", "1.297", "2.690")])
+
+        drops = self.store.price_drops(since=5 * DAY, drop=0.1)
+        self.assertEqual(drops, [("neptun", "Audio/Bokse", "JBL GO 3", 4990, 3997)])
+        self.assertEqual(len(self.store.price_drops(since=5 * DAY, drop=0.01)), 2)
+        self.assertEqual(self.store.price_drops(since=11 * DAY, drop=0.01), [])
+
+    def test_import_csv_tree(self):
+        globe = os.path.join(self.directory.name, 'Globe')
+        shpresa = os.path.join(self.directory.name, 'Shpresa.al')
+        for directory, content in ((globe, 'Emri,Cmimi aktual,Cmimi i vjeter\nPhone,"12,990","14,990"\n'),
+                                   (shpresa, 'Emri,Cmimi\nPuluz 27 in 1 Memory Card Case,1690\n')):
+            os.makedirs(directory)
+            with open(os.path.join(directory, 'Telefonia.csv'), 'w', encoding='utf-8') as file:
+                file.write(content)
+
+        self.assertEqual(import_csv_tree(self.store, {globe: "globe", shpresa: "shpresa"}), 2)
+        self.assertEqual([entry[1:] for entry in self.store.history("globe", "Phone")], [(12990, 14990)])
+        self.assertEqual([entry[1:] for entry in self.store.history("shpresa", "Puluz 27 in 1 Memory Card Case")],
+                         [(1690, None)])
+
+if __name__ == '__main__':
+    unittest.main()
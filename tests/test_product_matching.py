@@ -0,0 +1,95 @@
+import csv
+import os
+import tempfile
+import unittest
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from product_matching import ProductIndex, model_codes, normalize_title
+
+
+def write_csv(path: str, rows: list[tuple]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(('Emri', 'Cmimi aktual', 'Cmimi i vjeter'))
+        writer.writerows(rows)
+
+
+class TestProductMatching(unittest.TestCase):
+
+    def test_normalize_title(self):
+        self.assertEqual(normalize_title('Frigorifer LG GP-FPA346VAATW, 346L'), 'frigorifer lg gp fpa346vaatw 346l')
+        self.assertEqual(normalize_title('Tharëse Rrobash Çelik'), 'tharese rrobash celik')
+
+    def test_model_codes(self):
+        self.assertEqual(model_codes('Frigorifer LG GP-FPA346VAATW, 346L'), {'GPFPA346VAATW'})
+        self.assertEqual(model_codes('Mikrovale Samsung MG23A7013CB/OL'), {'MG23A7013CBOL'})
+        self.assertEqual(model_codes('Samsung Galaxy A15 128GB 5000mAh 1920x1080 AX1500'), set())
+
+    def test_clusters_across_sites(self):
+        index = ProductIndex()
+        index.add('globe', 'Frigorifer LG GP-FPA346VAATW', price=89990)
+        index.add('globe', 'Mouse Logitech M190 Grey', price=1200)
+        index.add('shpresa', 'Logitech M190 Wireless Mouse Grey', price=1190)
+        index.add('neptun', 'FRIGORIFER LG GPFPA346VAATW INVERTER', price=84990)
+        index.add('neptun', 'MOUSE LOGITECH M190 WIRELESS GREY', price=990)
+        index.add('neptun', 'MOUSE LOGITECH M330 WIRELESS GREY', price=1990)
+
+        clusters = [sorted((product.site, product.price) for product in cluster) for cluster in index.clusters()]
+        self.assertEqual(clusters, [
+            [('globe', 89990), ('neptun', 84990)],
+            [('globe', 1200), ('neptun', 990), ('shpresa', 1190)],
+        ])
+        self.assertEqual(len(index.cluster_of('neptun', 'MOUSE LOGITECH M330 WIRELESS GREY')), 1)
+
+    def test_cluster_holds_one_product_per_site(self):
+        index = ProductIndex()
+        index.add('shpresa', 'HyperX Pulsefire Haste Gaming Mouse')
+        index.add('neptun', 'MOUSE GAMING HYPERX PULSEFIRE HASTE BLACK')
+        index.add('neptun', 'MOUSE GAMING HYPERX PULSEFIRE HASTE WHITE')
+
+        self.assertEqual([[product.site for product in cluster] for cluster in index.clusters()],
+                         [['shpresa', 'neptun']])
+
+    def test_different_models_are_not_matched(self):
+        index = ProductIndex()
+        index.add('globe', 'Televizor Samsung UE55AU7172UXXH')
+        index.add('neptun', 'TELEVIZOR SAMSUNG UE55CU7172UXXH')
+        index.add('shpresa', 'TP-LINK Wi-Fi 6 Router Archer AX72')
+        index.add('neptun', 'TP-LINK WI-FI 6 ROUTER ARCHER AX12')
+        self.assertEqual(index.clusters(), [])
+
+    def test_incremental_import(self):
+        with tempfile.TemporaryDirectory() as directory:
+            roots = {os.path.join(directory, 'Globe'): 'globe', os.path.join(directory, 'Neptun.al'): 'neptun'}
+            globe = os.path.join(directory, 'Globe', 'Telefonia.csv')
+            neptun = os.path.join(directory, 'Neptun.al', 'Audio', 'Bokse.csv')
+            write_csv(globe, [('Hekur Tefal FV1710E0', '2,790', 'N/A')])
+            write_csv(neptun, [('KUFJE JBL TUNE 510BT', '3.990', '4.990')])
+            path = os.path.join(directory, 'index.json')
+
+            index = ProductIndex()
+            self.assertEqual(index.import_csv_tree(roots), 2)
+            index.save(path)
+
+            write_csv(neptun, [('KUFJE JBL TUNE 510BT', '3.490', '4.990'), ('HEKUR TEFAL FV1710E0', '3.590', 'N/A')])
+            os.utime(neptun, (0, 0))
+            index = ProductIndex.load(path)
+            self.assertEqual(index.import_csv_tree(roots), 1)
+            self.assertEqual(index.import_csv_tree(roots), 0)
+
+            cluster = index.cluster_of('globe', 'Hekur Tefal FV1710E0')
+            self.assertEqual([(product.site, product.price) for product in cluster], [('globe', 2790), ('neptun', 3590)])
+            self.assertEqual(index.products[index.add('neptun', 'KUFJE JBL TUNE 510BT')].price, 3490)
+            self.assertEqual(index.products[0].category, 'Telefonia')
+
+            index.save(path)
+            reloaded = ProductIndex.load(path)
+            self.assertEqual([[product.name for product in cluster] for cluster in reloaded.clusters()],
+                             [['Hekur Tefal FV1710E0', 'HEKUR TEFAL FV1710E0']])
+
+
+if __name__ == '__main__':
+    unittest.main()
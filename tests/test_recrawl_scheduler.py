@@ -0,0 +1,140 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, Mock
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from NeptunDataCollection import CategoryJob
+import recrawl_scheduler
+from recrawl_scheduler import DAY, RecrawlScheduler, allocate, change_rate
+import scraper
+from sites import SITES, Site
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'shpresa')
+HOUR = 3600
+
+
+def fixture_response(url: str) -> Mock:
+    """Returns a mocked response with the recorded Shpresa.al page for a URL."""
+    name = 'fitness_page2.html' if url.endswith('/page/2/') else 'fitness_page1.html'
+    with open(os.path.join(FIXTURES, name), 'rb') as file:
+        return Mock(status_code=200, content=file.read(), url=url, from_cache=False)
+
+
+class TestRecrawlScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'schedule.sqlite3')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_change_rate_follows_changed_visits(self):
+        static = change_rate(20, 0, 20 * DAY)
+        busy = change_rate(20, 20, 20 * DAY)
+        unknown = change_rate(0, 0, 0)
+
+        self.assertLess(static, unknown)
+        self.assertLess(unknown, busy)
+        self.assertGreater(static, 0)
+
+    def test_allocate_stays_within_budget(self):
+        rates = [change_rate(20, 0, 20 * DAY), change_rate(20, 6, 20 * DAY), change_rate(20, 12, 20 * DAY)]
+        costs = [2, 2, 10]
+
+        intervals = allocate(rates, costs, 100 / DAY)
+
+        self.assertAlmostEqual(sum(cost * DAY / interval for cost, interval in zip(costs, intervals)), 100, places=3)
+        self.assertGreater(intervals[0], intervals[1])
+        self.assertEqual(allocate(rates, costs, 10 ** 6 / DAY), [HOUR] * 3)
+        self.assertEqual(allocate(rates, costs, 1 / DAY), [7 * DAY] * 3)
+
+    def test_stable_categories_are_crawled_less_often(self):
+        keys = [('globe', 'telefonia'), ('globe', 'aksesore')]
+        with RecrawlScheduler(self.path, daily_budget=20) as scheduler:
+            self.assertTrue(all(scheduler.register(*key) for key in keys))
+            self.assertFalse(scheduler.register('globe', 'aksesore'))
+            self.assertEqual(scheduler.due(keys, now=0), keys[::-1])
+            for day in range(10):
+                self.assertEqual(scheduler.record('globe', 'telefonia', f'prices-{day}', 5, now=day * DAY),
+                                 None if day == 0 else True)
+                self.assertEqual(scheduler.record('globe', 'aksesore', 'same', 5, now=day * DAY),
+                                 None if day == 0 else False)
+
+            intervals = scheduler.plan(keys)
+            self.assertGreater(intervals[('globe', 'aksesore')], intervals[('globe', 'telefonia')])
+            self.assertAlmostEqual(scheduler.planned_requests(keys), 20, places=3)
+
+            now = 9 * DAY + intervals[('globe', 'telefonia')]
+            self.assertEqual(scheduler.due(keys, now=now), [('globe', 'telefonia')])
+            self.assertAlmostEqual(scheduler.seconds_until_due(keys, now=9 * DAY), intervals[('globe', 'telefonia')])
+
+        with RecrawlScheduler(self.path, daily_budget=20) as scheduler:
+            rows = {row['category']: row for row in scheduler.status()}
+            self.assertGreater(rows['telefonia']['rate'], rows['aksesore']['rate'])
+            self.assertEqual(rows['telefonia']['pages'], 5)
+
+    def test_run_crawls_due_categories_and_postpones_failures(self):
+        crawl = Mock(return_value=('digest', 3))
+        broken = Mock(side_effect=ValueError('status code 500'))
+
+        with RecrawlScheduler(self.path) as scheduler:
+            crawled = recrawl_scheduler.run(scheduler, {('globe', 'telefonia'): crawl,
+                                                        ('neptun', 'TV/OLED'): broken}, rounds=1)
+            self.assertEqual(crawled, 1)
+            self.assertEqual(scheduler.due(), [])
+            self.assertAlmostEqual(scheduler.seconds_until_due(), scheduler.min_interval, delta=5)
+
+            self.assertEqual(recrawl_scheduler.run(scheduler, {('globe', 'telefonia'): crawl}, rounds=1), 0)
+        crawl.assert_called_once_with()
+
+    @patch('scraper.scrape_category', return_value=('digest', 1))
+    def test_crawl_targets_record_price_history(self, mock_scrape):
+        targets = recrawl_scheduler.crawl_targets(['globe'])
+
+        self.assertIn(('globe', 'telefonia'), targets)
+        self.assertEqual(targets[('globe', 'telefonia')](), ('digest', 1))
+        self.assertEqual(mock_scrape.call_args.kwargs['output_format'], 'history')
+
+    @patch('NeptunDataCollection.run_job', return_value=('rendered', 2))
+    @patch('NeptunDataCollection.setup_driver')
+    @patch('NeptunDataCollection.list_category_jobs')
+    def test_neptun_targets_share_a_browser(self, mock_list, mock_setup_driver, mock_run_job):
+        jobs = [CategoryJob(f'https://www.neptun.al/c{i}?items=100&page=', 'Neptun.al/Audio', f'C{i}', 'history')
+                for i in range(2)]
+        mock_list.return_value = jobs
+
+        self.assertNotIn('neptun', {site for site, _ in recrawl_scheduler.crawl_targets()})
+        mock_list.assert_not_called()
+
+        drivers = {}
+        targets = recrawl_scheduler.crawl_targets(['neptun'], drivers=drivers)
+        self.assertEqual(list(targets), [('neptun', 'Audio/C0'), ('neptun', 'Audio/C1')])
+        mock_list.assert_called_once_with('history')
+
+        self.assertEqual(targets[('neptun', 'Audio/C0')](), ('rendered', 2))
+        self.assertEqual(targets[('neptun', 'Audio/C1')](), ('rendered', 2))
+        mock_setup_driver.assert_called_once_with()
+        mock_run_job.assert_called_with(jobs[1], mock_setup_driver.return_value)
+        self.assertEqual(drivers, {'neptun': mock_setup_driver.return_value})
+
+    @patch('scraper.fetch.get', side_effect=fixture_response)
+    def test_scrape_category_fingerprints_products(self, mock_get):
+        shpresa = SITES['shpresa']
+        site = Site(shpresa.name, shpresa.base_url, self.directory.name, {'fitness': 'Fitness.csv'},
+                    selectors=shpresa.selectors, pagination=shpresa.pagination, category_path=shpresa.category_path,
+                    fieldnames=shpresa.fieldnames, product_region=shpresa.product_region,
+                    product_grid=shpresa.product_grid)
+
+        first = scraper.scrape_category(site, 'fitness', 'Fitness.csv')
+        second = scraper.scrape_category(site, 'fitness', 'Fitness.csv')
+
+        self.assertEqual(first, second)
+        self.assertEqual(first[1], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
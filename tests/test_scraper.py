@@ -0,0 +1,167 @@
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch, Mock
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bs4 import BeautifulSoup
+
+from pagination import plan_pages
+import scraper
+from sites import SITES, Site
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'globe')
+
+SHPRESA_PAGE = b'''
+<html><body>
+<ul class="products columns-4">
+  <li class="product type-product">
+    <a href="https://shop.shpresa.al/product/puluz-case/">
+      <h2 class="woocommerce-loop-product__title">Puluz 27 in 1 Memory Card Case</h2>
+      <span class="price"><span class="woocommerce-Price-amount amount"><bdi>1.690&nbsp;Lek\xc3\xab</bdi></span></span>
+    </a>
+  </li>
+  <li class="product type-product">
+    <a href="https://shop.shpresa.al/product/puluz-stick/">
+      <h2 class="woocommerce-loop-product__title">Puluz 3M Selfie Stick for Insta360</h2>
+      <span class="price"><span class="woocommerce-Price-amount amount"><bdi>3.490&nbsp;Lek\xc3\xab</bdi></span></span>
+    </a>
+  </li>
+</ul>
+<nav class="woocommerce-pagination">
+  <a class="next page-numbers" href="https://shop.shpresa.al/product-category/fitness/page/2/">&rarr;</a>
+</nav>
+</body></html>
+'''
+
+
+class TestScraper(unittest.TestCase):
+
+    def test_shpresa_page(self):
+        site = SITES['shpresa']
+        response = Mock(status_code=200, content=SHPRESA_PAGE, from_cache=False)
+
+        with tempfile.TemporaryDirectory() as directory:
+            site = Site(site.name, site.base_url, directory, site.categories, selectors=site.selectors,
+                        pagination=site.pagination, category_path=site.category_path, fieldnames=site.fieldnames)
+            next_link = scraper.save(site, response, filename='Fitness.csv')
+
+            with open(os.path.join(directory, 'Fitness.csv'), encoding='utf-8') as file:
+                lines = file.read().splitlines()
+
+        self.assertEqual(next_link, 'https://shop.shpresa.al/product-category/fitness/page/2/')
+        self.assertEqual(lines, [
+            'Emri,Cmimi',
+            'Puluz 27 in 1 Memory Card Case,1690',
+            'Puluz 3M Selfie Stick for Insta360,3490',
+        ])
+
+    def test_globe_keeps_the_output_of_the_removed_shpresa_module(self):
+        # ShpresaALDataCollection was a copy of the Globe module that scraped these globe.al categories into Globe/.
+        removed = {
+            "elektroshtepiake-te-medha-sq": "GlobeElektroshtepiakeTeMedha2.csv",
+            "elektroshtepiake-te-vogla-sq": "GlobeElektroshtepiakeTeVogla.csv",
+            "foto-video-sq": "GlobeFotoDheVideo.csv",
+            "kompjutera-dhe-rrjeti": "GlobeKompjuteraDheRrjeti.csv",
+            "kondicionimi": "GlobeKondicionimi.csv",
+            "telefonia": "GlobeTelefonia.csv",
+        }
+        site = SITES['globe']
+        self.assertEqual({slug: site.output_path(site.categories[slug]) for slug in removed},
+                         {slug: f'Globe/{filename}' for slug, filename in removed.items()})
+
+        with open(os.path.join(FIXTURES, 'telefonia_page1.html'), 'rb') as file:
+            content = file.read()
+        expected = []
+        for product in BeautifulSoup(content, features="lxml").find_all("div"):
+            title = product.find("a", class_="product-title")
+            price = product.find("span", class_="ty-price-num")
+            old_price = product.find("bdi")
+            if title and price and old_price:
+                row = (title.get_text(strip=True).strip(),
+                       *(element.get_text(strip=True).replace("Lekë", "").replace(".", ",").strip()
+                         for element in (price, old_price)))
+                if row[2] not in ('-', 'Home') and row not in expected:
+                    expected.append(row)
+
+        self.assertTrue(expected)
+        self.assertEqual(scraper.parse_page(site, content)[0], expected)
+
+    def test_cached_page_writes_its_rows(self):
+        site = SITES['shpresa']
+        response = Mock(status_code=200, content=SHPRESA_PAGE, from_cache=True,
+                        url='https://shop.shpresa.al/product-category/fitness/')
+        sink = Mock()
+
+        next_link = scraper.save(site, response, filename='Fitness.csv', sink=sink)
+
+        self.assertEqual(next_link, 'https://shop.shpresa.al/product-category/fitness/page/2/')
+        self.assertEqual([row[0] for row in sink.write_rows.call_args.args[0]],
+                         ['Puluz 27 in 1 Memory Card Case', 'Puluz 3M Selfie Stick for Insta360'])
+
+    @patch('scraper.open_sink')
+    @patch('scraper.save')
+    @patch('scraper.AsyncCrawler.fetch')
+    def test_crawl_several_sites(self, mock_fetch, mock_save, mock_sink):
+        mock_fetch.return_value = Mock(status_code=200)
+        mock_save.return_value = False
+
+        asyncio.run(scraper.crawl(scraper.category_jobs(['globe', 'shpresa'])))
+        fetched = {call.args[0] for call in mock_fetch.call_args_list}
+        self.assertIn('https://globe.al/telefonia/', fetched)
+        self.assertIn('https://shop.shpresa.al/product-category/fitness/', fetched)
+        self.assertEqual(len(fetched), len(SITES['globe'].categories) + len(SITES['shpresa'].categories))
+
+    def test_plan_pages(self):
+        pages = {
+            1: 'https://globe.al/telefonia/',
+            2: 'https://globe.al/telefonia/page-2/',
+            3: 'https://globe.al/telefonia/page-3/',
+            9: 'https://globe.al/telefonia/page-9/',
+        }
+        self.assertEqual(plan_pages(pages, 2, last=4), [
+            'https://globe.al/telefonia/page-3/',
+            'https://globe.al/telefonia/page-4/',
+        ])
+        self.assertEqual(len(plan_pages(pages, 1)), 8)
+        self.assertEqual(plan_pages(pages, 9), [])
+        self.assertIsNone(plan_pages({2: 'https://globe.al/telefonia/?p=a', 3: 'https://globe.al/x'}, 1, last=5))
+
+    @patch('scraper.open_sink')
+    @patch('scraper.save')
+    @patch('scraper.AsyncCrawler.fetch')
+    def test_crawl_requests_planned_pages_together(self, mock_fetch, mock_save, mock_sink):
+        with open(os.path.join(FIXTURES, 'telefonia_page1.html'), 'rb') as file:
+            first_page = file.read()
+        events = []
+        next_links = {
+            'https://globe.al/telefonia/': 'https://globe.al/telefonia/page-2/',
+            'https://globe.al/telefonia/page-2/': 'https://globe.al/telefonia/page-3/',
+        }
+
+        def fetch(url):
+            events.append(('fetch', url))
+            return Mock(status_code=200, content=first_page, url=url)
+
+        def save(site, response, filename, sink):
+            events.append(('save', response.url))
+            return next_links.get(response.url, False)
+
+        mock_fetch.side_effect = fetch
+        mock_save.side_effect = save
+
+        asyncio.run(scraper.crawl([(SITES['globe'], 'telefonia', 'test.csv')]))
+        self.assertEqual(events, [
+            ('fetch', 'https://globe.al/telefonia/'),
+            ('save', 'https://globe.al/telefonia/'),
+            ('fetch', 'https://globe.al/telefonia/page-2/'),
+            ('fetch', 'https://globe.al/telefonia/page-3/'),
+            ('save', 'https://globe.al/telefonia/page-2/'),
+            ('save', 'https://globe.al/telefonia/page-3/'),
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import csv
+import tempfile
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sinks import CsvSink, FIELDNAMES
+
+
+class TestCsvSink(unittest.TestCase):
+
+    def test_append_writes_header_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'Globe', 'test.csv')
+            with CsvSink(path) as sink:
+                sink.write_row(("Phone", "1,490", "1,990"))
+            with CsvSink(path) as sink:
+                sink.write_rows([("Cable", "690", "690")])
+
+            with open(path, encoding='utf-8') as file:
+                rows = list(csv.reader(file))
+            self.assertEqual(rows, [list(FIELDNAMES), ["Phone", "1,490", "1,990"], ["Cable", "690", "690"]])
+
+    def test_write_mode_overwrites(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.csv')
+            with CsvSink(path) as sink:
+                sink.write_row(("Phone", "1,490", "1,990"))
+            with CsvSink(path, mode="w") as sink:
+                sink.write_row(("Cable", "690", "690"))
+
+            with open(path, encoding='utf-8') as file:
+                self.assertEqual(len(list(csv.reader(file))), 2)
+
+    @patch('sinks.os.fsync')
+    def test_flush_policy(self, mock_fsync):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.csv')
+            sink = CsvSink(path, flush_every=2, fsync=True)
+            sink.write_row(("A", "1", "1"))
+            mock_fsync.assert_not_called()
+            sink.write_row(("B", "2", "2"))
+            mock_fsync.assert_called_once()
+
+            with open(path, encoding='utf-8') as file:
+                self.assertEqual(len(file.readlines()), 3)
+            sink.close()
+            self.assertEqual(sink.rows_written, 2)
+
+if __name__ == '__main__':
+    unittest.main()